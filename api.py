@@ -0,0 +1,344 @@
+"""Local HTTP service for batch GRN/PRN parsing, for tools that can't drive the Streamlit page.
+
+    python -m api [--host 127.0.0.1] [--port 8502] [--workers N] [--max-running 2] [--max-queued 16]
+
+Endpoints (JSON unless noted):
+
+    POST   /jobs/grn?name=batch.zip     body: one PDF or a ZIP of PDFs -> 202 with the job
+    POST   /jobs/prn?name=file.pdf      (optional &extractor=pypdfium2)
+    GET    /jobs/<id>                   state (queued, running, done, failed), progress, errors
+    GET    /jobs/<id>/result?format=json|csv|xlsx   the parsed rows, once the job is done
+    DELETE /jobs/<id>                   forget a job (a queued job never runs)
+    GET    /health                      pool size, running and queued jobs, limits
+
+Every job's files run on one process pool shared by the whole service, with
+the same extraction and parsers as the app. At most --max-running jobs are
+processed at once and --max-queued more wait their turn; further submissions
+get 503 with a Retry-After header, as do requests beyond --max-connections.
+Uploads larger than API_MAX_UPLOAD_MB get 413. A file that runs past
+PDF_FILE_TIMEOUT_S or crashes its worker fails on its own (see isolation)
+without holding up other jobs. Finished jobs are kept for an hour. The service has no authentication and listens on localhost by default.
+For a load test, see benchmarks/bench_api.py.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from cli import PROCESSORS
+from extractors import DEFAULT_EXTRACTOR, available_extractors
+from isolation import IsolatedPool
+from jobs import JOB_RETENTION_S
+from processing import DEFAULT_WORKERS, PdfSource, ProcessingStats, excel_bytes
+
+# Jobs processed at once (their files share the pool) and jobs allowed to wait
+MAX_RUNNING_JOBS = int(os.getenv("API_MAX_RUNNING_JOBS", 2))
+MAX_QUEUED_JOBS = int(os.getenv("API_MAX_QUEUED_JOBS", 16))
+
+# Requests handled at once; the rest are turned away with 503
+MAX_CONNECTIONS = int(os.getenv("API_MAX_CONNECTIONS", 32))
+
+MAX_UPLOAD_BYTES = int(os.getenv("API_MAX_UPLOAD_MB", 200)) * 1024 * 1024
+
+RESULT_TYPES = {
+    'json': 'application/json',
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+class ServiceError(Exception):
+    """A request that can't be served, answered with status and message"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+class ApiJob:
+    """One submitted upload: queued, then running, then done or failed"""
+
+    def __init__(self, kind: str, name: str, data: bytes, extractor: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.name = name
+        self.extractor = extractor
+        self.state = 'queued'
+        self.done = 0
+        self.total = 0
+        self.df = None
+        self.errors = []
+        self.error: Optional[str] = None
+        self.stats = ProcessingStats()
+        self.submitted = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self._data = data
+
+    def _progress(self, done: int, total: int, name: str):
+        self.done, self.total = done, total
+
+    def run(self, workers: int, pool: IsolatedPool):
+        if self.state != 'queued':
+            return  # deleted while it waited
+        self.state = 'running'
+        self.started = time.time()
+        process_files, _ = PROCESSORS[self.kind]
+        data, self._data = self._data, None
+        try:
+            self.df, self.errors = process_files(
+                [PdfSource(self.name, lambda: data)], workers=workers, progress=self._progress, stats=self.stats,
+                extractor=self.extractor, executor=pool
+            )
+            self.state = 'done'
+        except Exception as e:
+            self.error = str(e)
+            self.state = 'failed'
+        finally:
+            self.finished = time.time()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'name': self.name,
+            'state': self.state,
+            'files_done': self.done,
+            'files_total': self.total,
+            'records': 0 if self.df is None else len(self.df),
+            'errors': self.errors,
+            'error': self.error,
+            'wait_s': round((self.started or time.time()) - self.submitted, 3),
+            'run_s': round(self.finished - self.started, 3) if self.finished and self.started else None,
+        }
+
+class BatchService:
+    """Jobs by id, run a few at a time on a thread pool, their files on one shared process pool"""
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, max_running: int = MAX_RUNNING_JOBS,
+                 max_queued: int = MAX_QUEUED_JOBS):
+        self.workers = workers
+        self.max_running = max_running
+        self.max_queued = max_queued
+        self.pool = IsolatedPool(max_workers=workers)
+        self._runner = ThreadPoolExecutor(max_workers=max_running, thread_name_prefix='api-job')
+        self._jobs: Dict[str, ApiJob] = {}
+        self._lock = threading.Lock()
+
+    def _count(self, state: str) -> int:
+        return sum(job.state == state for job in self._jobs.values())
+
+    def submit(self, kind: str, name: str, data: bytes, extractor: str) -> ApiJob:
+        job = ApiJob(kind, name, data, extractor)
+        with self._lock:
+            self._prune()
+            if self._count('queued') >= self.max_queued:
+                raise ServiceError(503, f"{self.max_queued} jobs are already waiting, try again later")
+            self._jobs[job.id] = job
+        self._runner.submit(job.run, self.workers, self.pool)
+        return job
+
+    def get(self, job_id: str) -> ApiJob:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            raise ServiceError(404, f"no job {job_id}")
+        return job
+
+    def delete(self, job_id: str):
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+        if job is None:
+            raise ServiceError(404, f"no job {job_id}")
+        if job.state == 'queued':
+            job.state = 'deleted'
+
+    def health(self) -> Dict[str, Any]:
+        with self._lock:
+            running, queued = self._count('running'), self._count('queued')
+        return {
+            'workers': self.workers,
+            'running': running,
+            'queued': queued,
+            'limits': {'running': self.max_running, 'queued': self.max_queued, 'upload_bytes': MAX_UPLOAD_BYTES},
+        }
+
+    def _prune(self):
+        cutoff = time.time() - JOB_RETENTION_S
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished and job.finished < cutoff]:
+            del self._jobs[job_id]
+
+    def shutdown(self):
+        self._runner.shutdown(wait=False, cancel_futures=True)
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+def result_body(job: ApiJob, result_format: str) -> bytes:
+    """A finished job's rows in result_format (json, csv or xlsx)"""
+    if job.state != 'done':
+        raise ServiceError(409, f"job {job.id} is {job.state}")
+    df = job.df
+    if result_format == 'json':
+        records = '[]' if df is None else df.to_json(orient='records', date_format='iso')
+        return f'{{"job": {json.dumps(job.to_dict())}, "records": {records}}}'.encode('utf-8')
+    if df is None:
+        raise ServiceError(404, f"job {job.id} found no {job.kind.upper()} items")
+    if result_format == 'csv':
+        return df.to_csv(index=False).encode('utf-8')
+    return excel_bytes(df, PROCESSORS[job.kind][1])
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    server_version = 'GrnPrnApi/1.0'
+    protocol_version = 'HTTP/1.1'
+
+    @property
+    def service(self) -> BatchService:
+        return self.server.service
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def _send(self, status: int, body: bytes, content_type: str = 'application/json', headers=()):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for header in headers:
+            self.send_header(*header)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, payload, headers=()):
+        self._send(status, json.dumps(payload).encode('utf-8'), headers=headers)
+
+    def _route(self) -> Tuple[list, Dict[str, str]]:
+        url = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        return [part for part in url.path.split('/') if part], query
+
+    def _handle(self, method: str):
+        if not self.server.connections.acquire(blocking=False):
+            self._send_json(503, {'error': 'too many requests in progress'}, [('Retry-After', '1')])
+            self.close_connection = True
+            return
+        try:
+            parts, query = self._route()
+            getattr(self, f'_{method}')(parts, query)
+        except ServiceError as e:
+            headers = [('Retry-After', '5')] if e.status == 503 else []
+            if e.status in (400, 411, 413):
+                self.close_connection = True  # the body may not have been read
+            self._send_json(e.status, {'error': str(e)}, headers)
+        except Exception as e:
+            self._send_json(500, {'error': f"{type(e).__name__}: {e}"})
+        finally:
+            self.server.connections.release()
+
+    def do_GET(self):
+        self._handle('get')
+
+    def do_POST(self):
+        self._handle('post')
+
+    def do_DELETE(self):
+        self._handle('delete')
+
+    def _get(self, parts, query):
+        if parts == ['health']:
+            self._send_json(200, self.service.health())
+        elif len(parts) == 2 and parts[0] == 'jobs':
+            self._send_json(200, self.service.get(parts[1]).to_dict())
+        elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'result':
+            result_format = query.get('format', 'json')
+            if result_format not in RESULT_TYPES:
+                raise ServiceError(400, f"format must be one of {', '.join(RESULT_TYPES)}")
+            job = self.service.get(parts[1])
+            body = result_body(job, result_format)
+            disposition = f'attachment; filename="{job.kind}_{job.id[:8]}.{result_format}"'
+            self._send(200, body, RESULT_TYPES[result_format], [('Content-Disposition', disposition)])
+        else:
+            raise ServiceError(404, f"no such endpoint: GET {self.path}")
+
+    def _post(self, parts, query):
+        if len(parts) != 2 or parts[0] != 'jobs' or parts[1] not in PROCESSORS:
+            raise ServiceError(404, f"no such endpoint: POST {self.path} (use /jobs/grn or /jobs/prn)")
+        length = self.headers.get('Content-Length')
+        if length is None:
+            raise ServiceError(411, "Content-Length is required")
+        try:
+            length = int(length)
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise ServiceError(400, "Content-Length must be a non-negative integer")
+        if length > MAX_UPLOAD_BYTES:
+            raise ServiceError(413, f"uploads are limited to {MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+        data = self.rfile.read(length)
+        if not data:
+            raise ServiceError(400, "empty upload")
+        extractor = query.get('extractor', DEFAULT_EXTRACTOR)
+        if extractor not in available_extractors():
+            raise ServiceError(400, f"extractor {extractor} is not installed")
+        # ZIP archives are recognised by name, so an unnamed archive is named for its signature
+        name = query.get('name') or ('upload.zip' if data[:4] == b'PK\x03\x04' else 'upload.pdf')
+        job = self.service.submit(parts[1], name, data, extractor)
+        self._send_json(202, job.to_dict(), [('Location', f'/jobs/{job.id}')])
+
+    def _delete(self, parts, query):
+        if len(parts) != 2 or parts[0] != 'jobs':
+            raise ServiceError(404, f"no such endpoint: DELETE {self.path}")
+        self.service.delete(parts[1])
+        self._send_json(200, {'deleted': parts[1]})
+
+class ServiceServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service: BatchService, max_connections: int = MAX_CONNECTIONS, quiet: bool = False):
+        super().__init__(address, ServiceHandler)
+        self.service = service
+        self.connections = threading.BoundedSemaphore(max_connections)
+        self.quiet = quiet
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m api', description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8502, help='port to listen on (default: 8502)')
+    parser.add_argument('-w', '--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'worker processes shared by all jobs (default: {DEFAULT_WORKERS})')
+    parser.add_argument('--max-running', type=int, default=MAX_RUNNING_JOBS,
+                        help=f'jobs processed at once (default: {MAX_RUNNING_JOBS})')
+    parser.add_argument('--max-queued', type=int, default=MAX_QUEUED_JOBS,
+                        help=f'jobs allowed to wait (default: {MAX_QUEUED_JOBS})')
+    parser.add_argument('--max-connections', type=int, default=MAX_CONNECTIONS,
+                        help=f'requests handled at once (default: {MAX_CONNECTIONS})')
+    parser.add_argument('-q', '--quiet', action='store_true', help='no request log')
+    args = parser.parse_args(argv)
+
+    if DEFAULT_EXTRACTOR not in available_extractors():
+        parser.error(f"extractor {DEFAULT_EXTRACTOR} is not installed")
+
+    service = BatchService(args.workers, args.max_running, args.max_queued)
+    server = ServiceServer((args.host, args.port), service, args.max_connections, args.quiet)
+    print(f"Serving GRN/PRN jobs on http://{args.host}:{server.server_port} "
+          f"({args.workers} workers, {args.max_running} jobs at once)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,10 +1,17 @@
 import streamlit as st
-import re
-from PyPDF2 import PdfReader
-import pandas as pd
-from io import BytesIO
+import json
 import time
-from typing import Dict, Any, List
+import uuid
+from io import BytesIO
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from archive import open_archive
+from extractors import DEFAULT_EXTRACTOR, available_extractors
+from jobs import JobManager
+from processing import IncrementalBatch, ProcessingStats, excel_bytes, text_cache
+from scheduler import FileScheduler
 
 # Streamlit app configuration (must be the first Streamlit command)
 st.set_page_config(page_title="Nature's Basket PDF Parser", layout="wide", page_icon="📑")
@@ -111,357 +118,11 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# GRN Parser Functions
-def extract_text_from_pdf_bytes(pdf_bytes) -> str:
-    """Extract text content from PDF bytes"""
-    try:
-        reader = PdfReader(BytesIO(pdf_bytes))
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() + "\n"
-        return text
-    except Exception as e:
-        return ""
-
-def parse_grn_text(text: str) -> Dict[str, Any]:
-    """Parse GRN text content and extract metadata and product details"""
-    
-    # Initialize result dictionary
-    result = {
-        'metadata': {},
-        'products': []
-    }
-    
-    # Extract store name/location - look for "NB " followed by location
-    store_patterns = [
-        r'NB ([^\n]+?)(?=\n|Nature\'s Basket)',
-        r'NB ([^\n]+)',
-        r'(NB [^\n]+)'
-    ]
-    
-    for pattern in store_patterns:
-        store_match = re.search(pattern, text, re.IGNORECASE)
-        if store_match:
-            result['metadata']['store_name'] = store_match.group(1).strip()
-            break
-    
-    # Extract vendor code
-    vendor_code_match = re.search(r'Vendor Code\s*:([^\n]+)', text)
-    if vendor_code_match:
-        result['metadata']['vendor_code'] = vendor_code_match.group(1).strip()
-    
-    # Extract vendor name
-    vendor_name_match = re.search(r'Vendor Name\s*:([^\n]+)', text)
-    if vendor_name_match:
-        result['metadata']['vendor_name'] = vendor_name_match.group(1).strip()
-    
-    # Extract vendor address
-    address_match = re.search(r'Address\s*:([^\n]+(?:\n[^\n]+)*?)(?=Status|Inv\.No)', text, re.DOTALL)
-    if address_match:
-        address_lines = [line.strip() for line in address_match.group(1).split('\n') if line.strip() and not line.strip().startswith(':')]
-        result['metadata']['vendor_address'] = ' '.join(address_lines)
-    
-    # Extract invoice number
-    inv_no_match = re.search(r'Inv\.No\s*:([^\n\s]+)', text)
-    if inv_no_match:
-        result['metadata']['invoice_no'] = inv_no_match.group(1).strip()
-    
-    # Extract invoice date
-    inv_date_match = re.search(r'Inv\.Date\s*:([^\n\s]+)', text)
-    if inv_date_match:
-        result['metadata']['invoice_date'] = inv_date_match.group(1).strip()
-    
-    # Extract invoice value
-    inv_value_match = re.search(r'Inv\.Value\s*:([^\n\s]+)', text)
-    if inv_value_match:
-        result['metadata']['invoice_value'] = inv_value_match.group(1).strip()
-    
-    # Extract invoice tax value
-    inv_tax_val_match = re.search(r'Inv\.Tax Val\s*:([^\n\s]+)', text)
-    if inv_tax_val_match:
-        result['metadata']['invoice_tax_value'] = inv_tax_val_match.group(1).strip()
-    
-    # Extract GIN number
-    gin_no_match = re.search(r'GIN No\s*:([^\n\s]+)', text)
-    if gin_no_match:
-        result['metadata']['gin_no'] = gin_no_match.group(1).strip()
-    
-    # Extract GIN date
-    gin_date_match = re.search(r'GIN Date\s*:([^\n\s]+)', text)
-    if gin_date_match:
-        result['metadata']['gin_date'] = gin_date_match.group(1).strip()
-    
-    # Extract GRN number
-    grn_no_match = re.search(r'GRN No\s*:([^\n\s]+)', text)
-    if grn_no_match:
-        result['metadata']['grn_no'] = grn_no_match.group(1).strip()
-    
-    # Extract GRN date
-    grn_date_match = re.search(r'GRN Date\s*:([^\n\s]+)', text)
-    if grn_date_match:
-        result['metadata']['grn_date'] = grn_date_match.group(1).strip()
-    
-    # Extract PO number
-    po_no_match = re.search(r'PO\.No\s*:([^\n\s]+)', text)
-    if po_no_match:
-        result['metadata']['po_no'] = po_no_match.group(1).strip()
-    
-    # Extract PO date
-    po_date_match = re.search(r'PO\.Date\s*:([^\n\s]+)', text)
-    if po_date_match:
-        result['metadata']['po_date'] = po_date_match.group(1).strip()
-    
-    # Extract P.SLIP.No
-    p_slip_match = re.search(r'P\.SLIP\.No\s*:([^\n\s]+)', text)
-    if p_slip_match:
-        result['metadata']['p_slip_no'] = p_slip_match.group(1).strip()
-    
-    # Extract Vendor GST IN
-    vendor_gst_match = re.search(r'Vendor GST IN\s*:([^\n\s]+)', text)
-    if vendor_gst_match:
-        result['metadata']['vendor_gst_in'] = vendor_gst_match.group(1).strip()
-    
-    # Extract company GST number
-    company_gst_match = re.search(r'GST NO\s*:([^\n\s]+)', text)
-    if company_gst_match:
-        result['metadata']['company_gst_no'] = company_gst_match.group(1).strip()
-    
-    # Extract totals from the TOTAL line
-    total_match = re.search(r'TOTAL\s+([\d.]+)\s+([\d.]+)\s+([\d.]+)\s+([\d.]+)\s+([\d.]+)', text)
-    if total_match:
-        result['metadata']['total_gst_value'] = total_match.group(1).strip()
-        result['metadata']['total_received_qty'] = total_match.group(2).strip()
-        result['metadata']['total_accepted_qty'] = total_match.group(3).strip()
-        result['metadata']['total_rejected_qty'] = total_match.group(4).strip()
-        result['metadata']['total_cost_value'] = total_match.group(5).strip()
-    
-    # Extract gross value
-    gross_value_match = re.search(r'Gross Value\s+([\d.]+)', text)
-    if gross_value_match:
-        result['metadata']['gross_value'] = gross_value_match.group(1).strip()
-    
-    # Extract product details
-    lines = text.split('\n')
-    
-    i = 0
-    while i < len(lines):
-        line = lines[i].strip()
-        
-        # Check if line starts with a number followed by a 7-digit article code
-        if re.match(r'^\d+\s+\d{7}', line):
-            try:
-                # Split the line into parts
-                parts = line.split()
-                
-                # Make sure we have enough parts for a valid product line
-                if len(parts) >= 9:
-                    # Initialize product dictionary
-                    product = {
-                        'serial_no': parts[0],
-                        'article_code': parts[1],
-                        'ean_code': parts[2],
-                        'gst_value': parts[3],
-                        'received_qty': parts[4],
-                        'accepted_qty': parts[5],
-                        'rejected_qty': parts[6],
-                        'uom': parts[7],
-                        'mrp': parts[8],
-                        'total_cost_value': parts[9] if len(parts) > 9 else "",
-                        'description': "",
-                        'hsn_code': ""
-                    }
-                    
-                    # Look for the description line (starts with "TBD")
-                    if i + 1 < len(lines):
-                        next_line = lines[i + 1].strip()
-                        if next_line.startswith("TBD"):
-                            # Parse the description line
-                            desc_parts = next_line.split()
-                            if len(desc_parts) >= 2:
-                                # The last part is usually the HSN code (if it's all digits)
-                                if desc_parts[-1].isdigit() and len(desc_parts[-1]) >= 6:
-                                    product['hsn_code'] = desc_parts[-1]
-                                    # Everything between TBD and HSN code is the description
-                                    product['description'] = ' '.join(desc_parts[1:-1])
-                                else:
-                                    # No HSN code found, everything after TBD is description
-                                    product['description'] = ' '.join(desc_parts[1:])
-                    
-                    result['products'].append(product)
-                    
-            except (IndexError, ValueError) as e:
-                continue
-        
-        i += 1
-    
-    return result
-
-# PRN Parser Functions
-# PRN Parser Functions
-def parse_prn_documents(text: str) -> List[Dict[str, Any]]:
-    """Parse PRN documents from text - handles Goods Return Delivery Challan format"""
-    all_records = []
-    
-    # Split the text into individual delivery challans
-    documents = text.split("GOODS RETURN DELIVERY CHALLAN")
-    
-    # Process each document
-    for doc_idx, doc in enumerate(documents[1:], 1):  # Skip the initial header
-        try:
-            # Extract metadata using more flexible patterns
-            metadata = {}
-            
-            # Store name - look for NB followed by location
-            store_match = re.search(r'NB ([^\n]+?)(?=\n|NATURE)', doc, re.IGNORECASE)
-            if store_match:
-                metadata['store'] = store_match.group(1).strip()
-            
-            # Vendor code
-            vendor_code_match = re.search(r'Vendor Code\s*:([^\n]+)', doc)
-            if vendor_code_match:
-                metadata['vendor_code'] = vendor_code_match.group(1).strip()
-            
-            # Vendor name
-            vendor_name_match = re.search(r'Vendor Name\s*:([^\n]+)', doc)
-            if vendor_name_match:
-                metadata['vendor_name'] = vendor_name_match.group(1).strip()
-            
-            # Vendor address
-            address_match = re.search(r'Address\s*:([^\n:]+(?:\n[^\n:]+)*?)(?=GSTIN|Vendor Code|\n\s*:)', doc, re.DOTALL)
-            if address_match:
-                address_lines = [line.strip() for line in address_match.group(1).split('\n') if line.strip() and not line.strip().startswith(':')]
-                metadata['vendor_address'] = ' '.join(address_lines)
-            
-            # GST numbers
-            gstin_matches = re.findall(r'GSTIN\s*:([^\s\n]+)', doc)
-            if len(gstin_matches) >= 2:
-                metadata['vendor_gstin'] = gstin_matches[0].strip()
-                metadata['company_gstin'] = gstin_matches[1].strip()
-            elif len(gstin_matches) == 1:
-                metadata['vendor_gstin'] = gstin_matches[0].strip()
-            
-            # Document details
-            doc_no_match = re.search(r'Doc No\s*:([^\n/]+)', doc)
-            if doc_no_match:
-                metadata['doc_no'] = doc_no_match.group(1).strip()
-            
-            # Reference document number
-            ref_doc_match = re.search(r'Ref\.Doc\.No\s*:([^\n/]+)', doc)
-            if ref_doc_match:
-                metadata['ref_doc_no'] = ref_doc_match.group(1).strip()
-            
-            # Invoice date
-            invoice_date_match = re.search(r'Invoice Date\s*:([^\n]+)', doc)
-            if invoice_date_match:
-                metadata['invoice_date'] = invoice_date_match.group(1).strip()
-            
-            # Order details
-            order_no_match = re.search(r'Order No\s*:([^\n]+)', doc)
-            if order_no_match:
-                metadata['order_no'] = order_no_match.group(1).strip()
-            
-            order_date_match = re.search(r'Order Date\s*:([^\n]+)', doc)
-            if order_date_match:
-                metadata['order_date'] = order_date_match.group(1).strip()
-            
-            # P.Slip No
-            pslip_match = re.search(r'P\.Slip No\.\s*:([^\n]+)', doc)
-            if pslip_match:
-                metadata['pslip_no'] = pslip_match.group(1).strip()
-            
-            # Extract totals
-            total_match = re.search(r'TOTAL\s+([\d.]+)\s+([\d.]+)', doc)
-            if total_match:
-                metadata['total_qty'] = total_match.group(1).strip()
-                metadata['total_value'] = total_match.group(2).strip()
-            
-            # Final value
-            final_value_match = re.search(r'FINAL VALUE\s+([\d.]+)', doc)
-            if final_value_match:
-                metadata['final_value'] = final_value_match.group(1).strip()
-            
-            # Extract line items using more flexible pattern
-            lines = doc.split('\n')
-            
-            i = 0
-            while i < len(lines):
-                line = lines[i].strip()
-                
-                # Look for line items that start with serial number
-                if re.match(r'^\d+\s+\d{7}', line):
-                    try:
-                        # Parse the main line
-                        parts = line.split()
-                        if len(parts) >= 10:  # Minimum required fields
-                            
-                            # Create product record
-                            product = {
-                                'sno': parts[0],
-                                'article_code': parts[1],
-                                'ean_code': parts[2],
-                                'ref_po': parts[3],
-                                'qty': parts[4],
-                                'uom': parts[5],
-                                'mrp': parts[6],
-                                'cost': parts[7],
-                                'value': parts[8],
-                                'reason': parts[9],
-                                'sgst': parts[10] if len(parts) > 10 else '0.00',
-                                'cgst': parts[11] if len(parts) > 11 else '0.00',
-                                'igst': parts[12] if len(parts) > 12 else '0.00',
-                                'gst_cess': parts[13] if len(parts) > 13 else '0.00',
-                                'adv_cess': parts[14] if len(parts) > 14 else '0.00',
-                                'net_val': parts[15] if len(parts) > 15 else parts[8],  # Use value if net_val not available
-                                'description': '',
-                                'hsn_code': ''
-                            }
-                            
-                            # Look for description in the next line
-                            if i + 1 < len(lines):
-                                next_line = lines[i + 1].strip()
-                                if next_line.startswith('TBD'):
-                                    desc_parts = next_line.split()
-                                    if len(desc_parts) > 1:
-                                        # Extract description (everything after TBD)
-                                        desc_text = ' '.join(desc_parts[1:])
-                                        product['description'] = desc_text
-                                        
-                                        # Look for HSN code in the next line
-                                        if i + 2 < len(lines):
-                                            hsn_line = lines[i + 2].strip()
-                                            if re.match(r'^\d{8}', hsn_line):
-                                                hsn_parts = hsn_line.split()
-                                                product['hsn_code'] = hsn_parts[0]
-                                                # Add reason if available
-                                                if len(hsn_parts) > 1:
-                                                    product['return_reason'] = ' '.join(hsn_parts[1:])
-                                            elif 'Date expired' in hsn_line:
-                                                product['return_reason'] = 'Date expired'
-                                                # Try to extract HSN from the description line
-                                                hsn_match = re.search(r'(\d{8})', desc_text)
-                                                if hsn_match:
-                                                    product['hsn_code'] = hsn_match.group(1)
-                                                    # Clean description
-                                                    product['description'] = desc_text.replace(hsn_match.group(1), '').strip()
-                            
-                            # Combine metadata and product data
-                            record = {**metadata, **product}
-                            all_records.append(record)
-                            
-                    except (IndexError, ValueError) as e:
-                        # Skip malformed lines
-                        continue
-                
-                i += 1
-                
-        except Exception as e:
-            # Log the error but continue processing other documents
-            continue
-    
-    return all_records
 
 # Initialize session state
 def init_session_state():
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
     if 'grn_files' not in st.session_state:
         st.session_state.grn_files = []
     if 'prn_files' not in st.session_state:
@@ -478,97 +139,611 @@ def init_session_state():
         st.session_state.grn_errors = []
     if 'prn_errors' not in st.session_state:
         st.session_state.prn_errors = []
+    if 'grn_excel' not in st.session_state:
+        st.session_state.grn_excel = None
+    if 'prn_excel' not in st.session_state:
+        st.session_state.prn_excel = None
+    if 'grn_checks' not in st.session_state:
+        st.session_state.grn_checks = None
+    if 'prn_checks' not in st.session_state:
+        st.session_state.prn_checks = None
+    if 'grn_preview' not in st.session_state:
+        st.session_state.grn_preview = None
+    if 'prn_preview' not in st.session_state:
+        st.session_state.prn_preview = None
+    if 'grn_stats' not in st.session_state:
+        st.session_state.grn_stats = None
+    if 'prn_stats' not in st.session_state:
+        st.session_state.prn_stats = None
+    if 'grn_batch' not in st.session_state:
+        st.session_state.grn_batch = IncrementalBatch('grn')
+    if 'prn_batch' not in st.session_state:
+        st.session_state.prn_batch = IncrementalBatch('prn')
+    if 'grn_duplicates' not in st.session_state:
+        st.session_state.grn_duplicates = []
+    if 'prn_duplicates' not in st.session_state:
+        st.session_state.prn_duplicates = []
+    if 'grn_signature' not in st.session_state:
+        st.session_state.grn_signature = None
+    if 'prn_signature' not in st.session_state:
+        st.session_state.prn_signature = None
+    if 'grn_job' not in st.session_state:
+        st.session_state.grn_job = None
+    if 'prn_job' not in st.session_state:
+        st.session_state.prn_job = None
+    if 'grn_adopted' not in st.session_state:
+        st.session_state.grn_adopted = None
+    if 'prn_adopted' not in st.session_state:
+        st.session_state.prn_adopted = None
+    if 'grn_job_message' not in st.session_state:
+        st.session_state.grn_job_message = None
+    if 'prn_job_message' not in st.session_state:
+        st.session_state.prn_job_message = None
+    if 'archive_result' not in st.session_state:
+        st.session_state.archive_result = None
+    if 'net_result' not in st.session_state:
+        st.session_state.net_result = None
+    if 'mixed_result' not in st.session_state:
+        st.session_state.mixed_result = None
+
+def frame_memory_summary(df):
+    """memory_summary, imported once there is a frame so a fresh page doesn't load pandas"""
+    from frames import memory_summary
+    return memory_summary(df)
+
+def check_totals(kind: str, df):
+    """reconcile, imported once there is a frame so a fresh page doesn't load pandas"""
+    if df is None:
+        return None
+    from reconcile import reconcile
+    return reconcile(df, kind)
+
+def upload_signature(files):
+    """Identify an upload by the names and sizes of its files"""
+    return tuple((f.name, getattr(f, 'size', None)) for f in files)
+
+def get_excel_download(kind: str, df, sheet_name: str):
+    """Return (workbook bytes, file name) for the current result of a tab.
+
+    The workbook is built the first time it's needed for a processed result and
+    kept in session state, so reruns (tab switches, widget clicks) reuse it; a new
+    result or a Clear replaces the cached entry.
+    """
+    cached = st.session_state[f'{kind}_excel']
+    if cached is None or cached['data'] is not df:
+        stats = st.session_state[f'{kind}_stats'] or ProcessingStats()
+        checks = st.session_state[f'{kind}_checks']
+        with stats.stage('export'):
+            data = excel_bytes(df, sheet_name, None if checks is None else {'Totals_Check': checks})
+        st.session_state[f'{kind}_excel'] = cached = {
+            'data': df,
+            'bytes': data,
+            'file_name': f"{kind}_data_{time.strftime('%Y%m%d_%H%M%S')}.xlsx",
+        }
+    return cached['bytes'], cached['file_name']
+
+@st.cache_resource
+def get_archive():
+    """The SQLite archive configured by PDF_ARCHIVE_DB (None when archiving is off), shared by all sessions"""
+    return open_archive()
 
-def process_grn_files(files):
-    """Process GRN files and return DataFrame"""
-    all_data = []
-    errors = []
+@st.cache_resource
+def get_scheduler():
+    """The worker pool shared by every session, which takes files from each session in turn"""
+    return FileScheduler()
+
+@st.cache_resource
+def get_job_manager():
+    """Background jobs of every session, so a job survives reruns and page reloads"""
+    return JobManager(get_scheduler())
+
+def current_job(kind: str):
+    """The last job started for a tab in this session, or the one named in the URL after a reload"""
+    job_id = st.session_state[f'{kind}_job'] or st.query_params.get(f'{kind}_job')
+    return get_job_manager().get(job_id)
+
+def start_job(kind: str, files, workers: int, extractor: str):
+    """Process files into the tab's batch on a background thread and remember the job in the URL"""
+    archive = get_archive()
     
-    for uploaded_file in files:
-        try:
-            # Extract text from PDF
-            text = extract_text_from_pdf_bytes(uploaded_file.read())
-            
-            if not text:
-                errors.append(f"Could not extract text from {uploaded_file.name}")
-                continue
-            
-            # Parse the text
-            parsed_data = parse_grn_text(text)
-            
-            # Convert to rows for DataFrame
-            for product in parsed_data['products']:
-                row = {
-                    'filename': uploaded_file.name,
-                    'store_name': parsed_data['metadata'].get('store_name', ''),
-                    'vendor_code': parsed_data['metadata'].get('vendor_code', ''),
-                    'vendor_name': parsed_data['metadata'].get('vendor_name', ''),
-                    'vendor_address': parsed_data['metadata'].get('vendor_address', ''),
-                    'vendor_gst_in': parsed_data['metadata'].get('vendor_gst_in', ''),
-                    'company_gst_no': parsed_data['metadata'].get('company_gst_no', ''),
-                    'invoice_no': parsed_data['metadata'].get('invoice_no', ''),
-                    'invoice_date': parsed_data['metadata'].get('invoice_date', ''),
-                    'invoice_value': parsed_data['metadata'].get('invoice_value', ''),
-                    'invoice_tax_value': parsed_data['metadata'].get('invoice_tax_value', ''),
-                    'gin_no': parsed_data['metadata'].get('gin_no', ''),
-                    'gin_date': parsed_data['metadata'].get('gin_date', ''),
-                    'grn_no': parsed_data['metadata'].get('grn_no', ''),
-                    'grn_date': parsed_data['metadata'].get('grn_date', ''),
-                    'po_no': parsed_data['metadata'].get('po_no', ''),
-                    'po_date': parsed_data['metadata'].get('po_date', ''),
-                    'p_slip_no': parsed_data['metadata'].get('p_slip_no', ''),
-                    'total_gst_value': parsed_data['metadata'].get('total_gst_value', ''),
-                    'total_received_qty': parsed_data['metadata'].get('total_received_qty', ''),
-                    'total_accepted_qty': parsed_data['metadata'].get('total_accepted_qty', ''),
-                    'total_rejected_qty': parsed_data['metadata'].get('total_rejected_qty', ''),
-                    'total_cost_value': parsed_data['metadata'].get('total_cost_value', ''),
-                    'gross_value': parsed_data['metadata'].get('gross_value', ''),
-                    'serial_no': product.get('serial_no', ''),
-                    'article_code': product.get('article_code', ''),
-                    'ean_code': product.get('ean_code', ''),
-                    'description': product.get('description', ''),
-                    'hsn_code': product.get('hsn_code', ''),
-                    'gst_value': product.get('gst_value', ''),
-                    'received_qty': product.get('received_qty', ''),
-                    'accepted_qty': product.get('accepted_qty', ''),
-                    'rejected_qty': product.get('rejected_qty', ''),
-                    'uom': product.get('uom', ''),
-                    'mrp': product.get('mrp', ''),
-                    'product_total_cost_value': product.get('total_cost_value', '')
-                }
-                all_data.append(row)
-                
-        except Exception as e:
-            errors.append(f"Error processing {uploaded_file.name}: {str(e)}")
-    
-    return pd.DataFrame(all_data) if all_data else None, errors
-
-def process_prn_files(files):
-    """Process PRN files and return DataFrame"""
-    all_records = []
-    errors = []
-    
-    for uploaded_file in files:
-        try:
-            # Read the PDF file
-            text = extract_text_from_pdf_bytes(uploaded_file.read())
-            
-            if not text:
-                errors.append(f"Could not extract text from {uploaded_file.name}")
-                continue
-            
-            # Parse PRN documents
-            records = parse_prn_documents(text)
-            
-            # Add filename to each record
-            for record in records:
-                record['filename'] = uploaded_file.name
-                all_records.append(record)
-            
-        except Exception as e:
-            errors.append(f"Error processing {uploaded_file.name}: {str(e)}")
+    def archive_new_documents(job):
+        # Runs on the job thread, so it uses the archive resolved here
+        if archive is None:
+            return
+        archived = sum(
+            archive.ingest_documents(kind, name, documents) for name, documents in job.batch.new_documents
+        )
+        job.notes.append(f"{archived} item(s) archived")
+    
+    job = get_job_manager().submit(
+        kind,
+        st.session_state[f'{kind}_batch'],
+        files,
+        signature=upload_signature(files),
+        workers=workers,
+        extractor=extractor,
+        after=archive_new_documents,
+        session=st.session_state.session_id
+    )
+    st.session_state[f'{kind}_job'] = job.id
+    st.query_params[f'{kind}_job'] = job.id
+
+def adopt_job_result(kind: str, job):
+    """Show a finished job's result in its tab (once per job)"""
+    st.session_state[f'{kind}_adopted'] = job.id
+    st.session_state[f'{kind}_job'] = job.id
+    st.session_state[f'{kind}_batch'] = job.batch
+    st.session_state[f'{kind}_stats'] = job.stats
+    st.session_state[f'{kind}_signature'] = job.signature
+    st.session_state[f'{kind}_processed'] = True
+    
+    if job.state == 'failed':
+        st.session_state[f'{kind}_data'] = None
+        st.session_state[f'{kind}_checks'] = None
+        st.session_state[f'{kind}_errors'] = [f"Processing failed: {job.error}"]
+        st.session_state[f'{kind}_duplicates'] = []
+        st.session_state[f'{kind}_job_message'] = None
+        return
+    
+    df, errors, duplicates = job.result
+    st.session_state[f'{kind}_data'] = df
+    st.session_state[f'{kind}_checks'] = check_totals(kind, df)
+    st.session_state[f'{kind}_errors'] = errors
+    st.session_state[f'{kind}_duplicates'] = duplicates
+    notes = "".join(f", {note}" for note in job.notes)
+    if job.state == 'cancelled':
+        st.session_state[f'{kind}_job_message'] = (
+            f"⏹️ Cancelled after {job.done} of {job.total} new file(s){notes}. "
+            "Showing the files finished so far; process again to parse the rest."
+        )
+    else:
+        st.session_state[f'{kind}_job_message'] = (
+            f"Processing complete! ({job.stats.reused} file(s) reused from the previous run{notes})"
+        )
+
+def sync_job(kind: str) -> bool:
+    """Pick up the tab's job result once it has finished; returns whether a job is still running"""
+    job = current_job(kind)
+    if job is None:
+        return False
+    if not job.running:
+        if st.session_state[f'{kind}_adopted'] != job.id:
+            adopt_job_result(kind, job)
+        return False
+    return True
+
+def clear_job(kind: str):
+    """Cancel the tab's running job and forget it"""
+    job = current_job(kind)
+    if job is not None and job.running:
+        job.cancel()
+    st.session_state[f'{kind}_job'] = None
+    st.session_state[f'{kind}_adopted'] = None
+    st.session_state[f'{kind}_job_message'] = None
+    if f'{kind}_job' in st.query_params:
+        del st.query_params[f'{kind}_job']
+
+@st.experimental_fragment(run_every=1)
+def render_job_progress(kind: str):
+    """Poll the tab's running job: progress, cancel button and a preview of the finished files"""
+    job = current_job(kind)
+    if job is None or not job.running:
+        # Rerun the whole page to show the result
+        st.rerun()
+    
+    st.progress(job.done / job.total if job.total else 0)
+    st.text(f"Processed {job.done}/{job.total}: {job.current}" if job.done else "Reading uploaded files...")
+    render_queue_status(job)
+    
+    if job.cancelling:
+        st.caption("Cancelling after the files in progress...")
+    elif st.button("⏹️ Cancel", key=f"cancel_{kind}_job"):
+        job.cancel()
+    
+    preview = job.preview()
+    if preview is not None:
+        with st.expander(f"👀 Preview of finished files ({len(job.partial_documents())} done)", expanded=True):
+            st.dataframe(preview, use_container_width=True, height=300)
+
+def render_queue_status(job):
+    """Where the job's files stand in the shared queue, and roughly how long until they are done"""
+    status = job.queue_status()
+    if status is None or not (status['waiting'] or status['running']):
+        return
+    wait = "estimating the wait..." if status['wait_s'] is None else f"about {format_duration(status['wait_s'])} left"
+    if status['position'] is not None:
+        line = f"⏳ Waiting for a free worker: position {status['position']} in the queue, {wait}"
+    else:
+        line = f"⚙️ {status['running']} file(s) being processed, {status['waiting']} waiting, {wait}"
+    others = status['sessions'] - 1
+    if others > 0:
+        line += f" (the workers are shared with {others} other session(s))"
+    st.caption(line)
+    if status['memory_wait']:
+        st.caption("🧠 Memory is running low; new files start as running ones finish.")
+
+def format_duration(seconds: float) -> str:
+    """Seconds as e.g. '45 s' or '3 min'"""
+    return f"{seconds:.0f} s" if seconds < 90 else f"{seconds / 60:.0f} min"
+
+def _preview_cache(kind: str, df) -> dict:
+    """The tab's preview cache, reset when its result changes"""
+    cached = st.session_state[f'{kind}_preview']
+    if cached is None or cached['data'] is not df:
+        cached = {'data': df, 'summary': None, 'filters': None, 'rows': None}
+        st.session_state[f'{kind}_preview'] = cached
+    return cached
+
+def get_preview_summary(kind: str, df) -> dict:
+    """Return the result summary for the tab's preview, computed once per result"""
+    from preview import result_summary
+    
+    cached = _preview_cache(kind, df)
+    if cached['summary'] is None:
+        cached['summary'] = result_summary(df, kind)
+    return cached['summary']
+
+def get_preview_view(kind: str, df, filters: dict):
+    """Return the filtered and sorted rows for the tab's preview.
+
+    The filtered frame is computed once per filter/sort choice, so paging
+    through it only slices the cached frame.
+    """
+    from preview import filter_frame
+    
+    cached = _preview_cache(kind, df)
+    if cached['filters'] != filters:
+        cached['filters'] = filters
+        cached['rows'] = filter_frame(df, kind, **filters)
+    return cached['rows']
+
+def render_preview(kind: str, df):
+    """Summary aggregates or one filtered, sorted page of the tab's result"""
+    from preview import LARGE_PREVIEW_ROWS, PAGE_SIZES, page_count, page_of
+    
+    summary = get_preview_summary(kind, df)
+    view = st.radio(
+        "View",
+        ["Summary", "Rows"],
+        index=0 if len(df) > LARGE_PREVIEW_ROWS else 1,
+        horizontal=True,
+        key=f"{kind}_preview_view",
+        help=f"Results over {LARGE_PREVIEW_ROWS:,} rows open on the summary"
+    )
     
-    return pd.DataFrame(all_records) if all_records else None, errors
+    if view == "Summary":
+        line = f"**{summary['rows']:,} rows**"
+        if summary['documents'] is not None:
+            line += f" from {summary['documents']:,} documents"
+        line += f", quantity {summary['qty']:,.3f}, value {summary['value']:,.2f}"
+        if summary['dates'] is not None:
+            first, last = summary['dates']
+            line += f", dated {first:%d %b %Y} to {last:%d %b %Y}"
+        st.markdown(line)
+        col1, col2 = st.columns(2)
+        for col, table, label in ((col1, summary['per_vendor'], "Per vendor"), (col2, summary['per_store'], "Per store")):
+            if table is not None:
+                with col:
+                    st.markdown(f"**{label}**")
+                    st.dataframe(table, use_container_width=True, height=300, hide_index=True)
+        return
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        vendors = st.multiselect("Vendors", summary['vendors'], key=f"{kind}_preview_vendors")
+    with col2:
+        stores = st.multiselect("Stores", summary['stores'], key=f"{kind}_preview_stores")
+    with col3:
+        date_range = st.date_input(
+            "Document date",
+            value=(),
+            key=f"{kind}_preview_dates",
+            disabled=summary['dates'] is None,
+            help="Pick a start and end date for an inclusive range"
+        )
+    with col4:
+        article_code = st.text_input("Article code", key=f"{kind}_preview_article")
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        sort_by = st.selectbox("Sort by", ["(upload order)"] + list(df.columns), key=f"{kind}_preview_sort")
+    with col2:
+        ascending = st.radio("Order", ["Ascending", "Descending"], horizontal=True, key=f"{kind}_preview_order") == "Ascending"
+    with col3:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, key=f"{kind}_preview_page_size")
+    
+    filters = {
+        'vendors': tuple(vendors),
+        'stores': tuple(stores),
+        'date_from': date_range[0] if date_range else None,
+        'date_to': date_range[-1] if date_range else None,
+        'article_code': article_code.strip() or None,
+        'sort_by': None if sort_by == "(upload order)" else sort_by,
+        'ascending': ascending,
+    }
+    rows = get_preview_view(kind, df, filters)
+    pages = page_count(len(rows), page_size)
+    page_key = f"{kind}_preview_page"
+    if st.session_state.get(page_key, 1) > pages:
+        st.session_state[page_key] = 1
+    page = st.number_input("Page", min_value=1, max_value=pages, step=1, key=page_key)
+    
+    visible = page_of(rows, page, page_size)
+    st.dataframe(visible, use_container_width=True, height=400)
+    start = (page - 1) * page_size
+    filtered_note = f" (filtered from {len(df):,})" if len(rows) != len(df) else ""
+    st.caption(f"Rows {start + 1 if len(rows) else 0:,}–{start + len(visible):,} of {len(rows):,}{filtered_note}, page {page} of {pages}")
+
+def render_totals_check(kind: str):
+    """Documents of the tab's result whose line items don't add up to their printed totals"""
+    mismatches = st.session_state[f'{kind}_checks']
+    if mismatches is None:
+        return
+    from reconcile import mismatch_summary
+    
+    if mismatches.empty:
+        st.caption(f"🧮 {mismatch_summary(mismatches)}")
+        return
+    st.markdown(f'<div class="error-box">🧮 {mismatch_summary(mismatches)}; they are listed in the Totals_Check sheet of the Excel file.</div>', unsafe_allow_html=True)
+    with st.expander(f"🧮 Totals Check ({len(mismatches)} mismatch(es))", expanded=False):
+        st.dataframe(mismatches, use_container_width=True)
+
+def render_performance(kind: str):
+    """Show the stage timings of the last run of a tab in an expander"""
+    stats = st.session_state[f'{kind}_stats']
+    if stats is None:
+        return
+    
+    import pandas as pd
+    
+    with st.expander("⏱️ Performance", expanded=False):
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Total time", f"{stats.stages['total']:.2f} s")
+        col2.metric("Pages extracted", stats.pages)
+        col3.metric("Pages / sec", f"{stats.pages_per_second:.1f}")
+        
+        st.caption(f"Text extracted with {stats.extractor}")
+        if stats.rejected:
+            st.caption(
+                f"🔎 {stats.rejected} file(s) of the wrong type turned away before full extraction or parsing, "
+                f"skipping {stats.skipped_pages} page(s) (~{stats.saved_s:.1f} s of extraction saved)"
+            )
+        
+        st.markdown("**Stages** (extract and parse are summed over files and workers)")
+        st.dataframe(
+            pd.DataFrame({'stage': list(stats.stages), 'seconds': list(stats.stages.values())}),
+            use_container_width=True,
+            hide_index=True
+        )
+        st.markdown("**Per file**")
+        st.dataframe(pd.DataFrame(stats.files), use_container_width=True, hide_index=True, height=250)
+        
+        st.download_button(
+            label="📥 Download timings (JSON)",
+            data=json.dumps(stats.to_dict(), indent=2),
+            file_name=f"{kind}_timings_{time.strftime('%Y%m%d_%H%M%S')}.json",
+            mime="application/json",
+            key=f"download_{kind}_timings"
+        )
+
+def render_archive_tab():
+    """Query the SQLite archive by date range, vendor, store and article and export the slice"""
+    archive = get_archive()
+    if archive is None:
+        st.markdown('<div class="info-box">ℹ️ The archive is off. Set <code>PDF_ARCHIVE_DB</code> to a database file (e.g. in <code>.env</code>) to keep every processed GRN/PRN item and export slices of it later without re-uploading the PDFs.</div>', unsafe_allow_html=True)
+        return
+    
+    counts = archive.counts()
+    col1, col2 = st.columns(2)
+    for col, kind in ((col1, 'grn'), (col2, 'prn')):
+        items, documents = counts[kind]
+        with col:
+            st.markdown(f"""
+            <div class="metric-card">
+                <div class="metric-value">{items}</div>
+                <div class="metric-label">{kind.upper()} Items Archived ({documents} documents)</div>
+            </div>
+            """, unsafe_allow_html=True)
+    
+    kind = st.radio("Document type", ['grn', 'prn'], format_func=str.upper, horizontal=True, key="archive_kind")
+    col1, col2 = st.columns(2)
+    with col1:
+        date_range = st.date_input(
+            "GRN Date" if kind == 'grn' else "Invoice Date",
+            value=(),
+            key=f"archive_{kind}_dates",
+            help="Leave empty for all dates; pick a start and end date for an inclusive range"
+        )
+        store = st.text_input("Store contains", key=f"archive_{kind}_store")
+    with col2:
+        vendors = st.multiselect("Vendors", archive.vendors(kind), key=f"archive_{kind}_vendors")
+        article_code = st.text_input("Article code", key=f"archive_{kind}_article")
+    
+    if st.button("🔎 Query Archive", key="query_archive"):
+        dates = [date.isoformat() for date in date_range]
+        df = archive.query(
+            kind,
+            date_from=dates[0] if dates else None,
+            date_to=dates[-1] if dates else None,
+            vendors=vendors,
+            store=store.strip() or None,
+            article_code=article_code.strip() or None
+        )
+        # Kept until the next query so the download survives reruns
+        st.session_state.archive_result = {
+            'kind': kind,
+            'data': df,
+            'bytes': None if df.empty else excel_bytes(df, f'{kind.upper()}_Data'),
+            'file_name': f"{kind}_archive_{time.strftime('%Y%m%d_%H%M%S')}.xlsx",
+        }
+    
+    result = st.session_state.archive_result
+    if result is None:
+        return
+    df = result['data']
+    if df.empty:
+        st.markdown('<div class="error-box">❌ No archived items match these filters.</div>', unsafe_allow_html=True)
+        return
+    
+    st.markdown(f'<div class="success-box">✅ {len(df)} archived {result["kind"].upper()} item(s) match.</div>', unsafe_allow_html=True)
+    with st.expander("📊 View Archived Data", expanded=True):
+        st.dataframe(df, use_container_width=True, height=400)
+    
+    st.download_button(
+        label=f"📥 Download {result['kind'].upper()} Archive Slice",
+        data=result['bytes'],
+        file_name=result['file_name'],
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        key="download_archive_excel"
+    )
+
+def render_net_receipts_tab():
+    """Join GRN receipts with PRN returns into a net receipts workbook"""
+    archive = get_archive()
+    sources = ["This session's GRN/PRN results"] + (["Archive"] if archive is not None else [])
+    source = st.radio("Source", sources, horizontal=True, key="net_source")
+    
+    if source == "Archive":
+        date_range = st.date_input(
+            "Document date",
+            value=(),
+            key="net_dates",
+            help="GRN Date and PRN Invoice Date; leave empty for everything archived"
+        )
+    else:
+        grn_df, prn_df = st.session_state.grn_data, st.session_state.prn_data
+        if grn_df is None and prn_df is None:
+            st.markdown('<div class="info-box">ℹ️ Process GRN and/or PRN files in their tabs first, or pick the archive as source.</div>', unsafe_allow_html=True)
+            return
+        st.caption(
+            f"{0 if grn_df is None else len(grn_df)} GRN item(s) and {0 if prn_df is None else len(prn_df)} PRN item(s) from the other tabs"
+        )
+    
+    if st.button("🧮 Build Net Receipts", key="build_net"):
+        from net_receipts import net_receipt_sheets, write_net_receipts
+        
+        if source == "Archive":
+            dates = [date.isoformat() for date in date_range]
+            bounds = {'date_from': dates[0] if dates else None, 'date_to': dates[-1] if dates else None}
+            grn_df, prn_df = archive.query('grn', **bounds), archive.query('prn', **bounds)
+            grn_df, prn_df = (None if df.empty else df for df in (grn_df, prn_df))
+        if grn_df is None and prn_df is None:
+            st.session_state.net_result = {'sheets': None}
+        else:
+            with st.spinner("Joining receipts and returns..."):
+                sheets = net_receipt_sheets(grn_df, prn_df)
+                output = BytesIO()
+                write_net_receipts(sheets, output)
+            st.session_state.net_result = {
+                'sheets': sheets,
+                'bytes': output.getvalue(),
+                'file_name': f"net_receipts_{time.strftime('%Y%m%d_%H%M%S')}.xlsx",
+            }
+    
+    result = st.session_state.net_result
+    if result is None:
+        return
+    if result['sheets'] is None:
+        st.markdown('<div class="error-box">❌ No GRN or PRN items to join.</div>', unsafe_allow_html=True)
+        return
+    
+    positions = result['sheets']['Net_Positions']
+    col1, col2, col3 = st.columns(3)
+    for col, column, label in ((col1, 'received_value', 'Received Value'),
+                               (col2, 'returned_value', 'Returned Value'),
+                               (col3, 'net_value', 'Net Value')):
+        with col:
+            st.markdown(f"""
+            <div class="metric-card">
+                <div class="metric-value">{positions[column].sum():,.2f}</div>
+                <div class="metric-label">{label}</div>
+            </div>
+            """, unsafe_allow_html=True)
+    
+    st.markdown(f'<div class="success-box">✅ {len(positions)} vendor/article position(s) across {positions["vendor_code"].nunique()} vendor(s).</div>', unsafe_allow_html=True)
+    for name, sheet in result['sheets'].items():
+        with st.expander(f"📊 {name.replace('_', ' ')}", expanded=name == 'Net_Positions'):
+            st.dataframe(sheet, use_container_width=True, height=400, hide_index=True)
+    
+    st.download_button(
+        label="📥 Download Net Receipts Workbook",
+        data=result['bytes'],
+        file_name=result['file_name'],
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        key="download_net_excel"
+    )
+
+# Mixed GRN/PRN uploads
+def process_mixed_uploads(files, extractor: str) -> dict:
+    """Parse a combined upload of GRN and PRN files on the shared pool, reading each file once.
+
+    The result stays in the Mixed Upload tab; the GRN and PRN tabs keep their own batches.
+    """
+    from processing import process_mixed_files
+    
+    scheduler = get_scheduler()
+    bar = st.progress(0.0, text="Reading uploaded files...")
+    
+    def progress(done: int, total: int, name: str):
+        bar.progress(done / total if total else 1.0, text=f"Processed {done}/{total}: {name}")
+    
+    stats = ProcessingStats()
+    grn_df, prn_df, errors = process_mixed_files(
+        files, workers=scheduler.workers, progress=progress, stats=stats, extractor=extractor,
+        executor=scheduler.executor(st.session_state.session_id)
+    )
+    bar.empty()
+    sheets = {name: df for name, df in (('GRN_Data', grn_df), ('PRN_Data', prn_df)) if df is not None}
+    result = {'grn': grn_df, 'prn': prn_df, 'errors': errors, 'stats': stats, 'bytes': None}
+    if sheets:
+        (first, df), *rest = sheets.items()
+        with stats.stage('export'):
+            result['bytes'] = excel_bytes(df, first, dict(rest))
+        result['file_name'] = f"grn_prn_data_{time.strftime('%Y%m%d_%H%M%S')}.xlsx"
+    return result
+
+def render_mixed_tab(extractor: str):
+    """Process one upload of GRN and PRN files, each file sorted by its own text"""
+    mixed_files = st.file_uploader(
+        "Choose GRN and PRN PDF files, or ZIP archives of them",
+        type=["pdf", "zip"],
+        accept_multiple_files=True,
+        key="mixed_uploader",
+        help="Each file's type is told from its text; unrecognised files and files without text are reported as errors"
+    )
+    
+    if st.button("🔀 Sort and Process", disabled=not mixed_files, key="process_mixed"):
+        st.session_state.mixed_result = process_mixed_uploads(mixed_files, extractor)
+    
+    result = st.session_state.mixed_result
+    if result is None:
+        return
+    if result['bytes'] is None:
+        st.markdown('<div class="error-box">❌ No GRN or PRN items found in the upload.</div>', unsafe_allow_html=True)
+    else:
+        col1, col2 = st.columns(2)
+        for col, kind in ((col1, 'grn'), (col2, 'prn')):
+            with col:
+                st.markdown(f"""
+                <div class="metric-card">
+                    <div class="metric-value">{0 if result[kind] is None else len(result[kind])}</div>
+                    <div class="metric-label">{kind.upper()} Items</div>
+                </div>
+                """, unsafe_allow_html=True)
+        for kind in ('grn', 'prn'):
+            if result[kind] is not None:
+                with st.expander(f"📊 {kind.upper()} items (first 500)", expanded=False):
+                    st.dataframe(result[kind].head(500), use_container_width=True, height=300)
+        st.download_button(
+            label="📥 Download GRN/PRN Workbook",
+            data=result['bytes'],
+            file_name=result['file_name'],
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            key="download_mixed_excel"
+        )
+    if result['errors']:
+        with st.expander(f"⚠️ {len(result['errors'])} file(s) not processed", expanded=True):
+            for error in result['errors']:
+                st.markdown(f"- {error}")
 
 # Main App
 def main():
@@ -578,26 +753,61 @@ def main():
     st.title("🏪 Nature's Basket Document Parser")
     st.markdown("Transform your PDF documents into organized Excel spreadsheets with ease!")
     
+    # Processing settings
+    with st.sidebar:
+        st.header("⚙️ Settings")
+        scheduler = get_scheduler()
+        workers = scheduler.workers
+        st.caption(
+            f"👷 {workers} worker process(es) shared by all users; "
+            "files of concurrent sessions are processed in turn"
+        )
+        extractors = available_extractors()
+        extractor = st.selectbox(
+            "Text extraction backend",
+            extractors,
+            index=extractors.index(DEFAULT_EXTRACTOR) if DEFAULT_EXTRACTOR in extractors else 0,
+            help="PyPDF2 is the layout the parsers were written for; compare others with `python -m extractors`. Changing it re-extracts every file on the next run."
+        )
+        
+        cache_stats = text_cache.stats()
+        st.caption(
+            f"📄 Text cache: {cache_stats['entries']} files, "
+            f"{cache_stats['hits']} hits / {cache_stats['misses']} misses "
+            f"({cache_stats['hit_rate']:.0%} hit rate)"
+        )
+        if st.button("Clear text cache", key="clear_text_cache"):
+            text_cache.clear()
+            st.rerun()
+    
     # Create tabs
-    tab1, tab2 = st.tabs(["📦 GRN Parser", "🔄 PRN Parser"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(
+        ["📦 GRN Parser", "🔄 PRN Parser", "📊 Net Receipts", "🗄️ Archive", "📥 Mixed Upload"]
+    )
     
     # GRN Tab
     with tab1:
         st.header("Goods Receipt Note (GRN) Parser")
         st.markdown("Upload GRN PDF files to extract product receipt information")
         
+        # Pick up the result of a background job that finished since the last run
+        grn_running = sync_job('grn')
+        
         # File uploader for GRN
         grn_files = st.file_uploader(
-            "Choose GRN PDF files", 
-            type="pdf", 
+            "Choose GRN PDF files or ZIP archives of them", 
+            type=["pdf", "zip"], 
             accept_multiple_files=True, 
             key="grn_uploader",
-            help="Select multiple GRN PDF files to process them together"
+            help="Select multiple GRN PDF files, or ZIP archives of PDFs, to process them together"
         )
         
         if grn_files:
             st.session_state.grn_files = grn_files
-            st.session_state.grn_processed = False
+            
+            # Keep showing the last result; processing again only parses the changes
+            if st.session_state.grn_processed and upload_signature(grn_files) != st.session_state.grn_signature:
+                st.markdown('<div class="info-box">ℹ️ The uploaded files changed since the last run. Click Process to parse only the added files and drop the removed ones.</div>', unsafe_allow_html=True)
             
             # Display file summary
             col1, col2, col3 = st.columns(3)
@@ -621,33 +831,36 @@ def main():
         # Process and Clear buttons
         col1, col2 = st.columns([3, 1])
         with col1:
-            process_grn = st.button("🚀 Process GRN Files", disabled=not grn_files, key="process_grn")
+            process_grn = st.button("🚀 Process GRN Files", disabled=not grn_files or grn_running, key="process_grn")
         with col2:
             if st.button("🗑️ Clear", key="clear_grn"):
+                clear_job('grn')
                 st.session_state.grn_files = []
                 st.session_state.grn_processed = False
                 st.session_state.grn_data = None
+                st.session_state.grn_checks = None
+                st.session_state.grn_preview = None
                 st.session_state.grn_errors = []
+                st.session_state.grn_excel = None
+                st.session_state.grn_stats = None
+                st.session_state.grn_batch = IncrementalBatch('grn')
+                st.session_state.grn_duplicates = []
+                st.session_state.grn_signature = None
                 st.rerun()
         
-        # Process GRN files
+        # Process GRN files in the background, reusing results of files already parsed
         if process_grn and grn_files:
-            with st.spinner("Processing GRN files..."):
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-                
-                # Process files
-                df, errors = process_grn_files(grn_files)
-                
-                progress_bar.progress(100)
-                status_text.text("Processing complete!")
-                
-                st.session_state.grn_data = df
-                st.session_state.grn_errors = errors
-                st.session_state.grn_processed = True
+            start_job('grn', grn_files, workers, extractor)
+            st.rerun()
+        
+        if grn_running:
+            render_job_progress('grn')
+        elif st.session_state.grn_job_message:
+            st.text(st.session_state.grn_job_message)
         
         # Display GRN results
-        if st.session_state.grn_processed and st.session_state.grn_data is not None:
+        # (while a job runs its preview stands in for the last result)
+        if st.session_state.grn_processed and st.session_state.grn_data is not None and not grn_running:
             df = st.session_state.grn_data
             
             # Success metrics
@@ -678,29 +891,38 @@ def main():
                 </div>
                 """, unsafe_allow_html=True)
             
-            st.markdown(f'<div class="success-box">✅ Successfully processed {len(st.session_state.grn_files)} GRN file(s) and extracted {len(df)} product records!</div>', unsafe_allow_html=True)
+            st.markdown(f'<div class="success-box">✅ Successfully processed {len(st.session_state.grn_batch)} GRN file(s) and extracted {len(df)} product records!</div>', unsafe_allow_html=True)
+            memory_line = frame_memory_summary(df)
+            if memory_line:
+                st.caption(f"🧠 {memory_line}")
+            render_totals_check('grn')
             
             # Data preview
             with st.expander("📊 View Extracted GRN Data", expanded=True):
-                st.dataframe(df, use_container_width=True, height=400)
+                render_preview('grn', df)
             
-            # Download Excel
-            output = BytesIO()
-            with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                df.to_excel(writer, index=False, sheet_name='GRN_Data')
-            excel_data = output.getvalue()
+            # Download Excel (built once per result)
+            excel_data, excel_file_name = get_excel_download('grn', df, 'GRN_Data')
             
             st.download_button(
                 label="📥 Download GRN Excel File",
                 data=excel_data,
-                file_name=f"grn_data_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
+                file_name=excel_file_name,
                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                 key="download_grn_excel"
             )
             
-        elif st.session_state.grn_processed and st.session_state.grn_data is None:
+        elif st.session_state.grn_processed and st.session_state.grn_data is None and not grn_running:
             st.markdown('<div class="error-box">❌ No valid GRN data could be extracted from the uploaded files.</div>', unsafe_allow_html=True)
         
+        render_performance('grn')
+        
+        # Display skipped duplicate uploads
+        if st.session_state.grn_duplicates:
+            with st.expander(f"🔁 Duplicate Files Skipped ({len(st.session_state.grn_duplicates)})", expanded=False):
+                for duplicate in st.session_state.grn_duplicates:
+                    st.info(duplicate)
+        
         # Display GRN errors
         if st.session_state.grn_errors:
             with st.expander("⚠️ Processing Errors", expanded=False):
@@ -712,18 +934,24 @@ def main():
         st.header("Purchase Return Note (PRN) Parser")
         st.markdown("Upload PRN PDF files to extract goods return delivery challan information")
         
+        # Pick up the result of a background job that finished since the last run
+        prn_running = sync_job('prn')
+        
         # File uploader for PRN
         prn_files = st.file_uploader(
-            "Choose PRN PDF files", 
-            type="pdf", 
+            "Choose PRN PDF files or ZIP archives of them", 
+            type=["pdf", "zip"], 
             accept_multiple_files=True, 
             key="prn_uploader",
-            help="Select multiple PRN files to process them together"
+            help="Select multiple PRN files, or ZIP archives of PDFs, to process them together"
             )
         
         if prn_files:
             st.session_state.prn_files = prn_files
-            st.session_state.prn_processed = False
+            
+            # Keep showing the last result; processing again only parses the changes
+            if st.session_state.prn_processed and upload_signature(prn_files) != st.session_state.prn_signature:
+                st.markdown('<div class="info-box">ℹ️ The uploaded files changed since the last run. Click Process to parse only the added files and drop the removed ones.</div>', unsafe_allow_html=True)
             
             # Display file summary
             col1, col2, col3 = st.columns(3)
@@ -747,33 +975,36 @@ def main():
         # Process and Clear buttons
         col1, col2 = st.columns([3, 1])
         with col1:
-            process_prn = st.button("🚀 Process PRN Files", disabled=not prn_files, key="process_prn")
+            process_prn = st.button("🚀 Process PRN Files", disabled=not prn_files or prn_running, key="process_prn")
         with col2:
             if st.button("🗑️ Clear", key="clear_prn"):
+                clear_job('prn')
                 st.session_state.prn_files = []
                 st.session_state.prn_processed = False
                 st.session_state.prn_data = None
+                st.session_state.prn_checks = None
+                st.session_state.prn_preview = None
                 st.session_state.prn_errors = []
+                st.session_state.prn_excel = None
+                st.session_state.prn_stats = None
+                st.session_state.prn_batch = IncrementalBatch('prn')
+                st.session_state.prn_duplicates = []
+                st.session_state.prn_signature = None
                 st.rerun()
         
-        # Process PRN files
+        # Process PRN files in the background, reusing results of files already parsed
         if process_prn and prn_files:
-            with st.spinner("Processing PRN files..."):
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-                
-                # Process files
-                df, errors = process_prn_files(prn_files)
-                
-                progress_bar.progress(100)
-                status_text.text("Processing complete!")
-                
-                st.session_state.prn_data = df
-                st.session_state.prn_errors = errors
-                st.session_state.prn_processed = True
+            start_job('prn', prn_files, workers, extractor)
+            st.rerun()
+        
+        if prn_running:
+            render_job_progress('prn')
+        elif st.session_state.prn_job_message:
+            st.text(st.session_state.prn_job_message)
         
         # Display PRN results
-        if st.session_state.prn_processed and st.session_state.prn_data is not None:
+        # (while a job runs its preview stands in for the last result)
+        if st.session_state.prn_processed and st.session_state.prn_data is not None and not prn_running:
             df = st.session_state.prn_data
             
             # Success metrics
@@ -804,34 +1035,60 @@ def main():
                 </div>
                 """, unsafe_allow_html=True)
             
-            st.markdown(f'<div class="success-box">✅ Successfully processed {len(st.session_state.prn_files)} PRN file(s) and extracted {len(df)} return records!</div>', unsafe_allow_html=True)
+            st.markdown(f'<div class="success-box">✅ Successfully processed {len(st.session_state.prn_batch)} PRN file(s) and extracted {len(df)} return records!</div>', unsafe_allow_html=True)
+            memory_line = frame_memory_summary(df)
+            if memory_line:
+                st.caption(f"🧠 {memory_line}")
+            render_totals_check('prn')
             
             # Data preview
             with st.expander("📊 View Extracted PRN Data", expanded=True):
-                st.dataframe(df, use_container_width=True, height=400)
+                render_preview('prn', df)
             
-            # Download Excel
-            output = BytesIO()
-            with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                df.to_excel(writer, index=False, sheet_name='PRN_Data')
-            excel_data = output.getvalue()
+            # Download Excel (built once per result)
+            excel_data, excel_file_name = get_excel_download('prn', df, 'PRN_Data')
             
             st.download_button(
                 label="📥 Download PRN Excel File",
                 data=excel_data,
-                file_name=f"prn_data_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
+                file_name=excel_file_name,
                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                 key="download_prn_excel"
             )
             
-        elif st.session_state.prn_processed and st.session_state.prn_data is None:
+        elif st.session_state.prn_processed and st.session_state.prn_data is None and not prn_running:
             st.markdown('<div class="error-box">❌ No valid PRN data could be extracted from the uploaded files.</div>', unsafe_allow_html=True)
         
+        render_performance('prn')
+        
+        # Display skipped duplicate uploads
+        if st.session_state.prn_duplicates:
+            with st.expander(f"🔁 Duplicate Files Skipped ({len(st.session_state.prn_duplicates)})", expanded=False):
+                for duplicate in st.session_state.prn_duplicates:
+                    st.info(duplicate)
+        
         # Display PRN errors
         if st.session_state.prn_errors:
             with st.expander("⚠️ Processing Errors", expanded=False):
                 for error in st.session_state.prn_errors:
                     st.error(error)
+    
+    # Net Receipts Tab
+    with tab3:
+        st.header("Net Receipts")
+        st.markdown("Goods received less goods returned, per vendor, article and store")
+        render_net_receipts_tab()
+    
+    # Archive Tab
+    with tab4:
+        st.header("Record Archive")
+        st.markdown("Export a date range or vendor slice of every GRN/PRN item processed so far")
+        render_archive_tab()
+    
+    with tab5:
+        st.header("Mixed Upload")
+        st.markdown("Upload GRN and PRN files together; each is sorted by its own text into one workbook")
+        render_mixed_tab(extractor)
 
     # Footer
     st.markdown("---")
@@ -0,0 +1,220 @@
+"""SQLite archive of every parsed GRN/PRN line item.
+
+With PDF_ARCHIVE_DB set, the app archives each processed file's items, one
+table per document type keyed on document number and serial number. Ingesting
+a document again replaces all of its earlier rows. Vendor, store, article and
+date are indexed, so a date range or vendor slice can be queried and exported
+long after the PDFs are gone.
+"""
+import os
+import sqlite3
+import time
+from contextlib import closing
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+
+from columns import (
+    GRN_DOCUMENT_COLUMNS, GRN_DTYPES, GRN_ITEM_COLUMNS, PRN_COLUMNS, PRN_DTYPES, parse_date, parse_number,
+)
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Per document type: table, columns, dtypes, (document number, serial) columns
+# that identify a line item, and the indexed vendor/store/article/date columns
+ARCHIVE_TABLES = {
+    'grn': {
+        'table': 'grn_items',
+        'columns': GRN_DOCUMENT_COLUMNS + [column for column, _ in GRN_ITEM_COLUMNS],
+        'dtypes': GRN_DTYPES,
+        'key': ('grn_no', 'serial_no'),
+        'vendor': 'vendor_name', 'store': 'store_name', 'article': 'article_code', 'date': 'grn_date',
+    },
+    'prn': {
+        'table': 'prn_items',
+        'columns': PRN_COLUMNS,
+        'dtypes': PRN_DTYPES,
+        'key': ('doc_no', 'sno'),
+        'vendor': 'vendor_name', 'store': 'store', 'article': 'article_code', 'date': 'invoice_date',
+    },
+}
+
+# Document keys per DELETE statement, below SQLite's limit on bound parameters
+DELETE_BATCH = 500
+
+def _iso_date(value: str) -> str:
+    """Normalise a document date to YYYY-MM-DD so date ranges compare as text (unknown layouts are kept)"""
+    date = parse_date(value)
+    return value if date is None else date.strftime('%Y-%m-%d')
+
+def _number(value: str):
+    """Store numeric fields as REAL where they parse, as text otherwise"""
+    number = parse_number(value)
+    return value if number is None else number
+
+def _grn_items(parsed_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """The archive records of the items of one parsed GRN"""
+    return [
+        {**parsed_data['metadata'], **{column: product.get(key, '') for column, key in GRN_ITEM_COLUMNS}}
+        for product in parsed_data['products']
+    ]
+
+class RecordArchive:
+    """SQLite archive of parsed GRN/PRN line items.
+
+    Items are deduplicated on GRN No / Doc No + serial number (a re-ingested
+    document replaces its earlier rows); documents without a number fall back
+    to their filename and position in the file. Vendor, store, article code and document date are
+    indexed so slices can be exported without the original PDFs.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            for kind, spec in ARCHIVE_TABLES.items():
+                columns = ', '.join(f'"{column}"' for column in spec['columns'])
+                conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {spec['table']} ("
+                    f"doc_key TEXT NOT NULL, {columns}, archived_at TEXT NOT NULL, "
+                    f"PRIMARY KEY (doc_key, \"{spec['key'][1]}\"))"
+                )
+                for field in ('vendor', 'store', 'article', 'date'):
+                    conn.execute(
+                        f"CREATE INDEX IF NOT EXISTS {spec['table']}_{field} "
+                        f"ON {spec['table']} (\"{spec[field]}\")"
+                    )
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {spec['table']}_vendor_code ON {spec['table']} (vendor_code)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _ingest(self, kind: str, filename: str, documents: Iterable[Iterable[Dict[str, Any]]]) -> int:
+        """Store the items of each document of one file, replacing the rows stored for those documents before"""
+        spec = ARCHIVE_TABLES[kind]
+        number_column, serial_column = spec['key']
+        numeric = set(spec['dtypes']['float']) | set(spec['dtypes']['integer'])
+        dates = set(spec['dtypes']['date'])
+        archived_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+
+        rows, unnumbered = [], False
+        for position, records in enumerate(documents, 1):
+            for record in records:
+                values = []
+                for column in spec['columns']:
+                    value = filename if column == 'filename' else record.get(column, '')
+                    if value and column in numeric:
+                        value = _number(value)
+                    elif value and column in dates:
+                        value = _iso_date(value)
+                    values.append(value)
+                # Serials restart in every document, so unnumbered ones are told apart by position in the file
+                doc_key = record.get(number_column)
+                if not doc_key:
+                    doc_key, unnumbered = f"file:{filename}#{position}", True
+                rows.append([doc_key, *values, archived_at])
+        if not rows:
+            return 0
+
+        placeholders = ', '.join('?' * (len(spec['columns']) + 2))
+        doc_keys = list(dict.fromkeys(row[0] for row in rows if not row[0].startswith('file:')))
+        with closing(self._connect()) as conn, conn:
+            # A corrected document with fewer items mustn't keep its old extra serials
+            for start in range(0, len(doc_keys), DELETE_BATCH):
+                batch = doc_keys[start:start + DELETE_BATCH]
+                conn.execute(
+                    f"DELETE FROM {spec['table']} WHERE doc_key IN ({', '.join('?' * len(batch))})", batch
+                )
+            if unnumbered:
+                # Every unnumbered document of the file ('#' sorts just before '$'; the
+                # digits check spares a file whose own name goes on with '#'), and the
+                # single file-wide key of archives written before documents were numbered
+                prefix = f"file:{filename}#"
+                conn.execute(
+                    f"DELETE FROM {spec['table']} WHERE doc_key = ? OR (doc_key > ? AND doc_key < ? "
+                    f"AND substr(doc_key, ?) NOT GLOB '*[^0-9]*')",
+                    (f"file:{filename}", prefix, f"file:{filename}$", len(prefix) + 1)
+                )
+            conn.executemany(f"INSERT OR REPLACE INTO {spec['table']} VALUES ({placeholders})", rows)
+        return len(rows)
+
+    def ingest_prn(self, filename: str, records: List[Dict[str, Any]]) -> int:
+        """Store the output of parse_prn_documents for one file; returns the number of items written.
+
+        The records of consecutive challans are told apart where the serial
+        number starts again, so challans without a Doc No don't overwrite each other.
+        """
+        challans, previous = [], None
+        for record in records:
+            serial = parse_number(record.get('sno', ''))
+            if not challans or (serial is not None and previous is not None and serial <= previous):
+                challans.append([])
+            challans[-1].append(record)
+            previous = serial
+        return self._ingest('prn', filename, challans)
+
+    def ingest_documents(self, kind: str, filename: str, documents: List[Dict[str, Any]]) -> int:
+        """Store the parsed documents of one file as held by processing (GRNs or PRN challans)"""
+        if kind == 'grn':
+            return self._ingest('grn', filename, map(_grn_items, documents))
+        return self._ingest('prn', filename, (
+            [{**challan['metadata'], **product} for product in challan['products']] for challan in documents
+        ))
+
+    def counts(self) -> Dict[str, Tuple[int, int]]:
+        """(items, documents) stored per document type"""
+        with closing(self._connect()) as conn:
+            return {
+                kind: conn.execute(f"SELECT COUNT(*), COUNT(DISTINCT doc_key) FROM {spec['table']}").fetchone()
+                for kind, spec in ARCHIVE_TABLES.items()
+            }
+
+    def vendors(self, kind: str) -> List[str]:
+        spec = ARCHIVE_TABLES[kind]
+        with closing(self._connect()) as conn:
+            return [row[0] for row in conn.execute(
+                f"SELECT DISTINCT \"{spec['vendor']}\" FROM {spec['table']} "
+                f"WHERE \"{spec['vendor']}\" != '' ORDER BY 1"
+            )]
+
+    def query(self, kind: str, date_from: Optional[str] = None, date_to: Optional[str] = None,
+              vendors: Optional[List[str]] = None, store: Optional[str] = None,
+              article_code: Optional[str] = None) -> 'pd.DataFrame':
+        """Return the stored items matching every given filter as a typed frame.
+
+        Dates are inclusive YYYY-MM-DD bounds on the document date (GRN Date,
+        PRN Invoice Date); store matches a substring of the store name.
+        """
+        import pandas as pd
+        from frames import apply_dtypes
+
+        spec = ARCHIVE_TABLES[kind]
+        conditions, params = [], []
+        if date_from:
+            conditions.append(f"\"{spec['date']}\" >= ?")
+            params.append(date_from)
+        if date_to:
+            conditions.append(f"\"{spec['date']}\" <= ?")
+            params.append(date_to)
+        if vendors:
+            conditions.append(f"\"{spec['vendor']}\" IN ({', '.join('?' * len(vendors))})")
+            params.extend(vendors)
+        if store:
+            conditions.append(f"\"{spec['store']}\" LIKE ?")
+            params.append(f"%{store}%")
+        if article_code:
+            conditions.append(f"\"{spec['article']}\" = ?")
+            params.append(article_code)
+
+        columns = ', '.join(f'"{column}"' for column in spec['columns'])
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        sql = f"SELECT {columns} FROM {spec['table']}{where} ORDER BY \"{spec['date']}\", doc_key, \"{spec['key'][1]}\""
+        with closing(self._connect()) as conn:
+            df = pd.read_sql_query(sql, conn, params=params)
+
+        # Numbers come back as REAL and dates as YYYY-MM-DD text, both of which apply_dtypes converts
+        return apply_dtypes(df, spec['dtypes'])
+
+def open_archive() -> Optional[RecordArchive]:
+    """Return the archive configured by PDF_ARCHIVE_DB, or None when archiving is off"""
+    path = os.getenv("PDF_ARCHIVE_DB")
+    return RecordArchive(path) if path else None
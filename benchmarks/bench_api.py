@@ -0,0 +1,157 @@
+"""Benchmark: throughput and latency of the local HTTP service under concurrent clients.
+
+    python benchmarks/bench_api.py [--jobs 40] [--clients 4 8] [--files 1] [--pages 3] [--workers 2]
+    python benchmarks/bench_api.py --url http://127.0.0.1:8502 [--jobs 40] [--clients 8]
+
+Starts python -m api on a free localhost port (or uses --url) and, for each
+client count, has that many clients submit synthetic GRN PDFs (a ZIP when
+--files > 1), poll until their job is done and fetch its rows as JSON. A
+job's latency runs from its first submission to its rows being received;
+submissions turned away with 503 are retried after the Retry-After delay and
+counted. Prints jobs and files per second and p50/p99 latency per client count.
+"""
+import argparse
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import zipfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from benchmarks.sample_docs import make_grn_text, make_pdf
+
+def _request(url: str, data: bytes = None, method: str = None):
+    """(status, headers, body) of one request, HTTP errors included"""
+    request = urllib.request.Request(url, data=data, method=method)
+    try:
+        with urllib.request.urlopen(request, timeout=600) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+def _upload(seed: int, files: int, pages: int, items: int) -> (str, bytes):
+    """(name, body) of one synthetic upload: a PDF, or a ZIP of files PDFs"""
+    def pdf(index):
+        return make_pdf([make_grn_text(items, seed=seed * 1000 + index * pages + page) for page in range(pages)])
+
+    if files == 1:
+        return f"grn_{seed:05d}.pdf", pdf(0)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for index in range(files):
+            archive.writestr(f"grn_{index:03d}.pdf", pdf(index))
+    return f"batch_{seed:05d}.zip", buffer.getvalue()
+
+def _run_job(url: str, name: str, body: bytes, latencies, rejections, failures, poll_s: float):
+    started = time.perf_counter()
+    while True:
+        status, headers, reply = _request(f"{url}/jobs/grn?name={name}", body, 'POST')
+        if status != 503:
+            break
+        rejections.append(name)
+        time.sleep(float(headers.get('Retry-After', 1)))
+    if status != 202:
+        failures.append(f"{name}: submit returned {status} {reply[:200]!r}")
+        return
+    job_id = json.loads(reply)['id']
+    while True:
+        status, _, reply = _request(f"{url}/jobs/{job_id}")
+        state = json.loads(reply).get('state') if status == 200 else None
+        if state not in ('queued', 'running'):
+            break
+        time.sleep(poll_s)
+    status, _, reply = _request(f"{url}/jobs/{job_id}/result?format=json")
+    if status != 200:
+        failures.append(f"{name}: result returned {status} {reply[:200]!r}")
+        return
+    latencies.append(time.perf_counter() - started)
+    _request(f"{url}/jobs/{job_id}", method='DELETE')
+
+def _percentile(values, share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))] if ordered else float('nan')
+
+def _start_service(workers: int, max_running: int, max_queued: int) -> (subprocess.Popen, str):
+    """Start python -m api on a free port and wait for /health"""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    service = subprocess.Popen(
+        [sys.executable, '-m', 'api', '--port', str(port), '-w', str(workers), '--max-running', str(max_running),
+         '--max-queued', str(max_queued), '-q'],
+        cwd=ROOT,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if _request(f"{url}/health")[0] == 200:
+                return service, url
+        except OSError:
+            time.sleep(0.1)
+    service.kill()
+    raise RuntimeError("the service did not start")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='service to test (default: start one)')
+    parser.add_argument('--jobs', type=int, default=40, help='jobs per client count')
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--files', type=int, default=1, help='PDFs per job (sent as a ZIP when more than 1)')
+    parser.add_argument('--pages', type=int, default=3, help='pages per PDF')
+    parser.add_argument('--items', type=int, default=30, help='product lines per page')
+    parser.add_argument('--workers', type=int, default=2, help='pool size of a started service')
+    parser.add_argument('--max-running', type=int, default=2, help='jobs at once of a started service')
+    parser.add_argument('--max-queued', type=int, default=16, help='waiting jobs of a started service')
+    parser.add_argument('--poll', type=float, default=0.05, help='seconds between status polls')
+    args = parser.parse_args()
+
+    uploads = [_upload(seed, args.files, args.pages, args.items) for seed in range(min(args.jobs, 50))]
+    service, url = (None, args.url.rstrip('/')) if args.url else _start_service(
+        args.workers, args.max_running, args.max_queued
+    )
+    try:
+        print(f"{'clients':>7} {'jobs/s':>7} {'files/s':>8} {'p50 s':>7} {'p99 s':>7} {'503s':>5} {'failed':>6}")
+        for clients in args.clients:
+            latencies, rejections, failures = [], [], []
+            pending = iter(range(args.jobs))
+            lock = threading.Lock()
+
+            def client():
+                while True:
+                    with lock:
+                        index = next(pending, None)
+                    if index is None:
+                        return
+                    name, body = uploads[index % len(uploads)]
+                    _run_job(url, name, body, latencies, rejections, failures, args.poll)
+
+            started = time.perf_counter()
+            threads = [threading.Thread(target=client) for _ in range(clients)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+
+            jobs_per_s = len(latencies) / elapsed
+            print(f"{clients:>7} {jobs_per_s:>7.2f} {jobs_per_s * args.files:>8.2f} "
+                  f"{_percentile(latencies, 0.5):>7.2f} {_percentile(latencies, 0.99):>7.2f} "
+                  f"{len(rejections):>5} {len(failures):>6}")
+            for failure in failures[:5]:
+                print(f"  {failure}", file=sys.stderr)
+    finally:
+        if service is not None:
+            service.terminate()
+            service.wait()
+
+if __name__ == '__main__':
+    main()
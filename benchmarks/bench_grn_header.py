@@ -0,0 +1,73 @@
+"""Micro-benchmark: single-pass GRN header scan vs. one re.search per field.
+
+    python benchmarks/bench_grn_header.py [--items 40] [--pages 1 20] [--repeat 20]
+"""
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from benchmarks.sample_docs import make_grn_text, make_prn_text
+from parsers import parse_grn_metadata
+
+def legacy_grn_metadata(text):
+    """The header extraction parse_grn_text used before the field table"""
+    metadata = {}
+    for pattern in [r'NB ([^\n]+?)(?=\n|Nature\'s Basket)', r'NB ([^\n]+)', r'(NB [^\n]+)']:
+        store_match = re.search(pattern, text, re.IGNORECASE)
+        if store_match:
+            metadata['store_name'] = store_match.group(1).strip()
+            break
+    for key, pattern in [('vendor_code', r'Vendor Code\s*:([^\n]+)'), ('vendor_name', r'Vendor Name\s*:([^\n]+)')]:
+        match = re.search(pattern, text)
+        if match:
+            metadata[key] = match.group(1).strip()
+    address_match = re.search(r'Address\s*:([^\n]+(?:\n[^\n]+)*?)(?=Status|Inv\.No)', text, re.DOTALL)
+    if address_match:
+        address_lines = [line.strip() for line in address_match.group(1).split('\n') if line.strip() and not line.strip().startswith(':')]
+        metadata['vendor_address'] = ' '.join(address_lines)
+    for key, label in [
+        ('invoice_no', r'Inv\.No'), ('invoice_date', r'Inv\.Date'), ('invoice_value', r'Inv\.Value'),
+        ('invoice_tax_value', r'Inv\.Tax Val'), ('gin_no', r'GIN No'), ('gin_date', r'GIN Date'),
+        ('grn_no', r'GRN No'), ('grn_date', r'GRN Date'), ('po_no', r'PO\.No'), ('po_date', r'PO\.Date'),
+        ('p_slip_no', r'P\.SLIP\.No'), ('vendor_gst_in', r'Vendor GST IN'), ('company_gst_no', r'GST NO'),
+    ]:
+        match = re.search(label + r'\s*:([^\n\s]+)', text)
+        if match:
+            metadata[key] = match.group(1).strip()
+    total_match = re.search(r'TOTAL\s+([\d.]+)\s+([\d.]+)\s+([\d.]+)\s+([\d.]+)\s+([\d.]+)', text)
+    if total_match:
+        for idx, key in enumerate(['total_gst_value', 'total_received_qty', 'total_accepted_qty',
+                                   'total_rejected_qty', 'total_cost_value'], 1):
+            metadata[key] = total_match.group(idx).strip()
+    gross_value_match = re.search(r'Gross Value\s+([\d.]+)', text)
+    if gross_value_match:
+        metadata['gross_value'] = gross_value_match.group(1).strip()
+    return metadata
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=40, help='product lines per page')
+    parser.add_argument('--pages', type=int, nargs='+', default=[1, 5, 20])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    # GRN text, plus PRN text (a file dropped in the wrong tab) where most GRN
+    # labels are missing and each per-field search has to scan the whole text
+    samples = {
+        'grn': lambda pages: "".join(make_grn_text(args.items, seed=page) for page in range(pages)),
+        'prn': lambda pages: make_prn_text(n_challans=pages * 4, n_items=args.items // 4),
+    }
+    print(f"{'text':>5} {'pages':>6} {'chars':>9} {'legacy ms':>10} {'table ms':>9} {'speedup':>8}")
+    for kind, pages in [(kind, pages) for kind in samples for pages in args.pages]:
+        text = samples[kind](pages)
+        assert legacy_grn_metadata(text) == parse_grn_metadata(text), "metadata mismatch"
+        legacy = min(timeit.repeat(lambda: legacy_grn_metadata(text), number=args.repeat, repeat=3)) / args.repeat
+        table = min(timeit.repeat(lambda: parse_grn_metadata(text), number=args.repeat, repeat=3)) / args.repeat
+        print(f"{kind:>5} {pages:>6} {len(text):>9} {legacy * 1e3:>10.3f} {table * 1e3:>9.3f} {legacy / table:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
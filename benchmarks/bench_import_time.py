@@ -0,0 +1,107 @@
+"""Import-time benchmark: cold import cost of each module, measured with -X importtime.
+
+    python benchmarks/bench_import_time.py [--modules parsers processing ...] [--repeat 5]
+        [--baseline import_times.json [--tolerance 0.25]] [--write-baseline import_times.json]
+
+Each module is imported in a fresh interpreter and the best of --repeat runs is
+reported, along with the heavy dependencies the import pulled in. Exits 1 if a
+module loads a dependency it must not (parsing, batch and service code must stay
+free of pandas, PyPDF2 and Streamlit until a stage needs them, and the app page
+must not load pandas or PyPDF2 before a file is processed) or, with --baseline, if
+a module got slower than the recorded time by more than --tolerance.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+MODULES = [
+    'extractors', 'parsers', 'text_cache', 'columns', 'processing', 'archive', 'frames', 'cli',
+    'isolation', 'scheduler', 'streaming', 'jobs', 'api', 'watch', 'app',
+]
+HEAVY = ['pandas', 'numpy', 'PyPDF2', 'xlsxwriter', 'streamlit', 'sqlite3']
+# Dependencies each module may not load at import time
+FORBIDDEN = {
+    'extractors': ['pandas', 'numpy', 'PyPDF2', 'streamlit'],
+    'parsers': ['pandas', 'numpy', 'PyPDF2', 'streamlit'],
+    'text_cache': ['pandas', 'numpy', 'PyPDF2', 'streamlit'],
+    'columns': ['pandas', 'numpy', 'PyPDF2', 'streamlit'],
+    'processing': ['pandas', 'numpy', 'PyPDF2', 'xlsxwriter', 'streamlit'],
+    'archive': ['pandas', 'numpy', 'PyPDF2', 'streamlit'],
+    'cli': ['pandas', 'numpy', 'PyPDF2', 'xlsxwriter', 'streamlit'],
+    'isolation': ['pandas', 'numpy', 'PyPDF2', 'xlsxwriter', 'streamlit'],
+    'scheduler': ['pandas', 'numpy', 'PyPDF2', 'xlsxwriter', 'streamlit'],
+    'streaming': ['pandas', 'numpy', 'PyPDF2', 'xlsxwriter', 'streamlit'],
+    'jobs': ['pandas', 'numpy', 'PyPDF2', 'xlsxwriter', 'streamlit'],
+    'api': ['pandas', 'numpy', 'PyPDF2', 'xlsxwriter', 'streamlit'],
+    'watch': ['pandas', 'numpy', 'PyPDF2', 'xlsxwriter', 'streamlit'],
+    'app': ['pandas', 'numpy', 'PyPDF2', 'xlsxwriter'],
+}
+
+def measure(module: str):
+    """Return (cumulative import time in ms, heavy modules loaded) for one cold import of module"""
+    code = f"import sys, json, {module}; print(json.dumps([m for m in {HEAVY!r} if m in sys.modules]))"
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT, capture_output=True, text=True
+    )
+    if proc.returncode:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+
+    # Lines look like "import time:  self [us] | cumulative | imported package"
+    cumulative_us = None
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = [field.strip() for field in line[len('import time:'):].split('|')]
+        if fields[2] == module:
+            cumulative_us = int(fields[1])
+    return cumulative_us / 1e3, json.loads(proc.stdout)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modules', nargs='+', default=MODULES)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--baseline', help='JSON of {module: ms} to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown over the baseline')
+    parser.add_argument('--write-baseline', help='record the measured times here')
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results, failures = {}, []
+    print(f"{'module':>12} {'ms':>9} {'baseline':>9}  loads")
+    for module in args.modules:
+        try:
+            runs = [measure(module) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print(f"{module:>12} {'-':>9} {'-':>9}  import failed: {e}")
+            failures.append(f"{module} failed to import")
+            continue
+        ms = min(run[0] for run in runs)
+        loaded = runs[0][1]
+        results[module] = round(ms, 2)
+
+        forbidden = [name for name in FORBIDDEN.get(module, ()) if name in loaded]
+        if forbidden:
+            failures.append(f"{module} imports {', '.join(forbidden)} at import time")
+        if module in baseline and ms > baseline[module] * (1 + args.tolerance):
+            failures.append(f"{module} took {ms:.1f} ms, baseline {baseline[module]:.1f} ms")
+        recorded = f"{baseline[module]:.1f}" if module in baseline else '-'
+        print(f"{module:>12} {ms:>9.1f} {recorded:>9}  {', '.join(loaded) or '-'}")
+
+    if args.write_baseline:
+        with open(args.write_baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
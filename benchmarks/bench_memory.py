@@ -0,0 +1,57 @@
+"""Benchmark: peak memory of the batch path vs. the streaming path as a batch grows.
+
+    python benchmarks/bench_memory.py [--files 50 200 800] [--pages 5] [--workers 2] [--output csv]
+
+Writes synthetic GRN PDFs to a temp directory and converts the first N of them
+with python -m cli, once as usual and once with --stream, each in a fresh
+process, and prints each run's wall time and peak RSS (the largest of the main
+process and its workers). The batch path should grow with N; the streaming
+path should stay roughly flat.
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from benchmarks.sample_docs import make_grn_text, make_pdf
+
+def _run(args) -> (float, float):
+    """Wall seconds and peak RSS in MB of one cli run, in a child process"""
+    started = time.perf_counter()
+    subprocess.run([sys.executable, '-m', 'cli', *args], cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+    elapsed = time.perf_counter() - started
+    # ru_maxrss of RUSAGE_CHILDREN is the largest waited-for descendant so far, in KB on Linux
+    return elapsed, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, nargs='+', default=[50, 200, 800])
+    parser.add_argument('--pages', type=int, default=5, help='pages per file')
+    parser.add_argument('--items', type=int, default=30, help='product lines per page')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--output', choices=['csv', 'xlsx'], default='csv')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'files':>6} {'mode':>7} {'seconds':>8} {'peak MB':>8}")
+        # Smallest batch first: ru_maxrss only ever grows, so later runs must not be the smaller ones
+        for count in sorted(args.files):
+            folder = os.path.join(tmp, str(count))
+            os.mkdir(folder)
+            for i in range(count):
+                pages = [make_grn_text(args.items, seed=i * args.pages + page) for page in range(args.pages)]
+                with open(os.path.join(folder, f"grn_{i:05d}.pdf"), 'wb') as f:
+                    f.write(make_pdf(pages))
+            output = os.path.join(tmp, f"out.{args.output}")
+            for mode, extra in (('batch', []), ('stream', ['--stream'])):
+                elapsed, peak = _run(['grn', folder, '-o', output, '-w', str(args.workers), '-q', *extra])
+                print(f"{count:>6} {mode:>7} {elapsed:>8.2f} {peak:>8.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""Benchmark: extracting one large PDF page by page vs. as page ranges over the pool.
+
+    python benchmarks/bench_page_ranges.py [--pages 20 60 150 300 600] [--workers 4] [--extractor pypdf2]
+
+Builds a synthetic GRN PDF per page count, extracts and parses it in one
+process, then again with the page ranges fanned out over --workers processes,
+and prints both wall times. The page count where the split version starts to
+win is a good value for PDF_SPLIT_MIN_PAGES on the machine it runs on.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import processing
+from benchmarks.sample_docs import make_grn_text, make_pdf
+from processing import _process_grn_file, _run_files
+from text_cache import TextCache
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, nargs='+', default=[20, 60, 150, 300, 600])
+    parser.add_argument('--items', type=int, default=30, help='product lines per page')
+    parser.add_argument('--workers', type=int, default=processing.DEFAULT_WORKERS)
+    parser.add_argument('--extractor', default=None, help='extraction backend (default: PDF_EXTRACTOR or pypdf2)')
+    args = parser.parse_args()
+
+    # Split every file, whatever its size, so both paths are measured at each page count
+    processing.SPLIT_MIN_PAGES = 1
+
+    print(f"{'pages':>6} {'MB':>6} {'serial s':>9} {'ranges s':>9} {'speedup':>8}")
+    for pages in args.pages:
+        pdf_bytes = make_pdf([make_grn_text(args.items, seed=page) for page in range(pages)])
+        source = [('grn.pdf', pdf_bytes, 'bench')]
+
+        started = time.perf_counter()
+        serial = _process_grn_file('grn.pdf', pdf_bytes, extractor=args.extractor)
+        serial_s = time.perf_counter() - started
+
+        # A fresh cache each time, so the text is really extracted
+        started = time.perf_counter()
+        split = list(_run_files(_process_grn_file, source, args.workers, cache=TextCache(max_chars=0),
+                                extractor=args.extractor))[0][2]
+        split_s = time.perf_counter() - started
+
+        assert split.documents == serial.documents, "page-range output differs"
+        print(f"{pages:>6} {len(pdf_bytes) / 2**20:>6.1f} {serial_s:>9.2f} {split_s:>9.2f} {serial_s / split_s:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""Benchmark: a rerun of one large PRN file whose text is cached, parsed directly vs. through _run_files.
+
+    python benchmarks/bench_prn_split.py [--challans 5000] [--items 10] [--workers 1 2 4 8]
+
+Runs on already extracted text (the text-cache path), so it measures parsing
+only. Splitting cached text by challan over the pool ran at 0.4x-0.6x of a
+whole-file parse, so _run_files only splits files it still has to extract
+(where the split overlaps parsing with extraction); a rerun should stay near
+1.0x at every worker count. Run with PDF_FILE_TIMEOUT_S=0, or the rerun also
+pays for shipping the file to a killable worker (see isolation).
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from benchmarks.sample_docs import make_prn_text
+from processing import _process_prn_file, _process_prn_file_by_challan, _run_files
+from text_cache import TextCache, content_hash
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--challans', type=int, default=5000)
+    parser.add_argument('--items', type=int, default=10, help='line items per challan')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    text = make_prn_text(n_challans=args.challans, n_items=args.items)
+    # Stand-in bytes only decide the split; the text comes from the cache
+    pdf_bytes = text.encode()
+    key = content_hash(pdf_bytes)
+    cache = TextCache(max_chars=len(text) + 1)
+    cache.put(key, text)
+
+    started = time.perf_counter()
+    whole = _process_prn_file('prn.pdf', b"", text)
+    baseline = time.perf_counter() - started
+    print(f"{len(text)} chars, {len(whole.documents)} challans; whole file: {baseline:.2f} s")
+
+    print(f"{'workers':>8} {'rerun s':>8} {'speedup':>8}")
+    for workers in args.workers:
+        started = time.perf_counter()
+        results = list(_run_files(_process_prn_file, [('prn.pdf', pdf_bytes, key)], workers,
+                                  cache=cache, split_worker=_process_prn_file_by_challan))
+        elapsed = time.perf_counter() - started
+        assert results[0][2].documents == whole.documents, "rerun output differs"
+        print(f"{workers:>8} {elapsed:>8.2f} {baseline / elapsed:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
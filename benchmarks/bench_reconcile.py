@@ -0,0 +1,50 @@
+"""Benchmark: checking line items against document totals on a large GRN frame.
+
+    python benchmarks/bench_reconcile.py [--rows 200000] [--items 40] [--broken 0.01]
+
+Builds the frame from copies of synthetic GRNs, corrupts the TOTAL line of a
+share of them, and times reconcile.reconcile; it should flag exactly those.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from benchmarks.sample_docs import make_grn_text
+from frames import grn_frame_builder
+from parsers import parse_grn_text
+from processing import _add_grn_document
+from reconcile import mismatch_summary, reconcile
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--items', type=int, default=40, help='product lines per GRN')
+    parser.add_argument('--broken', type=float, default=0.01, help='share of GRNs with a wrong total')
+    args = parser.parse_args()
+
+    samples = [parse_grn_text(make_grn_text(args.items, seed=seed)) for seed in range(50)]
+    rng = random.Random(0)
+    builder = grn_frame_builder()
+    broken = 0
+    for idx in range(args.rows // args.items):
+        document = samples[idx % len(samples)]
+        if rng.random() < args.broken:
+            metadata = {**document['metadata'], 'total_cost_value': '1.00'}
+            document = {**document, 'metadata': metadata}
+            broken += 1
+        _add_grn_document(builder, f"grn_{idx:06d}.pdf", document)
+    df = builder.build()
+
+    started = time.perf_counter()
+    mismatches = reconcile(df, 'grn')
+    elapsed = time.perf_counter() - started
+
+    print(f"{len(df)} rows, {mismatches.attrs['documents']} GRNs, {broken} corrupted")
+    print(f"{mismatch_summary(mismatches)} ({elapsed:.3f} s)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""Synthetic GRN/PRN text in the layout PyPDF2 extracts from the real documents.
+
+Used by the benchmarks so they can run without a corpus of real PDFs.
+"""
+import random
+
+def make_grn_text(n_items: int = 40, seed: int = 0, vendor: int = 0) -> str:
+    """Return the extracted text of one GRN with n_items product lines"""
+    rng = random.Random(seed)
+    lines = [
+        f"NB {rng.choice(['Bandra West', 'Koramangala', 'Powai', 'Juhu'])}",
+        "Nature's Basket Limited",
+        "Goods Receipt Note",
+        "GST NO :27AAACG1234F1Z5",
+        f"Vendor Code :{100200 + vendor}",
+        f"Vendor Name :VENDOR {vendor} FOODS PVT LTD",
+        "Address :12 MARKET ROAD",
+        "ANDHERI EAST MUMBAI 400069 Status :Posted",
+        f"Inv.No :INV-{seed:05d} Inv.Date :01.03.2024",
+        "Inv.Value :12345.00 Inv.Tax Val :234.50",
+        f"GIN No :GIN{seed:06d} GIN Date :01.03.2024",
+        f"GRN No :{5000000 + seed} GRN Date :02.03.2024",
+        f"PO.No :{4500000 + seed} PO.Date :28.02.2024",
+        f"P.SLIP.No :PS{seed}",
+        "Vendor GST IN :27AABCF1234Q1Z2",
+        "SNo Article EAN GST RecQty AccQty RejQty UOM MRP TotalCost",
+    ]
+    total_gst = total_rec = total_acc = total_rej = total_cost = 0.0
+    for sno in range(1, n_items + 1):
+        gst = round(rng.uniform(1, 50), 2)
+        rec = float(rng.randint(1, 48))
+        rej = float(rng.randint(0, 2)) if rng.random() < 0.1 else 0.0
+        acc = rec - rej
+        mrp = round(rng.uniform(20, 900), 2)
+        cost = round(acc * mrp * 0.7, 2)
+        total_gst += gst
+        total_rec += rec
+        total_acc += acc
+        total_rej += rej
+        total_cost += cost
+        lines.append(
+            f"{sno} {1000000 + rng.randint(0, 8999999)} {rng.randint(10**12, 10**13 - 1)} "
+            f"{gst:.2f} {rec:.3f} {acc:.3f} {rej:.3f} {rng.choice(['EA', 'KG', 'PAC'])} {mrp:.2f} {cost:.2f}"
+        )
+        lines.append(f"TBD {rng.choice(['ORGANIC HONEY', 'BASMATI RICE', 'OLIVE OIL', 'GREEK YOGURT'])} {rng.randint(100, 999)}G "
+                     f"{rng.randint(10**7, 10**8 - 1)}")
+    lines.append(f"TOTAL {total_gst:.2f} {total_rec:.3f} {total_acc:.3f} {total_rej:.3f} {total_cost:.2f}")
+    lines.append(f"Gross Value {total_cost + total_gst:.2f}")
+    return "\n".join(lines) + "\n"
+
+def make_prn_challan(n_items: int = 10, seed: int = 0, vendor: int = 0) -> str:
+    """Return the extracted text of one goods return delivery challan"""
+    rng = random.Random(seed)
+    lines = [
+        "GOODS RETURN DELIVERY CHALLAN",
+        f"NB {rng.choice(['Bandra West', 'Koramangala', 'Powai', 'Juhu'])}",
+        "NATURE'S BASKET LIMITED",
+        f"Vendor Code :{100200 + vendor}",
+        f"Vendor Name :VENDOR {vendor} FOODS PVT LTD",
+        "Address :12 MARKET ROAD",
+        "ANDHERI EAST MUMBAI 400069",
+        "GSTIN :27AABCF1234Q1Z2",
+        "GSTIN :27AAACG1234F1Z5",
+        f"Doc No :{7000000 + seed} / 03.03.2024",
+        f"Ref.Doc.No :{5000000 + seed} / 02.03.2024",
+        "Invoice Date :01.03.2024",
+        f"Order No :{4500000 + seed}",
+        "Order Date :28.02.2024",
+        f"P.Slip No. :PS{seed}",
+        "SNo Article EAN RefPO Qty UOM MRP Cost Value Reason SGST CGST IGST CESS ADV NetVal",
+    ]
+    total_qty = total_value = 0.0
+    for sno in range(1, n_items + 1):
+        qty = float(rng.randint(1, 12))
+        mrp = round(rng.uniform(20, 900), 2)
+        cost = round(mrp * 0.7, 2)
+        value = round(qty * cost, 2)
+        sgst = cgst = round(value * 0.025, 2)
+        total_qty += qty
+        total_value += value
+        lines.append(
+            f"{sno} {1000000 + rng.randint(0, 8999999)} {rng.randint(10**12, 10**13 - 1)} {4500000 + seed} "
+            f"{qty:.3f} EA {mrp:.2f} {cost:.2f} {value:.2f} R{rng.randint(1, 9)} "
+            f"{sgst:.2f} {cgst:.2f} 0.00 0.00 0.00 {value + sgst + cgst:.2f}"
+        )
+        lines.append(f"TBD {rng.choice(['ORGANIC HONEY', 'BASMATI RICE', 'OLIVE OIL'])} {rng.randint(100, 999)}G")
+        lines.append(f"{rng.randint(10**7, 10**8 - 1)} Date expired")
+    lines.append(f"TOTAL {total_qty:.3f} {total_value:.2f}")
+    lines.append(f"FINAL VALUE {total_value * 1.05:.2f}")
+    return "\n".join(lines) + "\n"
+
+def make_prn_text(n_challans: int = 5, n_items: int = 10, seed: int = 0) -> str:
+    """Return the extracted text of a PRN file holding n_challans challans"""
+    return "".join(
+        make_prn_challan(n_items, seed=seed + idx, vendor=idx % 7) for idx in range(n_challans)
+    )
+
+def make_pdf(page_texts) -> bytes:
+    """Return a minimal PDF with one page per text, each line drawn as a Helvetica text line"""
+    def escape(line: str) -> str:
+        return line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page objects are numbered
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for text in page_texts:
+        lines = " ".join(f"({escape(line)}) Tj T*" for line in text.splitlines())
+        content = f"BT /F1 7 Tf 9 TL 20 780 Td {lines} ET".encode('latin-1', 'replace')
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (len(objects))
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
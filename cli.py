@@ -0,0 +1,150 @@
+"""Headless batch conversion of GRN/PRN PDFs, without Streamlit.
+
+    python -m cli grn <dir-or-pdf>... -o grn.xlsx [--workers N] [--summary summary.json]
+    python -m cli prn <dir-or-pdf>... -o prn.csv [--extractor pypdfium2]
+    python -m cli grn <huge-dir> -r -o grn.csv --stream
+    python -m cli grn vendor_batch.zip -o grn.xlsx
+
+Prints a progress line to stderr and a JSON summary (records, files, errors,
+totals check, timings) to stdout or --summary; documents whose line items
+don't add up to their totals are listed in the workbook's Totals_Check sheet.
+--stream writes rows to the output as files finish instead of building one
+DataFrame, keeping memory flat for batches of thousands of files. A file that
+runs longer than PDF_FILE_TIMEOUT_S (default 300 s) or crashes its worker is
+reported as timed out or crashed while the rest of the batch carries on.
+--line-items vectorized (or LINE_ITEM_ENGINE=vectorized) finds the line items
+of the whole batch in one pandas pass instead of line by line per document.
+Exits 1 if any file failed or nothing was extracted, 2 on bad arguments. To
+compare extraction backends on a sample set, see python -m extractors.
+"""
+import argparse
+import json
+import os
+import sys
+from typing import List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from extractors import DEFAULT_EXTRACTOR, EXTRACTORS, available_extractors
+from processing import (
+    DEFAULT_WORKERS, LINE_ITEM_ENGINE, LINE_ITEM_ENGINES, PdfSource, ProcessingStats, process_grn_files,
+    process_prn_files, write_excel,
+)
+
+PROCESSORS = {
+    'grn': (process_grn_files, 'GRN_Data'),
+    'prn': (process_prn_files, 'PRN_Data'),
+}
+
+def find_pdfs(paths: List[str], recursive: bool = False) -> List[PdfSource]:
+    """Collect PDFs and ZIP archives of PDFs from files and directories, named relative to the given directory"""
+    sources = []
+    for path in paths:
+        if os.path.isfile(path):
+            sources.append(PdfSource.from_path(path))
+            continue
+        for root, dirs, filenames in os.walk(path):
+            dirs.sort()
+            for filename in sorted(filenames):
+                if filename.lower().endswith(('.pdf', '.zip')):
+                    full_path = os.path.join(root, filename)
+                    sources.append(PdfSource.from_path(full_path, os.path.relpath(full_path, path)))
+            if not recursive:
+                break
+    return sources
+
+def _print_progress(done: int, total: int, name: str):
+    sys.stderr.write(f"\r[{done}/{total}] {name[-60:]:<60}")
+    if done == total:
+        sys.stderr.write("\n")
+    sys.stderr.flush()
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m cli', description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('kind', choices=sorted(PROCESSORS), help='document type to parse')
+    parser.add_argument('paths', nargs='+', help='PDF files or directories of PDFs')
+    parser.add_argument('-o', '--output', required=True, help='output .xlsx or .csv file')
+    parser.add_argument('-w', '--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'worker processes (default: {DEFAULT_WORKERS})')
+    parser.add_argument('-e', '--extractor', choices=sorted(EXTRACTORS), default=DEFAULT_EXTRACTOR,
+                        help=f'text extraction backend (default: {DEFAULT_EXTRACTOR})')
+    parser.add_argument('-r', '--recursive', action='store_true', help='descend into subdirectories')
+    parser.add_argument('--line-items', choices=LINE_ITEM_ENGINES, default=LINE_ITEM_ENGINE,
+                        help=f'line-item engine, ignored with --stream (default: {LINE_ITEM_ENGINE})')
+    parser.add_argument('--summary', help='write the JSON summary here instead of stdout')
+    parser.add_argument('-q', '--quiet', action='store_true', help='no progress line')
+    parser.add_argument('--stream', action='store_true',
+                        help='write rows as files finish, in bounded memory (no memory report)')
+    args = parser.parse_args(argv)
+
+    if not args.output.lower().endswith(('.xlsx', '.csv')):
+        parser.error('output must end in .xlsx or .csv')
+    if args.extractor not in available_extractors():
+        parser.error(f"extractor {args.extractor} is not installed")
+    missing = [path for path in args.paths if not os.path.exists(path)]
+    if missing:
+        parser.error(f"no such file or directory: {', '.join(missing)}")
+
+    process_files, sheet_name = PROCESSORS[args.kind]
+    sources = find_pdfs(args.paths, args.recursive)
+
+    stats = ProcessingStats()
+    progress = None if args.quiet else _print_progress
+    if args.stream:
+        from streaming import stream_to_file
+
+        records, errors = stream_to_file(
+            args.kind, sources, args.output, sheet_name, workers=args.workers, progress=progress, stats=stats,
+            extractor=args.extractor
+        )
+        return _report(args, sources, records, errors, None, stats)
+
+    df, errors = process_files(
+        sources, workers=args.workers, progress=progress, stats=stats, extractor=args.extractor,
+        line_items=args.line_items
+    )
+
+    totals_check = None
+    if df is not None:
+        from reconcile import mismatch_summary, reconcile
+
+        with stats.stage('check'):
+            mismatches = reconcile(df, args.kind)
+        totals_check = mismatch_summary(mismatches)
+        with stats.stage('export'):
+            if args.output.lower().endswith('.csv'):
+                df.to_csv(args.output, index=False)
+            else:
+                write_excel(df, args.output, sheet_name, {'Totals_Check': mismatches})
+
+    return _report(args, sources, 0 if df is None else len(df), errors,
+                   None if df is None else df.attrs.get('memory'), stats, totals_check)
+
+def _report(args, sources, records: int, errors: List[str], memory, stats: ProcessingStats,
+            totals_check: Optional[str] = None) -> int:
+    """Write the JSON summary and return the exit code"""
+    summary = {
+        'kind': args.kind,
+        'output': args.output if records else None,
+        'files': len(sources),
+        'records': records,
+        'errors': errors,
+        'memory': memory,
+        'totals_check': totals_check,
+        'timings': stats.to_dict(),
+    }
+    if args.summary:
+        with open(args.summary, 'w') as f:
+            json.dump(summary, f, indent=2)
+    else:
+        json.dump(summary, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+
+    return 1 if errors or not records else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""Output columns and column types of the GRN/PRN frames.
+
+Kept free of pandas so modules that only need the layout (the archive, the
+streaming writer) stay cheap to import.
+"""
+from datetime import datetime
+from typing import Optional
+
+# GRN output columns: document-level ones (one value per GRN) ...
+GRN_DOCUMENT_COLUMNS = [
+    'filename', 'store_name', 'vendor_code', 'vendor_name', 'vendor_address', 'vendor_gst_in',
+    'company_gst_no', 'invoice_no', 'invoice_date', 'invoice_value', 'invoice_tax_value',
+    'gin_no', 'gin_date', 'grn_no', 'grn_date', 'po_no', 'po_date', 'p_slip_no',
+    'total_gst_value', 'total_received_qty', 'total_accepted_qty', 'total_rejected_qty',
+    'total_cost_value', 'gross_value',
+]
+# ... followed by per-product ones as (column, key in parse_grn_text's product dict)
+GRN_ITEM_COLUMNS = [
+    ('serial_no', 'serial_no'), ('article_code', 'article_code'), ('ean_code', 'ean_code'),
+    ('description', 'description'), ('hsn_code', 'hsn_code'), ('gst_value', 'gst_value'),
+    ('received_qty', 'received_qty'), ('accepted_qty', 'accepted_qty'), ('rejected_qty', 'rejected_qty'),
+    ('uom', 'uom'), ('mrp', 'mrp'), ('product_total_cost_value', 'total_cost_value'),
+]
+
+# Column types; text columns not listed stay strings, except that document-level
+# text columns always become categoricals
+GRN_DTYPES = {
+    'integer': ['serial_no'],
+    'float': [
+        'invoice_value', 'invoice_tax_value', 'total_gst_value', 'total_received_qty',
+        'total_accepted_qty', 'total_rejected_qty', 'total_cost_value', 'gross_value',
+        'gst_value', 'received_qty', 'accepted_qty', 'rejected_qty', 'mrp', 'product_total_cost_value',
+    ],
+    'date': ['invoice_date', 'gin_date', 'grn_date', 'po_date'],
+    'category': ['uom'],
+}
+
+PRN_DTYPES = {
+    'integer': ['sno'],
+    'float': [
+        'total_qty', 'total_value', 'final_value', 'qty', 'mrp', 'cost', 'value',
+        'sgst', 'cgst', 'igst', 'gst_cess', 'adv_cess', 'net_val',
+    ],
+    'date': ['invoice_date', 'order_date'],
+    'category': ['uom', 'reason', 'return_reason'],
+}
+
+# Date layouts tried in order; a column is converted with the first one that parses every value
+DATE_FORMATS = ['%d.%m.%Y', '%d/%m/%Y', '%d-%m-%Y', '%d-%b-%Y', '%d.%m.%y', '%d/%m/%y', '%Y-%m-%d']
+
+# PRN columns in the order of parse_prn_documents' records
+PRN_COLUMNS = [
+    'store', 'vendor_code', 'vendor_name', 'vendor_address', 'vendor_gstin', 'company_gstin',
+    'doc_no', 'ref_doc_no', 'invoice_date', 'order_no', 'order_date', 'pslip_no',
+    'total_qty', 'total_value', 'final_value',
+    'sno', 'article_code', 'ean_code', 'ref_po', 'qty', 'uom', 'mrp', 'cost', 'value', 'reason',
+    'sgst', 'cgst', 'igst', 'gst_cess', 'adv_cess', 'net_val', 'description', 'hsn_code', 'return_reason',
+    'filename',
+]
+
+def parse_date(value: str) -> Optional[datetime]:
+    """A single document date read with the first of DATE_FORMATS that fits, or None"""
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+def parse_number(value: str) -> Optional[float]:
+    """A single numeric field as float, or None if it isn't numeric"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
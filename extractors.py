@@ -0,0 +1,203 @@
+"""PDF text-extraction backends.
+
+Each backend opens a PDF and returns an iterator over the text of its pages
+(each ending in a newline), or of a range of them, extracting a page only when
+it is reached.
+PyPDF2 is the default and the layout the parsers were written against; the
+others are used only when installed and selected, e.g. with PDF_EXTRACTOR.
+
+    python -m extractors grn <dir-or-pdf>... [--extractors pypdf2 pypdfium2] [-r]
+
+compares every available backend on a sample set: pages/sec, and whether the
+parsed output matches the PyPDF2 baseline file for file.
+"""
+import argparse
+import importlib.util
+import os
+import sys
+import time
+from io import BytesIO
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional
+
+class Pages:
+    """Iterator over the page texts of one opened PDF.
+
+    page_count() is read from the same reader where the backend allows, so a
+    caller that needs both the pages and their number opens the PDF only once.
+    """
+
+    def __init__(self, pages: Iterator[str], count: Callable[[], int]):
+        self._pages = pages
+        self._count = count
+
+    def __iter__(self) -> 'Pages':
+        return self
+
+    def __next__(self) -> str:
+        return next(self._pages)
+
+    def page_count(self) -> int:
+        """Number of pages in the whole PDF, not just the range being iterated"""
+        return self._count()
+
+class Extractor(NamedTuple):
+    """A registered backend: the module it needs, the page-text function and the page counter"""
+    module: str
+    pages: Callable[..., Iterator[str]]  # pages(pdf_bytes, start=0, stop=None)
+    count: Callable[[bytes], int]
+
+def _pypdf2_pages(pdf_bytes: bytes, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(BytesIO(pdf_bytes))
+    indices = range(*slice(start, stop).indices(len(reader.pages)))
+    return Pages((reader.pages[index].extract_text() + "\n" for index in indices), lambda: len(reader.pages))
+
+def _pypdf2_count(pdf_bytes: bytes) -> int:
+    from PyPDF2 import PdfReader
+
+    return len(PdfReader(BytesIO(pdf_bytes)).pages)
+
+def _pdfminer_pages(pdf_bytes: bytes, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+    from pdfminer.high_level import extract_pages
+    from pdfminer.layout import LTTextContainer
+
+    page_numbers = None if start == 0 and stop is None else range(start, sys.maxsize if stop is None else stop)
+    return (
+        "".join(element.get_text() for element in layout if isinstance(element, LTTextContainer)) + "\n"
+        for layout in extract_pages(BytesIO(pdf_bytes), page_numbers=page_numbers)
+    )
+
+def _pdfminer_count(pdf_bytes: bytes) -> int:
+    from pdfminer.pdfpage import PDFPage
+
+    return sum(1 for _ in PDFPage.get_pages(BytesIO(pdf_bytes)))
+
+def _pypdfium2_pages(pdf_bytes: bytes, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+    import pypdfium2 as pdfium
+
+    document = pdfium.PdfDocument(pdf_bytes)
+    # Counted up front, as the document is closed once its pages are read
+    page_count = len(document)
+
+    def pages():
+        try:
+            for index in range(*slice(start, stop).indices(page_count)):
+                page = document[index]
+                textpage = page.get_textpage()
+                # pdfium ends lines with \r\n
+                yield textpage.get_text_range().replace("\r\n", "\n") + "\n"
+                textpage.close()
+                page.close()
+        finally:
+            document.close()
+    return Pages(pages(), lambda: page_count)
+
+def _pypdfium2_count(pdf_bytes: bytes) -> int:
+    import pypdfium2 as pdfium
+
+    document = pdfium.PdfDocument(pdf_bytes)
+    try:
+        return len(document)
+    finally:
+        document.close()
+
+EXTRACTORS: Dict[str, Extractor] = {
+    'pypdf2': Extractor('PyPDF2', _pypdf2_pages, _pypdf2_count),
+    'pdfminer': Extractor('pdfminer', _pdfminer_pages, _pdfminer_count),
+    'pypdfium2': Extractor('pypdfium2', _pypdfium2_pages, _pypdfium2_count),
+}
+
+# Backend used when none is given explicitly
+DEFAULT_EXTRACTOR = os.getenv("PDF_EXTRACTOR", "pypdf2")
+
+def register_extractor(name: str, module: str, pages: Callable[..., Iterator[str]], count: Callable[[bytes], int]):
+    """Add a backend.
+
+    pages(pdf_bytes, start=0, stop=None) must return an iterator over the text
+    of pages start to stop (exclusive), each ending in a newline, optionally a
+    Pages that also counts them; count(pdf_bytes) returns the number of pages.
+    """
+    EXTRACTORS[name] = Extractor(module, pages, count)
+
+def available_extractors() -> List[str]:
+    """Names of the registered backends whose module is installed"""
+    return [name for name, extractor in EXTRACTORS.items() if importlib.util.find_spec(extractor.module)]
+
+def get_extractor(name: Optional[str] = None) -> Callable[..., Iterator[str]]:
+    """Page-text function of backend name (DEFAULT_EXTRACTOR when None)"""
+    return _backend(name).pages
+
+def open_pages(pdf_bytes: bytes, name: Optional[str] = None, start: int = 0, stop: Optional[int] = None) -> Pages:
+    """Open a PDF with backend name and return its pages start to stop as Pages.
+
+    Backends whose iterator can't count pages (pdfminer, or a registered one
+    returning a plain iterator) fall back to count_pages, which reads the PDF again.
+    """
+    pages = _backend(name).pages(pdf_bytes, start, stop)
+    if isinstance(pages, Pages):
+        return pages
+    return Pages(iter(pages), lambda: count_pages(pdf_bytes, name))
+
+def count_pages(pdf_bytes: bytes, name: Optional[str] = None) -> int:
+    """Number of pages in a PDF, read with backend name"""
+    return _backend(name).count(pdf_bytes)
+
+def _backend(name: Optional[str]) -> Extractor:
+    name = name or DEFAULT_EXTRACTOR
+    if name not in EXTRACTORS:
+        raise ValueError(f"Unknown PDF extractor {name!r}; choose from {', '.join(EXTRACTORS)}")
+    return EXTRACTORS[name]
+
+def main(argv=None) -> int:
+    from cli import find_pdfs
+    from parsers import parse_grn_text, parse_prn_challans
+    from processing import expand_archives
+
+    parser = argparse.ArgumentParser(
+        prog='python -m extractors', description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('kind', choices=['grn', 'prn'], help='parser to compare outputs with')
+    parser.add_argument('paths', nargs='+', help='PDF files or directories of PDFs')
+    parser.add_argument('--extractors', nargs='+', choices=sorted(EXTRACTORS),
+                        help='backends to compare (default: all installed)')
+    parser.add_argument('-r', '--recursive', action='store_true', help='descend into subdirectories')
+    args = parser.parse_args(argv)
+
+    parse = parse_grn_text if args.kind == 'grn' else parse_prn_challans
+    names = args.extractors or available_extractors()
+    missing = [name for name in names if name not in available_extractors()]
+    if missing:
+        parser.error(f"not installed: {', '.join(missing)}")
+    sources, _ = expand_archives(find_pdfs(args.paths, args.recursive))
+    samples = [(source.name, source.read()) for source in sources]
+
+    baseline = {}
+    for name, pdf_bytes in samples:
+        try:
+            baseline[name] = parse("".join(get_extractor('pypdf2')(pdf_bytes)))
+        except Exception:
+            pass
+
+    print(f"{'extractor':>10} {'files':>6} {'pages':>7} {'seconds':>8} {'pages/s':>8} {'identical':>10} {'failed':>7}")
+    for extractor in names:
+        pages_of = get_extractor(extractor)
+        pages = identical = failed = 0
+        seconds = 0.0
+        for name, pdf_bytes in samples:
+            started = time.perf_counter()
+            try:
+                texts = list(pages_of(pdf_bytes))
+            except Exception:
+                failed += 1
+                continue
+            seconds += time.perf_counter() - started
+            pages += len(texts)
+            identical += name in baseline and parse("".join(texts)) == baseline[name]
+        rate = pages / seconds if seconds else 0.0
+        print(f"{extractor:>10} {len(samples):>6} {pages:>7} {seconds:>8.2f} {rate:>8.1f} "
+              f"{identical:>4}/{len(baseline):<5} {failed:>7}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,159 @@
+import sys
+from array import array
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from columns import DATE_FORMATS, GRN_DOCUMENT_COLUMNS, GRN_DTYPES, GRN_ITEM_COLUMNS, PRN_DTYPES
+
+def _present(series: pd.Series) -> pd.Series:
+    """Series with empty strings treated as missing"""
+    return series.mask(series.eq(''))
+
+def to_number(series: pd.Series, integer: bool = False) -> pd.Series:
+    """Convert a text column to float (or nullable Int64), leaving it as text if any value isn't numeric"""
+    values = _present(series)
+    converted = pd.to_numeric(values, errors='coerce')
+    if (converted.isna() & values.notna()).any():
+        return series
+    if integer and (converted.dropna() % 1 == 0).all():
+        return converted.astype('Int64')
+    return converted.astype('float64')
+
+def coerce_number(series: pd.Series) -> pd.Series:
+    """A column as float for arithmetic, with values that aren't numeric (or columns left as text) as NaN"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype(object)
+    return pd.to_numeric(series, errors='coerce')
+
+def to_date(series: pd.Series) -> pd.Series:
+    """Convert a text column to datetime64, leaving it as text if no single known format fits"""
+    values = _present(series)
+    present = values.notna()
+    if not present.any():
+        return series
+    for fmt in DATE_FORMATS:
+        converted = pd.to_datetime(values, format=fmt, errors='coerce')
+        if not (converted.isna() & present).any():
+            return converted
+    return series
+
+def apply_dtypes(df: pd.DataFrame, dtypes: Dict[str, List[str]], categorize_text: bool = False) -> pd.DataFrame:
+    """Convert the columns of df named in dtypes; with categorize_text every remaining text column becomes a categorical"""
+    for column in df.columns:
+        series = df[column]
+        if column in dtypes.get('integer', ()):
+            series = to_number(series, integer=True)
+        elif column in dtypes.get('float', ()):
+            series = to_number(series)
+        elif column in dtypes.get('date', ()):
+            series = to_date(series)
+        if series.dtype == object and (categorize_text or column in dtypes.get('category', ())):
+            series = series.astype('category')
+        df[column] = series
+    return df
+
+def _object_bytes(values) -> int:
+    """Memory of values held as a column of Python objects"""
+    return sum(sys.getsizeof(value) for value in values) + 8 * len(values)
+
+class FrameBuilder:
+    """Accumulate parsed documents column-wise and build a typed DataFrame.
+
+    Document-level fields are stored once per document and broadcast to its
+    items only when the frame is built, as categoricals. With fixed columns
+    (GRN) missing values are ''; otherwise columns are discovered in order of
+    first appearance and missing values are None, as in a frame built from
+    records. trailing_columns are moved to the end of the frame.
+    """
+
+    def __init__(self, dtypes: Dict[str, List[str]],
+                 document_columns: Optional[Sequence[str]] = None,
+                 item_columns: Optional[Sequence[Tuple[str, str]]] = None,
+                 trailing_columns: Sequence[str] = ()):
+        self.dtypes = dtypes
+        self.document_columns = document_columns
+        self.item_columns = item_columns
+        self.trailing_columns = trailing_columns
+        self.documents: List[Dict[str, Any]] = []
+        self._doc_index = array('q')
+        self._items: Dict[str, list] = {column: [] for column, _ in item_columns or ()}
+        self._n_items = 0
+
+    def __len__(self):
+        return self._n_items
+
+    def add(self, document: Dict[str, Any], items: List[Dict[str, Any]]):
+        """Add one document and its items (documents without items produce no rows)"""
+        if not items:
+            return
+        self._doc_index.extend([len(self.documents)] * len(items))
+        self.documents.append(document)
+
+        if self.item_columns is not None:
+            for column, key in self.item_columns:
+                self._items[column].extend(item.get(key, '') for item in items)
+        else:
+            for item in items:
+                for key in item:
+                    if key not in self._items:
+                        self._items[key] = [None] * self._n_items
+                for key, values in self._items.items():
+                    values.append(item.get(key))
+                self._n_items += 1
+            return
+        self._n_items += len(items)
+
+    def build(self) -> Optional[pd.DataFrame]:
+        """Return the typed frame (None when no items were added) with a memory report in df.attrs['memory']"""
+        if not self._n_items:
+            return None
+
+        if self.document_columns is not None:
+            documents = pd.DataFrame({
+                column: [document.get(column, '') for document in self.documents]
+                for column in self.document_columns
+            })
+        else:
+            documents = pd.DataFrame.from_records(self.documents)
+        items = pd.DataFrame(self._items)
+
+        # What the same rows cost as one object column per field with every
+        # document value repeated on each of its items
+        doc_index = np.frombuffer(self._doc_index, dtype=np.int64)
+        items_per_document = np.bincount(doc_index, minlength=len(self.documents))
+        document_columns = list(documents.columns)
+        untyped_bytes = int(items.memory_usage(deep=True, index=False).sum()) + sum(
+            _object_bytes([document.get(column, '') for column in document_columns]) * int(count)
+            for document, count in zip(self.documents, items_per_document)
+        )
+
+        documents = apply_dtypes(documents, self.dtypes, categorize_text=True)
+        items = apply_dtypes(items, self.dtypes)
+        broadcast = documents.take(doc_index).reset_index(drop=True)
+        df = pd.concat([broadcast, items], axis=1)
+
+        trailing = [column for column in self.trailing_columns if column in df.columns]
+        if trailing:
+            df = df[[column for column in df.columns if column not in trailing] + trailing]
+
+        df.attrs['memory'] = {
+            'untyped_bytes': untyped_bytes,
+            'typed_bytes': int(df.memory_usage(deep=True).sum()),
+        }
+        return df
+
+def memory_summary(df: pd.DataFrame) -> Optional[str]:
+    """Human-readable before/after memory line for a frame built by FrameBuilder"""
+    memory = df.attrs.get('memory')
+    if not memory:
+        return None
+    before, after = memory['untyped_bytes'], memory['typed_bytes']
+    saved = 1 - after / before if before else 0
+    return f"{after / 2**20:.1f} MB in memory (untyped {before / 2**20:.1f} MB, {saved:.0%} saved)"
+
+def grn_frame_builder() -> FrameBuilder:
+    return FrameBuilder(GRN_DTYPES, document_columns=GRN_DOCUMENT_COLUMNS, item_columns=GRN_ITEM_COLUMNS)
+
+def prn_frame_builder() -> FrameBuilder:
+    return FrameBuilder(PRN_DTYPES, trailing_columns=('filename',))
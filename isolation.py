@@ -0,0 +1,277 @@
+"""Worker processes that can be killed one at a time.
+
+A ProcessPoolExecutor can't stop a task that spins forever, and a worker that
+dies (a segfault in a PDF library, the OOM killer) breaks the whole pool and
+fails every file still queued. IsolatedPool runs each task in a worker of its
+own with a wall-time limit and, where the platform allows, a memory limit: a
+worker past its deadline is killed, a worker that dies is replaced, and only
+that task fails (with FileTimeout or WorkerCrashed) while the others carry on.
+"""
+import os
+import signal
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Deque, List, Optional, Tuple
+
+# A task (one file, or one page range of a large file) still running after
+# this many seconds has its worker killed; 0 means no limit
+FILE_TIMEOUT_S = float(os.getenv("PDF_FILE_TIMEOUT_S", 300))
+
+# Address space each worker may use, in MB; 0 means no limit
+FILE_MEMORY_MB = int(os.getenv("PDF_FILE_MEMORY_MB", 0))
+
+# Exit status of a worker that ran out of its memory limit
+MEMORY_EXIT_CODE = 75
+
+class FileTimeout(Exception):
+    """A task ran past the wall-time limit and its worker was killed"""
+
+    def __init__(self, seconds: float):
+        super().__init__(f"timed out after {seconds:g} s and was stopped")
+        self.seconds = seconds
+
+class WorkerCrashed(Exception):
+    """The worker running a task died or ran out of its memory limit"""
+
+# Set in worker processes of an IsolatedPool
+_in_worker = False
+
+def in_isolated_worker() -> bool:
+    """Whether this process is an IsolatedPool worker, whose death only fails its own task"""
+    return _in_worker
+
+def isolation_enabled() -> bool:
+    """Whether files should run in killable workers even when they'd otherwise run in this process"""
+    return FILE_TIMEOUT_S > 0 or FILE_MEMORY_MB > 0
+
+def _limit_memory(memory_mb: int):
+    try:
+        import resource
+    except ImportError:
+        return  # no rlimits on this platform; the wall-time limit still applies
+    limit = memory_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+def _worker_main(conn, memory_mb: int):
+    """Run tasks received on conn one at a time, sending back ('ok', result) or ('error', exception)"""
+    global _in_worker
+    _in_worker = True
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C is for the parent to handle
+    if memory_mb:
+        _limit_memory(memory_mb)
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, OSError):
+            return
+        if task is None:
+            return
+        fn, args, kwargs = task
+        try:
+            reply = ('ok', fn(*args, **kwargs))
+        except MemoryError:
+            # Nothing in this process can be relied on any more
+            os._exit(MEMORY_EXIT_CODE)
+        except BaseException as e:
+            reply = ('error', e)
+        try:
+            conn.send(reply)
+        except MemoryError:
+            os._exit(MEMORY_EXIT_CODE)
+        except Exception as e:
+            # A result or exception that can't be pickled
+            conn.send(('error', RuntimeError(f"{type(e).__name__}: {e}")))
+
+class _Worker:
+    def __init__(self, context, memory_mb: int):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child, memory_mb), daemon=True)
+        self.process.start()
+        child.close()
+        self.future: Optional[Future] = None
+        self.deadline: Optional[float] = None
+
+    def stop(self, kill: bool = False):
+        if kill:
+            self.process.kill()
+        else:
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+        self.process.join(None if kill else 5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+class IsolatedPool:
+    """An executor of at most max_workers processes whose tasks can be timed out and survive crashes.
+
+    Supports submit, shutdown and use as a context manager like
+    ProcessPoolExecutor. Futures can be cancelled until their task starts.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, timeout_s: float = FILE_TIMEOUT_S,
+                 memory_mb: int = FILE_MEMORY_MB):
+        # multiprocessing is a sizeable import that in-process runs never need
+        import multiprocessing
+
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.timeout_s = timeout_s
+        self.memory_mb = memory_mb
+        self._context = multiprocessing.get_context()
+        self._pending: Deque[Tuple[Future, Any, tuple, dict]] = deque()
+        self._idle: List[_Worker] = []
+        self._busy: List[_Worker] = []
+        self._lock = threading.Lock()
+        self._wake_recv, self._wake_send = self._context.Pipe(duplex=False)
+        self._woken = False  # a wake-up is waiting in the pipe (one is enough)
+        self._shutdown = False
+        self._manager: Optional[threading.Thread] = None
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        future = Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError('cannot schedule new futures after shutdown')
+            self._pending.append((future, fn, args, kwargs))
+            if self._manager is None:
+                self._manager = threading.Thread(target=self._manage, name='isolated-pool', daemon=True)
+                self._manager.start()
+            self._wake()
+        return future
+
+    def _wake(self):
+        """Have the manager look at the queue again (called holding the lock)"""
+        if not self._woken:
+            self._woken = True
+            self._wake_send.send(None)
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False):
+        with self._lock:
+            self._shutdown = True
+            if cancel_futures:
+                for future, *_ in self._pending:
+                    future.cancel()
+            manager = self._manager
+            if manager is not None:
+                self._wake()
+        if manager is not None and wait:
+            manager.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown(wait=True)
+        return False
+
+    def _start(self, future: Future, fn, args, kwargs):
+        """Send a task to an idle or new worker, replacing a worker that died while idle"""
+        for attempt in range(2):
+            try:
+                worker = self._idle.pop() if self._idle else _Worker(self._context, self.memory_mb)
+            except OSError as e:
+                future.set_exception(WorkerCrashed(f"crashed: could not start a worker ({e})"))
+                return
+            try:
+                worker.conn.send((fn, args, kwargs))
+            except (BrokenPipeError, EOFError, ConnectionError) as e:
+                worker.stop(kill=True)
+                if attempt:
+                    future.set_exception(WorkerCrashed(f"crashed: could not start a worker ({e})"))
+                continue
+            except Exception as e:
+                # The task can't be pickled; the worker never saw it
+                self._idle.append(worker)
+                future.set_exception(e)
+                return
+            worker.future = future
+            worker.deadline = time.monotonic() + self.timeout_s if self.timeout_s else None
+            self._busy.append(worker)
+            return
+
+    def _assign(self):
+        while len(self._busy) < self.max_workers:
+            with self._lock:
+                if not self._pending:
+                    return
+                future, fn, args, kwargs = self._pending.popleft()
+            if future.set_running_or_notify_cancel():
+                self._start(future, fn, args, kwargs)
+
+    def _crash_message(self, worker: _Worker) -> str:
+        worker.process.join(1)
+        code = worker.process.exitcode
+        if code == MEMORY_EXIT_CODE:
+            if not self.memory_mb:
+                return "crashed: its worker ran out of memory"
+            return f"crashed: it exceeded the memory limit of {self.memory_mb} MB"
+        if code is not None and code < 0:
+            try:
+                name = signal.Signals(-code).name
+            except ValueError:
+                name = f"signal {-code}"
+            hint = " (out of memory?)" if -code == signal.SIGKILL else ""
+            return f"crashed: its worker was killed by {name}{hint}"
+        return f"crashed: its worker exited with code {code}"
+
+    def _finish(self, worker: _Worker, error: Optional[Exception] = None, reply=None):
+        """Settle a busy worker's task; a worker that failed is discarded (a new one starts when needed)"""
+        self._busy.remove(worker)
+        future, worker.future, worker.deadline = worker.future, None, None
+        if error is not None:
+            future.set_exception(error)
+            return
+        self._idle.append(worker)
+        status, value = reply
+        if status == 'ok':
+            future.set_result(value)
+        else:
+            future.set_exception(value)
+
+    def _manage(self):
+        from multiprocessing.connection import wait
+
+        while True:
+            self._assign()
+            with self._lock:
+                if self._shutdown and not self._busy and not any(
+                    not future.cancelled() for future, *_ in self._pending
+                ):
+                    break
+            deadlines = [worker.deadline for worker in self._busy if worker.deadline is not None]
+            timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+            handles = [self._wake_recv] + [worker.conn for worker in self._busy]
+            handles += [worker.process.sentinel for worker in self._busy]
+            ready = set(wait(handles, timeout))
+            with self._lock:
+                if self._wake_recv in ready:
+                    self._wake_recv.recv()
+                    self._woken = False
+
+            now = time.monotonic()
+            for worker in list(self._busy):
+                if worker.conn in ready:
+                    try:
+                        reply = worker.conn.recv()
+                    except (EOFError, OSError):
+                        message = self._crash_message(worker)
+                        worker.stop(kill=True)
+                        self._finish(worker, WorkerCrashed(message))
+                        continue
+                    self._finish(worker, reply=reply)
+                elif worker.process.sentinel in ready:
+                    message = self._crash_message(worker)
+                    worker.stop(kill=True)
+                    self._finish(worker, WorkerCrashed(message))
+                elif worker.deadline is not None and now >= worker.deadline:
+                    worker.stop(kill=True)
+                    self._finish(worker, FileTimeout(self.timeout_s))
+
+        for worker in self._idle:
+            worker.stop()
+        self._idle = []
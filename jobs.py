@@ -0,0 +1,140 @@
+"""Background processing jobs that outlive a Streamlit script run.
+
+A Job runs IncrementalBatch.update on a thread and records its progress, so
+the UI can poll it, preview the files finished so far and cancel it. Jobs are
+kept by a process-wide JobManager, which lets a reloaded page find its job
+again by id. Given a FileScheduler, the manager runs every job's files on its
+shared pool, queued per session.
+"""
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from processing import DOCUMENT_KINDS, IncrementalBatch, ProcessingStats
+from scheduler import FileScheduler
+
+# Finished jobs are forgotten this many seconds after they end
+JOB_RETENTION_S = 3600
+
+class Job:
+    """One run of an IncrementalBatch on a background thread.
+
+    state is 'running', then 'done', 'cancelled' or 'failed'. After the run,
+    result holds update()'s (DataFrame, errors, duplicates) and notes any
+    messages added by the after hook.
+    """
+
+    def __init__(self, kind: str, batch: IncrementalBatch, files, signature, workers: Optional[int],
+                 extractor: Optional[str], after: Optional[Callable[['Job'], None]] = None,
+                 scheduler: Optional[FileScheduler] = None, session: Optional[str] = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.scheduler = scheduler
+        self.session = session or self.id
+        self.batch = batch
+        self.signature = signature
+        self.state = 'running'
+        self.done = 0
+        self.total = 0
+        self.current = ''
+        self.error: Optional[str] = None
+        self.result = None
+        self.notes: List[str] = []
+        self.stats = ProcessingStats()
+        self.started = time.time()
+        self.finished: Optional[float] = None
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, args=(files, workers, extractor, after), name=f"{kind}-job-{self.id[:8]}", daemon=True
+        )
+
+    def _progress(self, done: int, total: int, name: str):
+        self.done, self.total, self.current = done, total, name
+
+    def _run(self, files, workers, extractor, after):
+        try:
+            executor = None
+            if self.scheduler is not None:
+                executor = self.scheduler.executor(self.session)
+                workers = self.scheduler.workers
+            self.result = self.batch.update(
+                files, workers=workers, progress=self._progress, stats=self.stats, extractor=extractor,
+                cancel=self._cancel, executor=executor
+            )
+            if after:
+                after(self)
+            self.state = 'cancelled' if self._cancel.is_set() else 'done'
+        except Exception as e:
+            self.error = str(e)
+            self.state = 'failed'
+        finally:
+            self.finished = time.time()
+
+    def start(self):
+        self._thread.start()
+
+    def cancel(self):
+        """Stop after the files in progress; the result keeps the files finished so far"""
+        self._cancel.set()
+
+    @property
+    def running(self) -> bool:
+        return self.state == 'running'
+
+    @property
+    def cancelling(self) -> bool:
+        return self.running and self._cancel.is_set()
+
+    def queue_status(self) -> Optional[Dict[str, Any]]:
+        """The scheduler's view of this job's session (see FileScheduler.status), None without one"""
+        return None if self.scheduler is None else self.scheduler.status(self.session)
+
+    def partial_documents(self) -> List[Any]:
+        """(name, parsed documents) of the files finished so far in this run"""
+        return list(self.batch.new_documents)
+
+    def preview(self, max_rows: int = 500):
+        """Frame of the first max_rows or so records finished so far (None before any)"""
+        _, make_builder, add_document, _ = DOCUMENT_KINDS[self.kind]
+        builder = make_builder()
+        for name, documents in self.partial_documents():
+            for document in documents:
+                add_document(builder, name, document)
+            if len(builder) >= max_rows:
+                break
+        return builder.build()
+
+class JobManager:
+    """Jobs by id, shared by every session of the app process"""
+
+    def __init__(self, scheduler: Optional[FileScheduler] = None):
+        self.scheduler = scheduler
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, batch: IncrementalBatch, files, signature=None, workers: Optional[int] = None,
+               extractor: Optional[str] = None, after: Optional[Callable[[Job], None]] = None,
+               session: Optional[str] = None) -> Job:
+        """Start processing files into batch in the background.
+
+        after(job), if given, runs on the job thread once the batch is updated
+        (also after a cancel) and may add messages to job.notes. With a
+        scheduler, the files queue behind those of other sessions in turn and
+        workers is the shared pool's size.
+        """
+        job = Job(kind, batch, list(files), signature, workers, extractor, after, self.scheduler, session)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        job.start()
+        return job
+
+    def get(self, job_id: Optional[str]) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id) if job_id else None
+
+    def _prune(self):
+        cutoff = time.time() - JOB_RETENTION_S
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished and job.finished < cutoff]:
+            del self._jobs[job_id]
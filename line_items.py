@@ -0,0 +1,189 @@
+"""Vectorized line-item extraction over the texts of a whole batch.
+
+An alternative to the per-line loops of parse_grn_text and parse_prn_challan:
+the lines of every document go into one Series, item lines and the TBD / HSN
+lines following them are recognised with one compiled pattern each through
+pandas string methods, and the product table of the batch comes out as one
+DataFrame (a 'document' column gives each item's position in texts). Values
+are the same strings the per-line parsers put in their product dicts.
+process_grn_files/process_prn_files use it with line_items='vectorized'
+(python -m cli --line-items vectorized, or LINE_ITEM_ENGINE=vectorized).
+
+    python -m line_items grn <dir-or-pdf>... [-r] [--extractor pypdfium2]
+
+checks that both engines give identical products on a sample set and times them.
+"""
+import argparse
+import re
+import sys
+import time
+from typing import Any, Dict, List, Sequence
+
+import pandas as pd
+
+# Item line: serial number, 7-digit article code and the remaining fields, as
+# the per-line parsers split them on whitespace (the ITEM_LINE_RE prefix
+# followed by at least 9 parts for a GRN, 10 for a PRN)
+_FIELD = r'(?:\s+(\S+))'
+GRN_ITEM_RE = re.compile(r'^(\d+)\s+(\d{7}\S*)' + r'\s+(\S+)' * 7 + _FIELD + '?')
+PRN_ITEM_RE = re.compile(r'^(\d+)\s+(\d{7}\S*)' + r'\s+(\S+)' * 8 + (_FIELD + '?') * 6)
+
+GRN_ITEM_FIELDS = [
+    'serial_no', 'article_code', 'ean_code', 'gst_value', 'received_qty', 'accepted_qty', 'rejected_qty',
+    'uom', 'mrp', 'total_cost_value',
+]
+PRN_ITEM_FIELDS = [
+    'sno', 'article_code', 'ean_code', 'ref_po', 'qty', 'uom', 'mrp', 'cost', 'value', 'reason',
+    'sgst', 'cgst', 'igst', 'gst_cess', 'adv_cess', 'net_val',
+]
+
+# Description line: "TBD..." then the description, optionally ending in an HSN code
+_DESCRIPTION_RE = re.compile(r'^TBD\S*\s+(.*)$')
+_LAST_WORD_RE = re.compile(r'^(?:(.*) )?(\S+)$')
+_PRN_HSN_RE = re.compile(r'^(\d{8}\S*)(?:\s+(.*))?$')
+_EIGHT_DIGITS_RE = re.compile(r'(\d{8})')
+
+def _lines(texts: Sequence[str]) -> pd.DataFrame:
+    """Stripped lines of all texts with their document position and the next two lines of the same document"""
+    lines = pd.Series([line for text in texts for line in text.split('\n')], dtype=object).str.strip()
+    document = pd.Series(
+        [position for position, text in enumerate(texts) for _ in range(text.count('\n') + 1)], dtype='int64'
+    )
+    frame = pd.DataFrame({'document': document, 'line': lines})
+    for offset, column in ((1, 'next'), (2, 'after_next')):
+        following = lines.shift(-offset)
+        frame[column] = following.where(document.shift(-offset).eq(document))
+    return frame
+
+def _words(series: pd.Series) -> pd.Series:
+    """Whitespace-separated words joined with single spaces, like ' '.join(text.split())"""
+    return series.str.replace(r'\s+', ' ', regex=True)
+
+def grn_line_items(texts: Sequence[str]) -> pd.DataFrame:
+    """Products of every GRN text, as parse_grn_text finds them, in one frame"""
+    lines = _lines(texts)
+    fields = lines['line'].str.extract(GRN_ITEM_RE)
+    is_item = fields[0].notna()
+    items = fields[is_item].fillna('')
+    items.columns = GRN_ITEM_FIELDS
+    following = lines.loc[is_item, 'next']
+
+    # "TBD <description> [HSN]": the last word is the HSN code if it has 6+ digits
+    described = following.str.startswith('TBD', na=False)
+    rest = _words(following[described].str.extract(_DESCRIPTION_RE)[0].dropna())
+    last = rest.str.extract(_LAST_WORD_RE)
+    has_hsn = last[1].str.isdigit() & last[1].str.len().ge(6)
+    items['description'] = ''
+    items['hsn_code'] = ''
+    items.loc[rest.index, 'description'] = rest.where(~has_hsn, last[0].fillna(''))
+    items.loc[has_hsn[has_hsn].index, 'hsn_code'] = last.loc[has_hsn, 1]
+
+    items.insert(0, 'document', lines.loc[is_item, 'document'])
+    return items.reset_index(drop=True)
+
+def prn_line_items(texts: Sequence[str]) -> pd.DataFrame:
+    """Products of every PRN challan text, as parse_prn_challan finds them, in one frame.
+
+    return_reason is None for items whose per-line product dict has no such key.
+    """
+    lines = _lines(texts)
+    fields = lines['line'].str.extract(PRN_ITEM_RE)
+    is_item = fields[0].notna()
+    items = fields[is_item].copy()
+    items.columns = PRN_ITEM_FIELDS
+    for column in ('sgst', 'cgst', 'igst', 'gst_cess', 'adv_cess'):
+        items[column] = items[column].fillna('0.00')
+    items['net_val'] = items['net_val'].fillna(items['value'])
+    following = lines.loc[is_item, ['next', 'after_next']]
+
+    # "TBD <description>", then an HSN line ("<8 digits> [return reason]") or a "Date expired" line
+    rest = following['next'].where(following['next'].str.startswith('TBD', na=False)).str.extract(_DESCRIPTION_RE)[0]
+    described = rest.notna()
+    description = _words(rest[described])
+    hsn_line = following.loc[described, 'after_next']
+    hsn = hsn_line.str.extract(_PRN_HSN_RE)
+    has_hsn = hsn[0].notna()
+    expired = ~has_hsn & hsn_line.str.contains('Date expired', regex=False, na=False)
+
+    items['description'] = ''
+    items['hsn_code'] = ''
+    items['return_reason'] = None
+    items.loc[description.index, 'description'] = description
+    hsn_index = has_hsn[has_hsn].index
+    items.loc[hsn_index, 'hsn_code'] = hsn.loc[has_hsn, 0]
+    with_reason = hsn.loc[has_hsn, 1].notna()
+    items.loc[with_reason[with_reason].index, 'return_reason'] = _words(hsn.loc[has_hsn, 1][with_reason])
+
+    # Expired items take the first 8-digit run of the description as HSN code
+    # (rare, so the per-item removal from the description stays a plain loop)
+    expired_index = expired[expired].index
+    items.loc[expired_index, 'return_reason'] = 'Date expired'
+    code = description[expired_index].str.extract(_EIGHT_DIGITS_RE)[0].dropna()
+    items.loc[code.index, 'hsn_code'] = code
+    items.loc[code.index, 'description'] = [
+        text.replace(value, '').strip() for text, value in zip(description[code.index], code)
+    ]
+
+    items.insert(0, 'document', lines.loc[is_item, 'document'])
+    return items.reset_index(drop=True)
+
+def products_by_document(items: pd.DataFrame, count: int) -> List[List[Dict[str, Any]]]:
+    """Per document, the product dicts of a line-item frame as the per-line parsers return them"""
+    products: List[List[Dict[str, Any]]] = [[] for _ in range(count)]
+    for record in items.to_dict('records'):
+        document = record.pop('document')
+        if 'return_reason' in record and not isinstance(record['return_reason'], str):
+            del record['return_reason']
+        products[document].append(record)
+    return products
+
+def main(argv=None) -> int:
+    from cli import find_pdfs
+    from extractors import DEFAULT_EXTRACTOR
+    from parsers import extract_text_from_pdf_bytes, parse_grn_text, parse_prn_challan, split_prn_challans
+    from processing import expand_archives
+
+    parser = argparse.ArgumentParser(
+        prog='python -m line_items', description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('kind', choices=['grn', 'prn'], help='document type of the sample set')
+    parser.add_argument('paths', nargs='+', help='PDF files or directories of PDFs')
+    parser.add_argument('-r', '--recursive', action='store_true', help='descend into subdirectories')
+    parser.add_argument('-e', '--extractor', default=DEFAULT_EXTRACTOR, help='text extraction backend')
+    args = parser.parse_args(argv)
+
+    texts, names = [], []
+    sources, _ = expand_archives(find_pdfs(args.paths, args.recursive))
+    for source in sources:
+        try:
+            text = extract_text_from_pdf_bytes(source.read(), args.extractor)
+        except Exception as e:
+            print(f"Skipped {source.name}: {e}", file=sys.stderr)
+            continue
+        documents = list(split_prn_challans([text])) if args.kind == 'prn' else [text] if text else []
+        texts.extend(documents)
+        names.extend([source.name] * len(documents))
+
+    parse_one, line_items = (
+        (parse_grn_text, grn_line_items) if args.kind == 'grn' else (parse_prn_challan, prn_line_items)
+    )
+    started = time.perf_counter()
+    per_line = [parse_one(text)['products'] for text in texts]
+    per_line_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    items = line_items(texts)
+    vectorized_s = time.perf_counter() - started
+
+    differing = [
+        name for name, expected, got in zip(names, per_line, products_by_document(items, len(texts))) if expected != got
+    ]
+    print(f"{len(texts)} documents, {len(items)} items")
+    print(f"per-line: {per_line_s:.3f} s, vectorized: {vectorized_s:.3f} s")
+    print(f"identical: {len(texts) - len(differing)}/{len(texts)}")
+    for name in sorted(set(differing)):
+        print(f"  differs: {name}")
+    return 1 if differing else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
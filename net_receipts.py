@@ -0,0 +1,186 @@
+"""Net receipts: goods received (GRN) less goods returned (PRN).
+
+Joins GRN and PRN result frames (from process_grn_files / process_prn_files or
+the archive) on vendor code + article code, and on the PO where one is known
+(GRN PO.No, PRN Ref.PO), into a workbook of net positions with vendor and
+store pivots. GRN and PRN headers print the store differently, so store names
+are normalised (case, spacing and punctuation) for the per-store sheets only. Both sides are reduced to one row per key with a categorical
+groupby before an index-aligned join, so a year of documents joins in seconds.
+
+    python -m net_receipts --grn <dir-or-pdf>... --prn <dir-or-pdf>... -o net.xlsx [-r] [--workers N]
+"""
+import argparse
+import os
+import sys
+from typing import Dict, Optional
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from frames import coerce_number
+
+NET_KEYS = ['vendor_code', 'article_code']
+
+# Keys of the per-store sheets, on the normalised store name
+STORE_KEYS = NET_KEYS + ['store']
+
+# Per document type: result columns read as (store, PO, quantity, value)
+NET_SOURCES = {
+    'grn': ('store_name', 'po_no', 'accepted_qty', 'product_total_cost_value'),
+    'prn': ('store', 'ref_po', 'qty', 'value'),
+}
+
+SIDE_PREFIXES = {'grn': 'received_', 'prn': 'returned_'}
+
+def _text(df: Optional[pd.DataFrame], column: str) -> pd.Series:
+    """A key column as stripped text, '' where missing"""
+    if df is None or column not in df.columns:
+        return pd.Series('', index=range(0 if df is None else len(df)), dtype=object)
+    series = df[column].astype(object)
+    return series.where(series.notna(), '').astype(str).str.strip()
+
+def _number(df: Optional[pd.DataFrame], column: str) -> pd.Series:
+    """A quantity/value column as float, NaN where it isn't numeric"""
+    if df is None or column not in df.columns:
+        return pd.Series(float('nan'), index=range(0 if df is None else len(df)))
+    return coerce_number(df[column])
+
+def _store_key(series: pd.Series) -> pd.Series:
+    """Store names in one spelling: upper case, runs of spaces and punctuation as one space"""
+    return series.str.upper().str.replace(r'[^A-Z0-9]+', ' ', regex=True).str.strip()
+
+def _side(df: Optional[pd.DataFrame], kind: str) -> pd.DataFrame:
+    """The join keys, names, quantity and value of every item of one side"""
+    store, po, qty, value = NET_SOURCES[kind]
+    return pd.DataFrame({
+        'vendor_code': _text(df, 'vendor_code'),
+        'article_code': _text(df, 'article_code'),
+        'store': _store_key(_text(df, store)),
+        'po': _text(df, po),
+        'vendor_name': _text(df, 'vendor_name'),
+        'description': _text(df, 'description'),
+        'qty': _number(df, qty),
+        'value': _number(df, value),
+    })
+
+def _share_categories(grn: pd.DataFrame, prn: pd.DataFrame, columns):
+    """Make columns categoricals with the same categories on both sides, so their groups join on codes"""
+    for column in columns:
+        categories = union_categoricals(
+            [pd.Categorical(grn[column]), pd.Categorical(prn[column])], sort_categories=True
+        ).categories
+        dtype = pd.CategoricalDtype(categories)
+        grn[column] = grn[column].astype(dtype)
+        prn[column] = prn[column].astype(dtype)
+
+def _net(grn: pd.DataFrame, prn: pd.DataFrame, keys) -> pd.DataFrame:
+    """Received and returned quantity/value per key, joined on the key index, with the net of both"""
+    sides = [
+        side.groupby(keys, observed=True)[['qty', 'value']].sum().add_prefix(SIDE_PREFIXES[kind])
+        for kind, side in (('grn', grn), ('prn', prn))
+    ]
+    net = sides[0].join(sides[1], how='outer').fillna(0.0)
+    net['net_qty'] = net['received_qty'] - net['returned_qty']
+    net['net_value'] = net['received_value'] - net['returned_value']
+    return net
+
+def _with_names(net: pd.DataFrame, names: pd.DataFrame) -> pd.DataFrame:
+    """net with its key index as columns and the vendor name / description of each code added"""
+    net = net.reset_index()
+    net = net.astype({column: object for column in net.columns if isinstance(net[column].dtype, pd.CategoricalDtype)})
+    for code, name in (('vendor_code', 'vendor_name'), ('article_code', 'description')):
+        if code in net.columns:
+            lookup = names.loc[names[name].ne(''), [code, name]].drop_duplicates(code).set_index(code)[name]
+            net.insert(net.columns.get_loc(code) + 1, name, net[code].map(lookup).fillna(''))
+    return net
+
+def _summary(positions: pd.DataFrame, keys) -> pd.DataFrame:
+    """Received, returned and net value per key, with the share of value returned"""
+    summary = positions.groupby(keys, sort=True)[['received_value', 'returned_value', 'net_value']].sum()
+    received = summary['received_value']
+    summary['return_rate'] = (summary['returned_value'] / received.where(received.ne(0))).round(4)
+    return summary.reset_index()
+
+def net_receipt_sheets(grn_df: Optional[pd.DataFrame], prn_df: Optional[pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """The sheets of the net receipts workbook, by name.
+
+    Net_Positions has one row per vendor/article, Net_By_PO one per
+    vendor/article/PO (items with a PO only) and Net_By_Store one per
+    vendor/article/store; the vendor summary is built from Net_Positions and
+    the pivot and store summary from Net_By_Store.
+    """
+    grn, prn = _side(grn_df, 'grn'), _side(prn_df, 'prn')
+    _share_categories(grn, prn, STORE_KEYS + ['po'])
+    names = pd.concat([grn[['vendor_code', 'vendor_name', 'article_code', 'description']],
+                       prn[['vendor_code', 'vendor_name', 'article_code', 'description']]])
+    names = names.astype({'vendor_code': object, 'article_code': object})
+
+    positions = _with_names(_net(grn, prn, NET_KEYS), names)
+    by_po = _with_names(
+        _net(grn[grn['po'].ne('')], prn[prn['po'].ne('')], ['vendor_code', 'article_code', 'po']), names
+    ).rename(columns={'po': 'po_no'})
+    by_store = _with_names(_net(grn, prn, STORE_KEYS), names)
+
+    pivot = by_store.pivot_table(
+        index=['vendor_code', 'vendor_name'], columns='store', values='net_value', aggfunc='sum',
+        fill_value=0.0, margins=True, margins_name='Total'
+    ).reset_index()
+    pivot.columns.name = None
+
+    return {
+        'Net_Positions': positions,
+        'Net_By_PO': by_po,
+        'Net_By_Store': by_store,
+        'Vendor_Store_Pivot': pivot,
+        'Vendor_Summary': _summary(positions, ['vendor_code', 'vendor_name']),
+        'Store_Summary': _summary(by_store, ['store']),
+    }
+
+def write_net_receipts(sheets: Dict[str, pd.DataFrame], output):
+    """Write the sheets of net_receipt_sheets to an xlsx workbook at output (a path or file object)"""
+    from processing import write_excel
+
+    (first, df), *rest = sheets.items()
+    write_excel(df, output, first, dict(rest))
+
+def main(argv=None) -> int:
+    from cli import _print_progress, find_pdfs
+    from processing import DEFAULT_WORKERS, process_grn_files, process_prn_files
+
+    parser = argparse.ArgumentParser(
+        prog='python -m net_receipts', description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('--grn', nargs='+', required=True, help='GRN PDF files or directories')
+    parser.add_argument('--prn', nargs='+', required=True, help='PRN PDF files or directories')
+    parser.add_argument('-o', '--output', required=True, help='output .xlsx file')
+    parser.add_argument('-w', '--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'worker processes (default: {DEFAULT_WORKERS})')
+    parser.add_argument('-r', '--recursive', action='store_true', help='descend into subdirectories')
+    parser.add_argument('-q', '--quiet', action='store_true', help='no progress line')
+    args = parser.parse_args(argv)
+
+    if not args.output.lower().endswith('.xlsx'):
+        parser.error('output must end in .xlsx')
+    missing = [path for path in args.grn + args.prn if not os.path.exists(path)]
+    if missing:
+        parser.error(f"no such file or directory: {', '.join(missing)}")
+
+    progress = None if args.quiet else _print_progress
+    grn_df, grn_errors = process_grn_files(find_pdfs(args.grn, args.recursive), args.workers, progress)
+    prn_df, prn_errors = process_prn_files(find_pdfs(args.prn, args.recursive), args.workers, progress)
+    for error in grn_errors + prn_errors:
+        print(error, file=sys.stderr)
+    if grn_df is None and prn_df is None:
+        print("No GRN or PRN items could be extracted", file=sys.stderr)
+        return 1
+
+    sheets = net_receipt_sheets(grn_df, prn_df)
+    write_net_receipts(sheets, args.output)
+    totals = sheets['Net_Positions'][['received_value', 'returned_value', 'net_value']].sum()
+    print(f"{len(sheets['Net_Positions'])} vendor/article positions written to {args.output}: "
+          f"received {totals['received_value']:.2f}, returned {totals['returned_value']:.2f}, "
+          f"net {totals['net_value']:.2f}")
+    return 1 if grn_errors or prn_errors else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,446 @@
+import re
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+
+from extractors import Pages, open_pages
+
+def iter_pdf_pages(pdf_bytes, extractor: Optional[str] = None, start: int = 0,
+                   stop: Optional[int] = None) -> Pages:
+    """Open a PDF and return an iterator over the text of its pages, each extracted when it is reached.
+
+    extractor names the backend in extractors.EXTRACTORS (default PyPDF2,
+    which is imported on first use so parsing extracted text doesn't load it);
+    start and stop limit extraction to a range of pages. The iterator's
+    page_count() gives the PDF's page count without opening it again.
+    """
+    return open_pages(pdf_bytes, extractor, start, stop)
+
+# GRN Parser Functions
+def extract_text_and_page_count(pdf_bytes, extractor: Optional[str] = None) -> Tuple[str, int]:
+    """Extract text content from PDF bytes along with the number of pages read.
+
+    A PDF that can't be read raises the extraction backend's error; a PDF
+    without a text layer returns "".
+    """
+    pages = list(iter_pdf_pages(pdf_bytes, extractor))
+    return "".join(pages), len(pages)
+
+def extract_text_from_pdf_bytes(pdf_bytes, extractor: Optional[str] = None) -> str:
+    """Extract text content from PDF bytes"""
+    return extract_text_and_page_count(pdf_bytes, extractor)[0]
+
+# GRN header fields as (label, value pattern following the label, metadata keys).
+# All labels are scanned for in a single pass; see _scan_grn_header.
+GRN_HEADER_FIELDS = [
+    ('Vendor Code', r'\s*:([^\n]+)', ('vendor_code',)),
+    ('Vendor Name', r'\s*:([^\n]+)', ('vendor_name',)),
+    ('Address', r'\s*:([^\n]+(?:\n[^\n]+)*?)(?=Status|Inv\.No)', ('vendor_address',)),
+    ('Inv.No', r'\s*:([^\n\s]+)', ('invoice_no',)),
+    ('Inv.Date', r'\s*:([^\n\s]+)', ('invoice_date',)),
+    ('Inv.Value', r'\s*:([^\n\s]+)', ('invoice_value',)),
+    ('Inv.Tax Val', r'\s*:([^\n\s]+)', ('invoice_tax_value',)),
+    ('GIN No', r'\s*:([^\n\s]+)', ('gin_no',)),
+    ('GIN Date', r'\s*:([^\n\s]+)', ('gin_date',)),
+    ('GRN No', r'\s*:([^\n\s]+)', ('grn_no',)),
+    ('GRN Date', r'\s*:([^\n\s]+)', ('grn_date',)),
+    ('PO.No', r'\s*:([^\n\s]+)', ('po_no',)),
+    ('PO.Date', r'\s*:([^\n\s]+)', ('po_date',)),
+    ('P.SLIP.No', r'\s*:([^\n\s]+)', ('p_slip_no',)),
+    ('Vendor GST IN', r'\s*:([^\n\s]+)', ('vendor_gst_in',)),
+    ('GST NO', r'\s*:([^\n\s]+)', ('company_gst_no',)),
+    ('TOTAL', r'\s+([\d.]+)\s+([\d.]+)\s+([\d.]+)\s+([\d.]+)\s+([\d.]+)',
+     ('total_gst_value', 'total_received_qty', 'total_accepted_qty', 'total_rejected_qty', 'total_cost_value')),
+    ('Gross Value', r'\s+([\d.]+)', ('gross_value',)),
+]
+
+GRN_STORE_PATTERNS = [
+    re.compile(r'NB ([^\n]+?)(?=\n|Nature\'s Basket)', re.IGNORECASE),
+    re.compile(r'NB ([^\n]+)', re.IGNORECASE),
+    re.compile(r'(NB [^\n]+)', re.IGNORECASE),
+]
+
+_COLON_RE = re.compile(r'\s*:')
+
+def _match_grn_address(text: str, pos: int):
+    """Match the Address value pattern of GRN_HEADER_FIELDS at pos without backtracking.
+
+    The lazy multi-line pattern backtracks from the end of the block of non-blank
+    lines following the label, so it settles on the last "Status"/"Inv.No" in that
+    block that is not at the start of a line; this finds the same position with
+    two reverse substring searches instead of the regex's per-character retries.
+    """
+    colon = _COLON_RE.match(text, pos)
+    if not colon:
+        return None
+    start = colon.end()
+    if start >= len(text) or text[start] == '\n':
+        return None
+
+    # The block ends at the first newline not followed by a non-blank line
+    block_end = text.find('\n\n', start)
+    if block_end == -1:
+        block_end = len(text) - 1 if text.endswith('\n') else len(text)
+
+    end = -1
+    for needle in ('Status', 'Inv.No'):
+        found = text.rfind(needle, start + 1, block_end)
+        while found != -1 and text[found - 1] == '\n':
+            found = text.rfind(needle, start + 1, found + len(needle) - 1)
+        end = max(end, found)
+    return (text[start:end],) if end != -1 else None
+
+def _regex_value(pattern: str):
+    """Return a matcher giving the groups of pattern matched at a position"""
+    compiled = re.compile(pattern)
+    def match(text: str, pos: int):
+        value_match = compiled.match(text, pos)
+        return value_match.groups() if value_match else None
+    return match
+
+# One alternation over every label (kept free of groups so the regex engine can
+# skip ahead on the labels' first characters); the value matchers are anchored
+# at the end of a label
+_GRN_LABEL_RE = re.compile('|'.join(re.escape(label) for label, _, _ in GRN_HEADER_FIELDS))
+_GRN_LABEL_INDEX = {label: idx for idx, (label, _, _) in enumerate(GRN_HEADER_FIELDS)}
+_GRN_VALUE_MATCHERS = [
+    _match_grn_address if label == 'Address' else _regex_value(value)
+    for label, value, _ in GRN_HEADER_FIELDS
+]
+
+ITEM_LINE_RE = re.compile(r'^\d+\s+\d{7}')
+
+def _scan_grn_header(text: str) -> Dict[int, tuple]:
+    """Find the first complete match of every GRN header field in one pass.
+
+    Each label occurrence is tried against its field's value matcher; like a
+    separate re.search per field, the first occurrence whose value matches wins.
+    Returns the matched groups by field index.
+    """
+    found = {}
+    for label_match in _GRN_LABEL_RE.finditer(text):
+        idx = _GRN_LABEL_INDEX[label_match.group()]
+        if idx in found:
+            continue
+        groups = _GRN_VALUE_MATCHERS[idx](text, label_match.end())
+        if groups:
+            found[idx] = groups
+            if len(found) == len(GRN_HEADER_FIELDS):
+                break
+    return found
+
+def parse_grn_metadata(text: str) -> Dict[str, str]:
+    """Extract the GRN header fields (store, vendor, invoice, GIN/GRN/PO, totals)"""
+    metadata = {}
+    
+    # Extract store name/location - look for "NB " followed by location
+    for pattern in GRN_STORE_PATTERNS:
+        store_match = pattern.search(text)
+        if store_match:
+            metadata['store_name'] = store_match.group(1).strip()
+            break
+    
+    # Extract the labelled header fields in table order
+    found = _scan_grn_header(text)
+    for idx, (_, _, keys) in enumerate(GRN_HEADER_FIELDS):
+        if idx not in found:
+            continue
+        for key, value in zip(keys, found[idx]):
+            if key == 'vendor_address':
+                address_lines = [line.strip() for line in value.split('\n') if line.strip() and not line.strip().startswith(':')]
+                value = ' '.join(address_lines)
+            metadata[key] = value.strip()
+    
+    return metadata
+
+def parse_grn_text(text: str) -> Dict[str, Any]:
+    """Parse GRN text content and extract metadata and product details"""
+    
+    # Initialize result dictionary
+    result = {
+        'metadata': parse_grn_metadata(text),
+        'products': []
+    }
+    
+    # Extract product details
+    lines = text.split('\n')
+    
+    i = 0
+    while i < len(lines):
+        line = lines[i].strip()
+        
+        # Check if line starts with a number followed by a 7-digit article code
+        if ITEM_LINE_RE.match(line):
+            try:
+                # Split the line into parts
+                parts = line.split()
+                
+                # Make sure we have enough parts for a valid product line
+                if len(parts) >= 9:
+                    # Initialize product dictionary
+                    product = {
+                        'serial_no': parts[0],
+                        'article_code': parts[1],
+                        'ean_code': parts[2],
+                        'gst_value': parts[3],
+                        'received_qty': parts[4],
+                        'accepted_qty': parts[5],
+                        'rejected_qty': parts[6],
+                        'uom': parts[7],
+                        'mrp': parts[8],
+                        'total_cost_value': parts[9] if len(parts) > 9 else "",
+                        'description': "",
+                        'hsn_code': ""
+                    }
+                    
+                    # Look for the description line (starts with "TBD")
+                    if i + 1 < len(lines):
+                        next_line = lines[i + 1].strip()
+                        if next_line.startswith("TBD"):
+                            # Parse the description line
+                            desc_parts = next_line.split()
+                            if len(desc_parts) >= 2:
+                                # The last part is usually the HSN code (if it's all digits)
+                                if desc_parts[-1].isdigit() and len(desc_parts[-1]) >= 6:
+                                    product['hsn_code'] = desc_parts[-1]
+                                    # Everything between TBD and HSN code is the description
+                                    product['description'] = ' '.join(desc_parts[1:-1])
+                                else:
+                                    # No HSN code found, everything after TBD is description
+                                    product['description'] = ' '.join(desc_parts[1:])
+                    
+                    result['products'].append(product)
+                    
+            except (IndexError, ValueError) as e:
+                continue
+        
+        i += 1
+    
+    return result
+
+# PRN Parser Functions
+def parse_prn_metadata(doc: str) -> Dict[str, str]:
+    """Extract the header fields (store, vendor, document numbers, totals) of one delivery challan"""
+    metadata = {}
+    
+    # Store name - look for NB followed by location
+    store_match = re.search(r'NB ([^\n]+?)(?=\n|NATURE)', doc, re.IGNORECASE)
+    if store_match:
+        metadata['store'] = store_match.group(1).strip()
+    
+    # Vendor code
+    vendor_code_match = re.search(r'Vendor Code\s*:([^\n]+)', doc)
+    if vendor_code_match:
+        metadata['vendor_code'] = vendor_code_match.group(1).strip()
+    
+    # Vendor name
+    vendor_name_match = re.search(r'Vendor Name\s*:([^\n]+)', doc)
+    if vendor_name_match:
+        metadata['vendor_name'] = vendor_name_match.group(1).strip()
+    
+    # Vendor address
+    address_match = re.search(r'Address\s*:([^\n:]+(?:\n[^\n:]+)*?)(?=GSTIN|Vendor Code|\n\s*:)', doc, re.DOTALL)
+    if address_match:
+        address_lines = [line.strip() for line in address_match.group(1).split('\n') if line.strip() and not line.strip().startswith(':')]
+        metadata['vendor_address'] = ' '.join(address_lines)
+    
+    # GST numbers
+    gstin_matches = re.findall(r'GSTIN\s*:([^\s\n]+)', doc)
+    if len(gstin_matches) >= 2:
+        metadata['vendor_gstin'] = gstin_matches[0].strip()
+        metadata['company_gstin'] = gstin_matches[1].strip()
+    elif len(gstin_matches) == 1:
+        metadata['vendor_gstin'] = gstin_matches[0].strip()
+    
+    # Document details
+    doc_no_match = re.search(r'Doc No\s*:([^\n/]+)', doc)
+    if doc_no_match:
+        metadata['doc_no'] = doc_no_match.group(1).strip()
+    
+    # Reference document number
+    ref_doc_match = re.search(r'Ref\.Doc\.No\s*:([^\n/]+)', doc)
+    if ref_doc_match:
+        metadata['ref_doc_no'] = ref_doc_match.group(1).strip()
+    
+    # Invoice date
+    invoice_date_match = re.search(r'Invoice Date\s*:([^\n]+)', doc)
+    if invoice_date_match:
+        metadata['invoice_date'] = invoice_date_match.group(1).strip()
+    
+    # Order details
+    order_no_match = re.search(r'Order No\s*:([^\n]+)', doc)
+    if order_no_match:
+        metadata['order_no'] = order_no_match.group(1).strip()
+    
+    order_date_match = re.search(r'Order Date\s*:([^\n]+)', doc)
+    if order_date_match:
+        metadata['order_date'] = order_date_match.group(1).strip()
+    
+    # P.Slip No
+    pslip_match = re.search(r'P\.Slip No\.\s*:([^\n]+)', doc)
+    if pslip_match:
+        metadata['pslip_no'] = pslip_match.group(1).strip()
+    
+    # Extract totals
+    total_match = re.search(r'TOTAL\s+([\d.]+)\s+([\d.]+)', doc)
+    if total_match:
+        metadata['total_qty'] = total_match.group(1).strip()
+        metadata['total_value'] = total_match.group(2).strip()
+    
+    # Final value
+    final_value_match = re.search(r'FINAL VALUE\s+([\d.]+)', doc)
+    if final_value_match:
+        metadata['final_value'] = final_value_match.group(1).strip()
+    
+    return metadata
+
+def parse_prn_challan(doc: str) -> Dict[str, Any]:
+    """Parse the text of one goods return delivery challan into metadata and products"""
+    result = {
+        'metadata': parse_prn_metadata(doc),
+        'products': []
+    }
+    
+    # Extract line items using more flexible pattern
+    lines = doc.split('\n')
+    
+    i = 0
+    while i < len(lines):
+        line = lines[i].strip()
+        
+        # Look for line items that start with serial number
+        if ITEM_LINE_RE.match(line):
+            try:
+                # Parse the main line
+                parts = line.split()
+                if len(parts) >= 10:  # Minimum required fields
+                    
+                    # Create product record
+                    product = {
+                        'sno': parts[0],
+                        'article_code': parts[1],
+                        'ean_code': parts[2],
+                        'ref_po': parts[3],
+                        'qty': parts[4],
+                        'uom': parts[5],
+                        'mrp': parts[6],
+                        'cost': parts[7],
+                        'value': parts[8],
+                        'reason': parts[9],
+                        'sgst': parts[10] if len(parts) > 10 else '0.00',
+                        'cgst': parts[11] if len(parts) > 11 else '0.00',
+                        'igst': parts[12] if len(parts) > 12 else '0.00',
+                        'gst_cess': parts[13] if len(parts) > 13 else '0.00',
+                        'adv_cess': parts[14] if len(parts) > 14 else '0.00',
+                        'net_val': parts[15] if len(parts) > 15 else parts[8],  # Use value if net_val not available
+                        'description': '',
+                        'hsn_code': ''
+                    }
+                    
+                    # Look for description in the next line
+                    if i + 1 < len(lines):
+                        next_line = lines[i + 1].strip()
+                        if next_line.startswith('TBD'):
+                            desc_parts = next_line.split()
+                            if len(desc_parts) > 1:
+                                # Extract description (everything after TBD)
+                                desc_text = ' '.join(desc_parts[1:])
+                                product['description'] = desc_text
+                                
+                                # Look for HSN code in the next line
+                                if i + 2 < len(lines):
+                                    hsn_line = lines[i + 2].strip()
+                                    if re.match(r'^\d{8}', hsn_line):
+                                        hsn_parts = hsn_line.split()
+                                        product['hsn_code'] = hsn_parts[0]
+                                        # Add reason if available
+                                        if len(hsn_parts) > 1:
+                                            product['return_reason'] = ' '.join(hsn_parts[1:])
+                                    elif 'Date expired' in hsn_line:
+                                        product['return_reason'] = 'Date expired'
+                                        # Try to extract HSN from the description line
+                                        hsn_match = re.search(r'(\d{8})', desc_text)
+                                        if hsn_match:
+                                            product['hsn_code'] = hsn_match.group(1)
+                                            # Clean description
+                                            product['description'] = desc_text.replace(hsn_match.group(1), '').strip()
+                    
+                    result['products'].append(product)
+                    
+            except (IndexError, ValueError) as e:
+                # Skip malformed lines
+                continue
+        
+        i += 1
+    
+    return result
+
+PRN_CHALLAN_MARKER = "GOODS RETURN DELIVERY CHALLAN"
+
+def split_prn_challans(chunks: Iterable[str]) -> Iterator[str]:
+    """Yield the text of each delivery challan in PRN text given as consecutive chunks.
+
+    A challan is yielded as soon as the next one starts, so with page texts as
+    chunks it can be parsed while later pages are still being extracted. The
+    pieces are those of text.split(PRN_CHALLAN_MARKER)[1:]; chunks must not cut
+    through a marker, which pages never do as each ends in a newline.
+    """
+    current = None  # pieces of the challan being read, None before the first marker
+    for chunk in chunks:
+        pieces = chunk.split(PRN_CHALLAN_MARKER)
+        if current is not None:
+            current.append(pieces[0])
+        for piece in pieces[1:]:
+            if current is not None:
+                yield "".join(current)
+            current = [piece]
+    if current is not None:
+        yield "".join(current)
+
+def parse_prn_challan_texts(docs: Iterable[str]) -> List[Dict[str, Any]]:
+    """Parse the text of each delivery challan, skipping challans that fail to parse"""
+    challans = []
+    for doc in docs:
+        try:
+            challans.append(parse_prn_challan(doc))
+        except Exception as e:
+            # Log the error but continue processing other documents
+            continue
+    return challans
+
+def parse_prn_challans(text: str) -> List[Dict[str, Any]]:
+    """Split PRN text into delivery challans and parse each one"""
+    return parse_prn_challan_texts(split_prn_challans([text]))
+
+GRN_MARKER_RE = re.compile(r'Goods Receipt Note|GRN No\s*:', re.IGNORECASE)
+
+def classify_text(text: str) -> Optional[str]:
+    """'prn' for delivery challan text, 'grn' for goods receipt note text, None for anything else"""
+    if PRN_CHALLAN_MARKER in text:
+        return 'prn'
+    if GRN_MARKER_RE.search(text):
+        return 'grn'
+    return None
+
+def sniff_pdf(pdf_bytes, extractor: Optional[str] = None) -> Tuple[str, str, Pages]:
+    """Tell a PDF's document type from its first page alone; returns (type, first page text, rest).
+
+    type is 'grn' or 'prn' when the page carries that document's heading,
+    'scanned' when it has no text layer and 'unknown' otherwise. rest iterates
+    the remaining pages of the same opened PDF, so a caller that goes on to
+    extract the file (or count its pages) doesn't open it again.
+    """
+    pages = iter_pdf_pages(pdf_bytes, extractor)
+    first = next(pages, "")
+    if not first.strip():
+        return 'scanned', first, pages
+    return classify_text(first) or 'unknown', first, pages
+
+def parse_prn_documents(text: str) -> List[Dict[str, Any]]:
+    """Parse PRN documents from text - handles Goods Return Delivery Challan format"""
+    all_records = []
+    
+    for challan in parse_prn_challans(text):
+        # Combine metadata and product data
+        for product in challan['products']:
+            all_records.append({**challan['metadata'], **product})
+    
+    return all_records
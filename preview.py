@@ -0,0 +1,103 @@
+"""Server-side filtering, sorting and paging of a result frame for the preview.
+
+The app sends the browser one page of the filtered frame per rerun instead of
+the whole result, and shows precomputed per-vendor / per-store aggregates for
+results too large to browse row by row.
+"""
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+import pandas as pd
+
+from frames import coerce_number
+
+# Per document type: the columns the preview filters and aggregates on
+PREVIEW_COLUMNS = {
+    'grn': {'vendor': 'vendor_name', 'store': 'store_name', 'date': 'grn_date', 'article': 'article_code',
+            'document': 'grn_no', 'qty': 'accepted_qty', 'value': 'product_total_cost_value'},
+    'prn': {'vendor': 'vendor_name', 'store': 'store', 'date': 'invoice_date', 'article': 'article_code',
+            'document': 'doc_no', 'qty': 'qty', 'value': 'value'},
+}
+
+# Results with more rows than this open on the summary instead of the rows
+LARGE_PREVIEW_ROWS = int(os.getenv("LARGE_PREVIEW_ROWS", 20_000))
+
+PAGE_SIZES = [50, 100, 250, 500]
+
+def _column(df: pd.DataFrame, kind: str, role: str) -> Optional[str]:
+    """The column playing role in a frame of kind, if the frame has it"""
+    column = PREVIEW_COLUMNS[kind][role]
+    return column if column in df.columns else None
+
+def filter_frame(df: pd.DataFrame, kind: str, vendors: Sequence[str] = (), stores: Sequence[str] = (),
+                 date_from=None, date_to=None, article_code: Optional[str] = None,
+                 sort_by: Optional[str] = None, ascending: bool = True) -> pd.DataFrame:
+    """Rows of df matching every given filter, sorted by sort_by.
+
+    Dates are inclusive bounds on the document date (ignored when that column
+    isn't a date column); article_code must match exactly.
+    """
+    mask = pd.Series(True, index=df.index)
+    vendor, store, date, article = (_column(df, kind, role) for role in ('vendor', 'store', 'date', 'article'))
+    if vendors and vendor:
+        mask &= df[vendor].isin(vendors)
+    if stores and store:
+        mask &= df[store].isin(stores)
+    if date and pd.api.types.is_datetime64_any_dtype(df[date]):
+        if date_from is not None:
+            mask &= df[date].ge(pd.Timestamp(date_from))
+        if date_to is not None:
+            mask &= df[date].le(pd.Timestamp(date_to))
+    if article_code and article:
+        mask &= df[article].astype(object).eq(article_code)
+    filtered = df[mask] if not mask.all() else df
+    if sort_by in df.columns:
+        filtered = filtered.sort_values(sort_by, ascending=ascending, kind='stable', na_position='last')
+    return filtered
+
+def page_of(df: pd.DataFrame, page: int, page_size: int) -> pd.DataFrame:
+    """Rows of 1-based page number page"""
+    start = (page - 1) * page_size
+    return df.iloc[start:start + page_size]
+
+def page_count(rows: int, page_size: int) -> int:
+    """Number of pages of page_size rows needed for rows (at least one)"""
+    return max(1, -(-rows // page_size))
+
+def result_summary(df: pd.DataFrame, kind: str) -> Dict[str, Any]:
+    """Totals of a result and its rows, quantity and value per vendor and per store.
+
+    Also lists the vendors and stores (for the filters) and whether the
+    document date can be filtered on.
+    """
+    qty, value, document, date = (_column(df, kind, role) for role in ('qty', 'value', 'document', 'date'))
+    numbers = pd.DataFrame({
+        'qty': coerce_number(df[qty]) if qty else 0.0,
+        'value': coerce_number(df[value]) if value else 0.0,
+    }, index=df.index)
+
+    def per(role: str) -> Optional[pd.DataFrame]:
+        column = _column(df, kind, role)
+        if column is None:
+            return None
+        grouped = numbers.groupby(df[column], observed=True, sort=False)
+        table = grouped.agg(rows=('qty', 'size'), qty=('qty', 'sum'), value=('value', 'sum'))
+        return table.sort_values('value', ascending=False).round(2).reset_index()
+
+    per_vendor, per_store = per('vendor'), per('store')
+    has_dates = date is not None and pd.api.types.is_datetime64_any_dtype(df[date])
+    return {
+        'rows': len(df),
+        'documents': int(df[document].nunique()) if document else None,
+        'qty': float(numbers['qty'].sum()),
+        'value': float(numbers['value'].sum()),
+        'per_vendor': per_vendor,
+        'per_store': per_store,
+        'vendors': _labels(per_vendor),
+        'stores': _labels(per_store),
+        'dates': (df[date].min(), df[date].max()) if has_dates else None,
+    }
+
+def _labels(table: Optional[pd.DataFrame]) -> List[str]:
+    """Sorted group labels of a per-vendor / per-store table"""
+    return [] if table is None else sorted(str(label) for label in table.iloc[:, 0].dropna())
@@ -0,0 +1,824 @@
+import os
+import threading
+import time
+import zipfile
+import zlib
+from contextlib import contextmanager
+from functools import partial
+from io import BytesIO
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from extractors import DEFAULT_EXTRACTOR, count_pages, get_extractor
+from parsers import (
+    classify_text, extract_text_and_page_count, iter_pdf_pages, parse_grn_metadata, parse_grn_text,
+    parse_prn_challan_texts, parse_prn_challans, parse_prn_metadata, sniff_pdf, split_prn_challans,
+)
+from isolation import FileTimeout, IsolatedPool, WorkerCrashed, in_isolated_worker, isolation_enabled
+from text_cache import TextCache, content_hash
+
+# pandas is only needed once frames are built or exported, so it is imported
+# there; extraction and parsing (and the worker processes) never load it
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Number of worker processes used when none is given explicitly
+DEFAULT_WORKERS = int(os.getenv("PDF_PARSER_WORKERS", 0)) or os.cpu_count() or 1
+
+# PRN files at least this large are split into challans that are parsed on
+# the pool while the file is still being extracted, instead of by one worker
+PRN_SPLIT_MIN_BYTES = int(os.getenv("PRN_SPLIT_MIN_BYTES", 2_000_000))
+
+# How the products of a batch are found: 'per-line' parses the item lines of
+# each document in the workers; 'vectorized' has the workers parse only the
+# headers and finds the items of all documents in one pass (see line_items)
+LINE_ITEM_ENGINES = ('per-line', 'vectorized')
+LINE_ITEM_ENGINE = os.getenv("LINE_ITEM_ENGINE", 'per-line')
+
+# Challans are sent to the pool in batches of about this many characters
+CHALLAN_BATCH_CHARS = 50_000
+
+# When a run has fewer files than workers, files with at least this many pages
+# are extracted as page ranges on the pool instead of page by page in one process
+SPLIT_MIN_PAGES = int(os.getenv("PDF_SPLIT_MIN_PAGES", 60))
+
+# Smallest page range handed to a worker
+PAGE_RANGE_MIN_PAGES = 10
+
+# Called as progress(files_done, files_total, filename)
+ProgressCallback = Callable[[int, int, str], None]
+
+# Process-wide cache of extracted PDF text, shared by all sessions
+text_cache = TextCache(
+    max_chars=int(os.getenv("PDF_TEXT_CACHE_MAX_CHARS", 200_000_000)),
+    cache_dir=os.getenv("PDF_TEXT_CACHE_DIR") or None,
+)
+
+class FileResult(NamedTuple):
+    """Outcome of extracting and parsing one file in a worker"""
+    documents: List[Dict[str, Any]]  # dicts of metadata and products
+    error: Optional[str]
+    extracted: Optional[str]  # freshly extracted text, None when it came from the cache
+    timings: Dict[str, Any]  # extract_s, parse_s, pages, cached
+
+def _file_error(name: str, e: Exception) -> str:
+    """The error reported for a file that failed with e; a worker that timed out or crashed reads differently
+    from a file that couldn't be read or parsed"""
+    if isinstance(e, (FileTimeout, WorkerCrashed)):
+        return f"{name} {e}"
+    return f"Error processing {name}: {str(e)}"
+
+def _file_result(name: str, future) -> FileResult:
+    """The FileResult of a file's future, or its error when the worker running it failed.
+
+    Besides a worker that timed out or crashed, that covers a result that
+    couldn't be sent back and a broken process pool, which fail only this file.
+    """
+    try:
+        return future.result()
+    except Exception as e:
+        return FileResult([], _file_error(name, e), None, {'extract_s': 0.0, 'parse_s': 0.0, 'pages': 0, 'cached': False})
+
+def _parse_grn_documents(text: str) -> List[Dict[str, Any]]:
+    # A GRN file holds a single document
+    return [parse_grn_text(text)]
+
+# Parser of each document type (text -> list of documents)
+DOCUMENT_PARSERS = {'grn': _parse_grn_documents, 'prn': parse_prn_challans}
+
+def _parse_grn_headers(text: str) -> List[Dict[str, Any]]:
+    # Header only, keeping the text for the vectorized line-item engine
+    return [{'metadata': parse_grn_metadata(text), 'text': text}]
+
+def _parse_prn_headers(text: str) -> List[Dict[str, Any]]:
+    return [{'metadata': parse_prn_metadata(doc), 'text': doc} for doc in split_prn_challans([text])]
+
+def _parse_any(text: str) -> List[Dict[str, Any]]:
+    """Parse text as a GRN or PRN, whichever it is, tagging each document with its kind"""
+    kind = classify_text(text)
+    if kind is None:
+        raise ValueError("not a GRN or PRN document")
+    return [{**document, 'kind': kind} for document in DOCUMENT_PARSERS[kind](text)]
+
+def _rejected(name: str, kind: str, accept: Tuple[str, ...], timings: Dict[str, Any],
+              page_count: Optional[int] = None) -> FileResult:
+    """Result of a file of another document type, or without any text.
+
+    Given page_count, the file was turned away after its first page and the
+    pages that weren't extracted are recorded; without, its whole text had
+    been read (a cache hit, a file extracted in pieces or one with no text).
+    """
+    if kind == 'scanned':
+        reason = "has no text (a scanned document?)"
+    else:
+        reason = f"looks like a {kind.upper()}, not a {' or '.join(accepted.upper() for accepted in accept)}"
+    if page_count is None:
+        timings.update(skipped_pages=0, sniffed=kind)
+        return FileResult([], f"{name} {reason}; skipped", None, timings)
+    timings.update(pages=1, skipped_pages=max(0, page_count - 1), sniffed=kind)
+    return FileResult([], f"{name} {reason}; skipped after reading 1 of {page_count} page(s)", None, timings)
+
+def _wrong_kind(text: str, accept: Tuple[str, ...]) -> Optional[str]:
+    """The document type of extracted text when it is one that accept doesn't include, else None"""
+    kind = classify_text(text)
+    return kind if kind is not None and kind not in accept else None
+
+def _process_file(parse, name: str, pdf_bytes: bytes, text: Optional[str] = None,
+                  extractor: Optional[str] = None, accept: Optional[Tuple[str, ...]] = None) -> FileResult:
+    """Extract and parse a single file with parse (text -> list of documents).
+
+    text is the already extracted text on a cache hit; extractor names the
+    extraction backend. With accept (the document types parse handles), the
+    first page is read on its own first: a file whose first page shows it is
+    another type is rejected without extracting the rest; otherwise, unless
+    the first page showed an accepted type, the whole text (extracted or
+    cached) is checked for another type. A first page without text is no reason to reject
+    (a cover page, say); only a file with no text at all is turned away.
+    """
+    extracted = None
+    timings = {'extract_s': 0.0, 'parse_s': 0.0, 'pages': 0, 'cached': text is not None}
+    sniffed = False  # the first page showed an accepted type
+    try:
+        # Extract text from PDF unless it is already cached
+        if text is None:
+            started = time.perf_counter()
+            if accept is None:
+                text, timings['pages'] = extract_text_and_page_count(pdf_bytes, extractor)
+            else:
+                # One reader serves the sniff, the rest of the pages and the page count
+                kind, first, pages = sniff_pdf(pdf_bytes, extractor)
+                if kind in ('grn', 'prn') and kind not in accept:
+                    try:
+                        page_count = pages.page_count()
+                    except Exception:
+                        page_count = 1
+                    timings['extract_s'] = time.perf_counter() - started
+                    return _rejected(name, kind, accept, timings, page_count)
+                sniffed = kind in accept
+                rest = list(pages)
+                text, timings['pages'] = first + "".join(rest), 1 + len(rest)
+            timings['extract_s'] = time.perf_counter() - started
+            extracted = text
+        if accept is not None and not sniffed:
+            # Cached text has no first page to sniff, and a blank or unrecognised first
+            # page doesn't tell, so the whole text is checked instead; a rejected file's
+            # text is still returned so the cache gives the same answer next time
+            kind = _wrong_kind(text, accept)
+            if kind:
+                return _rejected(name, kind, accept, timings)._replace(extracted=extracted)
+
+        if not text:
+            return FileResult([], f"Could not extract text from {name}", None, timings)
+        if accept is not None and not text.strip():
+            # The text is still returned, so the cache spares extracting it again
+            return _rejected(name, 'scanned', accept, timings)._replace(extracted=extracted)
+
+        started = time.perf_counter()
+        documents = parse(text)
+        timings['parse_s'] = time.perf_counter() - started
+        return FileResult(documents, None, extracted, timings)
+
+    except MemoryError as e:
+        if in_isolated_worker():
+            raise  # the worker exits and the file is reported as crashed
+        return FileResult([], _file_error(name, e), extracted, timings)
+    except Exception as e:
+        return FileResult([], _file_error(name, e), extracted, timings)
+
+_process_grn_file = partial(_process_file, _parse_grn_documents, accept=('grn',))
+_process_prn_file = partial(_process_file, parse_prn_challans, accept=('prn',))
+# Public worker for callers that take files of either type (the watch folder):
+# process_any_file(name, pdf_bytes, text, extractor) -> FileResult whose
+# documents carry their 'kind', each parsed by that type's parser
+process_any_file = partial(_process_file, _parse_any, accept=('grn', 'prn'))
+# Workers of the vectorized line-item engine: documents without products, with their text
+_process_grn_headers = partial(_process_file, _parse_grn_headers, accept=('grn',))
+_process_prn_headers = partial(_process_file, _parse_prn_headers, accept=('prn',))
+
+def _extract_page_range(pdf_bytes: bytes, start: int, stop: int,
+                        extractor: Optional[str]) -> Tuple[List[str], float]:
+    """Extract pages start to stop in a worker; returns (page texts, seconds)"""
+    started = time.perf_counter()
+    pages = list(iter_pdf_pages(pdf_bytes, extractor, start, stop))
+    return pages, time.perf_counter() - started
+
+def _page_ranges(page_count: int, workers: int) -> List[Tuple[int, int]]:
+    """Split page_count pages into about two ranges per worker, so finished workers pick up the rest"""
+    size = max(PAGE_RANGE_MIN_PAGES, -(-page_count // (2 * workers)))
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+def _pool_pages(executor, pdf_bytes: bytes, ranges: List[Tuple[int, int]], extractor: Optional[str],
+                timings: Dict[str, Any]) -> Iterator[str]:
+    """Extract page ranges on executor and yield the pages in order as each range arrives.
+
+    Adds the extraction time summed over the workers to timings['extract_s'].
+    """
+    futures = [executor.submit(_extract_page_range, pdf_bytes, start, stop, extractor) for start, stop in ranges]
+    try:
+        for future in futures:
+            pages, seconds = future.result()
+            timings['extract_s'] += seconds
+            yield from pages
+    finally:
+        for future in futures:
+            future.cancel()
+
+def _local_pages(pdf_bytes: bytes, extractor: Optional[str], timings: Dict[str, Any]) -> Iterator[str]:
+    """Extract pages in this process, adding the time spent to timings['extract_s']"""
+    started = time.perf_counter()
+    for page in iter_pdf_pages(pdf_bytes, extractor):
+        timings['extract_s'] += time.perf_counter() - started
+        yield page
+        started = time.perf_counter()
+    timings['extract_s'] += time.perf_counter() - started
+
+def _process_file_by_pages(worker, executor, name: str, pdf_bytes: bytes, extractor: Optional[str],
+                           ranges: List[Tuple[int, int]]) -> FileResult:
+    """Extract a large PDF as page ranges on executor, then parse the reassembled text here with worker"""
+    timings = {'extract_s': 0.0, 'parse_s': 0.0, 'pages': 0, 'cached': False}
+    try:
+        pages = list(_pool_pages(executor, pdf_bytes, ranges, extractor, timings))
+    except ImportError:
+        raise
+    except Exception as e:
+        return FileResult([], _file_error(name, e), None, timings)
+    text = "".join(pages)
+    if not text:
+        return FileResult([], f"Could not extract text from {name}", None, timings)
+
+    # Parsing already extracted text is the worker's cache-hit path
+    result = worker(name, b"", text, extractor)
+    return result._replace(
+        extracted=text, timings={**result.timings, 'extract_s': timings['extract_s'], 'pages': len(pages), 'cached': False}
+    )
+
+def _parse_challan_batch(docs: List[str]) -> Tuple[List[Dict[str, Any]], float]:
+    """Parse a batch of challan texts in a worker; returns (challans, seconds)"""
+    started = time.perf_counter()
+    challans = parse_prn_challan_texts(docs)
+    return challans, time.perf_counter() - started
+
+def _process_prn_file_by_challan(executor, name: str, pdf_bytes: bytes, text: Optional[str] = None,
+                                 extractor: Optional[str] = None,
+                                 ranges: Optional[List[Tuple[int, int]]] = None) -> FileResult:
+    """Extract a large PRN and parse its challans on executor as soon as each is complete.
+
+    Same result as _process_prn_file, but parsing overlaps extraction and is
+    spread over every worker; challan order is kept. Pages are extracted here,
+    or as the given page ranges on executor. extract_s and parse_s are summed
+    over the workers that did the work.
+    """
+    extracted = None
+    timings = {'extract_s': 0.0, 'parse_s': 0.0, 'pages': 0, 'cached': text is not None}
+    kind = None if text is None else _wrong_kind(text, ('prn',))
+    if kind:
+        return _rejected(name, kind, ('prn',), timings)
+    pages, futures = [], []
+
+    def extracted_pages():
+        source = (_pool_pages(executor, pdf_bytes, ranges, extractor, timings) if ranges
+                  else _local_pages(pdf_bytes, extractor, timings))
+        for page in source:
+            pages.append(page)
+            yield page
+
+    try:
+        batch, batch_chars = [], 0
+        for doc in split_prn_challans(extracted_pages() if text is None else [text]):
+            batch.append(doc)
+            batch_chars += len(doc)
+            if batch_chars >= CHALLAN_BATCH_CHARS:
+                futures.append(executor.submit(_parse_challan_batch, batch))
+                batch, batch_chars = [], 0
+        if batch:
+            futures.append(executor.submit(_parse_challan_batch, batch))
+
+        if text is None:
+            text = extracted = "".join(pages)
+            timings['pages'] = len(pages)
+            kind = _wrong_kind(text, ('prn',))
+            if kind:
+                for future in futures:
+                    future.cancel()
+                # The text is still returned, so the cache spares extracting it again
+                return _rejected(name, kind, ('prn',), timings)._replace(extracted=extracted)
+        if not text or not text.strip():
+            for future in futures:
+                future.cancel()
+            if not text:
+                return FileResult([], f"Could not extract text from {name}", None, timings)
+            return _rejected(name, 'scanned', ('prn',), timings)._replace(extracted=extracted)
+
+        documents = []
+        for future in futures:
+            challans, seconds = future.result()
+            documents.extend(challans)
+            timings['parse_s'] += seconds
+        return FileResult(documents, None, extracted, timings)
+
+    except Exception as e:
+        for future in futures:
+            future.cancel()
+        return FileResult([], _file_error(name, e), extracted, timings)
+
+class ProcessingStats:
+    """Wall-clock timings of one processing run, per file and per stage.
+
+    Stages: extract and parse (summed over files, so they can exceed the wall
+    time with several workers), frame (DataFrame build), export (workbook) and
+    total (wall time of the run, excluding export).
+    """
+
+    def __init__(self):
+        self.files: List[Dict[str, Any]] = []
+        self.stages: Dict[str, float] = {'extract': 0.0, 'parse': 0.0, 'frame': 0.0, 'export': 0.0, 'total': 0.0}
+        self.reused = 0  # files whose earlier results were reused by an IncrementalBatch
+        self.rejected = 0  # files of the wrong type turned away (see _rejected)
+        self.skipped_pages = 0  # pages those files didn't need extracted
+        self.extractor = DEFAULT_EXTRACTOR
+        self._started = time.perf_counter()
+
+    def add_file(self, name: str, timings: Dict[str, Any]):
+        self.files.append({'name': name, **timings})
+        self.stages['extract'] += timings['extract_s']
+        self.stages['parse'] += timings['parse_s']
+        if 'sniffed' in timings:
+            self.rejected += 1
+            self.skipped_pages += timings['skipped_pages']
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time the enclosed block as stage name"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - started
+
+    def finish(self):
+        self.stages['total'] = time.perf_counter() - self._started
+
+    @property
+    def pages(self) -> int:
+        return sum(f['pages'] for f in self.files)
+
+    @property
+    def pages_per_second(self) -> float:
+        """Pages extracted per second of run wall time (cached files excluded)"""
+        return self.pages / self.stages['total'] if self.stages['total'] else 0.0
+
+    @property
+    def saved_s(self) -> float:
+        """Extraction time saved by rejecting files after one page, at this run's seconds per extracted page"""
+        pages = sum(f['pages'] for f in self.files if not f['cached'])
+        return self.skipped_pages * self.stages['extract'] / pages if pages else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'stages_s': {stage: round(seconds, 4) for stage, seconds in self.stages.items()},
+            'pages': self.pages,
+            'pages_per_s': round(self.pages_per_second, 2),
+            'reused_files': self.reused,
+            'rejected_files': self.rejected,
+            'skipped_pages': self.skipped_pages,
+            'saved_extract_s': round(self.saved_s, 4),
+            'extractor': self.extractor,
+            'files': [
+                {**f, 'extract_s': round(f['extract_s'], 4), 'parse_s': round(f['parse_s'], 4)}
+                for f in self.files
+            ],
+        }
+
+class PdfSource:
+    """A named PDF whose bytes are loaded on demand, e.g. a file on disk or a ZIP member"""
+
+    def __init__(self, name: str, loader: Callable[[], bytes], path: Optional[str] = None):
+        self.name = name
+        self.path = path
+        self._loader = loader
+
+    @classmethod
+    def from_path(cls, path: str, name: Optional[str] = None) -> 'PdfSource':
+        def load():
+            with open(path, 'rb') as f:
+                return f.read()
+        return cls(name or os.path.basename(path), load, path)
+
+    def read(self) -> bytes:
+        return self._loader()
+
+def _read_bytes(f) -> bytes:
+    """Return the full contents of an uploaded or opened file"""
+    return f.getvalue() if hasattr(f, 'getvalue') else f.read()
+
+def is_zip(f) -> bool:
+    """Whether an upload or source is a ZIP archive (by its name)"""
+    return f.name.lower().endswith('.zip')
+
+def _open_zip(f) -> zipfile.ZipFile:
+    """Open an uploaded or on-disk archive without reading it into memory first"""
+    path = getattr(f, 'path', None)
+    if path:
+        return zipfile.ZipFile(path)
+    if hasattr(f, 'seek'):
+        f.seek(0)
+        return zipfile.ZipFile(f)
+    return zipfile.ZipFile(BytesIO(_read_bytes(f)))
+
+def _archive_members(archive: zipfile.ZipFile) -> List[zipfile.ZipInfo]:
+    """PDF members of an archive in archive order, without macOS resource forks"""
+    return [
+        info for info in archive.infolist()
+        if not info.is_dir() and info.filename.lower().endswith('.pdf')
+        and not info.filename.startswith('__MACOSX/') and not os.path.basename(info.filename).startswith('._')
+    ]
+
+def expand_archives(files) -> Tuple[List[Any], List[str]]:
+    """Replace each ZIP archive among files with a PdfSource per PDF inside it.
+
+    Members are named <archive>/<path in archive> and decompressed one at a
+    time when read, so an archive is never unpacked as a whole. Returns
+    (files, errors for archives that can't be opened).
+    """
+    expanded, errors = [], []
+    for f in files:
+        if not is_zip(f):
+            expanded.append(f)
+            continue
+        try:
+            archive = _open_zip(f)
+            members = _archive_members(archive)
+        except (zipfile.BadZipFile, OSError) as e:
+            errors.append(f"Could not open archive {f.name}: {e}")
+            continue
+        if not members:
+            errors.append(f"No PDF files found in archive {f.name}")
+        for info in members:
+            expanded.append(PdfSource(f"{f.name}/{info.filename}", partial(archive.read, info)))
+    return expanded, errors
+
+def _iter_sources(files, errors: List[str]) -> Iterator[Tuple[str, bytes]]:
+    """Read each file in turn as (name, bytes), adding to errors instead for unreadable ZIP members"""
+    for f in files:
+        try:
+            pdf_bytes = _read_bytes(f)
+        except (zipfile.BadZipFile, zlib.error, EOFError, RuntimeError, NotImplementedError, OSError) as e:
+            # Corrupt, truncated, encrypted or unsupported member of an archive
+            errors.append(f"Could not read {f.name}: {e}")
+            continue
+        yield f.name, pdf_bytes
+
+def _read_sources(files) -> Tuple[List[Tuple[str, bytes, str]], List[str]]:
+    """Read each file into (name, bytes, content hash); returns (sources, errors)"""
+    errors = []
+    sources = [(name, pdf_bytes, content_hash(pdf_bytes)) for name, pdf_bytes in _iter_sources(files, errors)]
+    return sources, errors
+
+def _run_files(worker, sources, workers: Optional[int], cache: Optional[TextCache] = None, split_worker=None,
+               extractor: Optional[str] = None, executor=None):
+    """Run worker over (name, bytes, hash) sources, yielding (name, hash, FileResult) in upload order.
+
+    Files whose text is already in the cache skip extraction and only ship the
+    text to the worker; newly extracted text is added to the cache. With more
+    than one worker the files are fanned out over a process pool and results
+    are collected in submission order so output stays deterministic. Files of
+    at least PRN_SPLIT_MIN_BYTES that aren't cached are handed to split_worker
+    (if given), which spreads a single file over the same pool. When there are fewer files to
+    extract than workers, files of at least SPLIT_MIN_PAGES pages are extracted
+    as page ranges on the pool. Text is extracted with backend extractor and
+    cached per backend. Given an executor (a process pool owned by the caller,
+    e.g. shared by every request of a service), files always go to that pool
+    instead of one started for the run; workers should then be its size.
+    Otherwise the pool is an IsolatedPool, and while per-file limits are set
+    (see isolation) even a serial run uses one, so a file whose worker times
+    out or crashes fails on its own and the rest of the run carries on.
+    """
+    workers = workers or DEFAULT_WORKERS
+    cache = text_cache if cache is None else cache
+    extractor = extractor or DEFAULT_EXTRACTOR
+    get_extractor(extractor)  # fail on an unknown backend before any file is read
+    # Text of the default backend keeps the bare content hash as its cache key
+    suffix = "" if extractor == 'pypdf2' else f".{extractor}"
+    names, payloads, texts, keys, split = [], [], [], [], []
+    for name, pdf_bytes, key in sources:
+        text = cache.get(key + suffix)
+        names.append(name)
+        keys.append(key)
+        texts.append(text)
+        # Cached text parses faster in one piece than shipped out by challan
+        split.append(split_worker is not None and text is None and workers > 1 and len(pdf_bytes) >= PRN_SPLIT_MIN_BYTES)
+        # Cached files don't need their bytes shipped to a worker
+        payloads.append(b"" if text is not None else pdf_bytes)
+
+    # Page ranges only pay off while the pool has idle workers. Files split
+    # by challan are extracted as page ranges whenever the workers can be
+    # killed, so a PDF that hangs the extractor can't stall this process
+    ranges = [[] for _ in names]
+    to_extract = [idx for idx, text in enumerate(texts) if text is None]
+    if workers > 1:
+        idle_workers = len(to_extract) < workers
+        for idx in to_extract:
+            isolate = split[idx] and isolation_enabled()
+            if not (idle_workers or isolate):
+                continue
+            try:
+                page_count = count_pages(payloads[idx], extractor)
+            except ImportError:
+                raise
+            except Exception:
+                continue  # left to the worker, which reports the unreadable file
+            if page_count >= SPLIT_MIN_PAGES or (isolate and page_count):
+                ranges[idx] = _page_ranges(page_count, workers)
+
+    def collect(results):
+        for name, key, result in zip(names, keys, results):
+            if result.extracted:
+                cache.put(key + suffix, result.extracted)
+            yield name, key, result
+
+    def run(executor, name, payload, text, is_split, file_ranges, future):
+        if is_split:
+            return split_worker(executor, name, payload, text, extractor, file_ranges)
+        if file_ranges:
+            return _process_file_by_pages(worker, executor, name, payload, extractor, file_ranges)
+        return _file_result(name, future)
+
+    def pooled(executor):
+        # Whole files are queued up front; split files are extracted or
+        # parsed in pieces on the same pool when their turn comes
+        futures = [
+            None if is_split or file_ranges else executor.submit(worker, name, payload, text, extractor)
+            for name, payload, text, is_split, file_ranges in zip(names, payloads, texts, split, ranges)
+        ]
+        try:
+            yield from collect(run(executor, *args) for args in zip(names, payloads, texts, split, ranges, futures))
+        finally:
+            # Closed early (a cancelled run): drop the files that haven't started
+            for future in futures:
+                if future is not None:
+                    future.cancel()
+
+    spread = any(split) or any(ranges)
+    if executor is not None:
+        yield from pooled(executor)
+    elif not names or ((workers <= 1 or (len(names) <= 1 and not spread)) and not isolation_enabled()):
+        yield from collect(map(partial(worker, extractor=extractor), names, payloads, texts))
+    else:
+        # Even a serial run goes to a (single) worker when files must be killable
+        with IsolatedPool(max_workers=max(1, workers if spread else min(workers, len(names)))) as pool:
+            yield from pooled(pool)
+
+def _add_grn_document(builder, name: str, document: Dict[str, Any]):
+    builder.add({'filename': name, **document['metadata']}, document['products'])
+
+def _add_prn_document(builder, name: str, challan: Dict[str, Any]):
+    builder.add({**challan['metadata'], 'filename': name}, challan['products'])
+
+def _grn_frame_builder():
+    from frames import grn_frame_builder
+    return grn_frame_builder()
+
+def _prn_frame_builder():
+    from frames import prn_frame_builder
+    return prn_frame_builder()
+
+# Per document type: (worker, frame builder factory, add parsed document to builder,
+# worker splitting one large file over the pool or None)
+DOCUMENT_KINDS = {
+    'grn': (_process_grn_file, _grn_frame_builder, _add_grn_document, None),
+    'prn': (_process_prn_file, _prn_frame_builder, _add_prn_document, _process_prn_file_by_challan),
+}
+
+# Per document type, the header-only worker of the vectorized line-item engine
+HEADER_WORKERS = {'grn': _process_grn_headers, 'prn': _process_prn_headers}
+
+def _batch_products(kind: str, texts: List[str]) -> List[List[Dict[str, Any]]]:
+    """Products of each document text, found in one pass over all of them"""
+    from line_items import grn_line_items, prn_line_items, products_by_document
+    line_items = grn_line_items if kind == 'grn' else prn_line_items
+    return products_by_document(line_items(texts), len(texts))
+
+def _process_files(kind: str, files, workers, progress, stats, extractor, executor=None, line_items=None):
+    """Shared loop of process_grn_files/process_prn_files"""
+    worker, make_builder, add_document, split_worker = DOCUMENT_KINDS[kind]
+    line_items = line_items or LINE_ITEM_ENGINE
+    if line_items not in LINE_ITEM_ENGINES:
+        raise ValueError(f"Unknown line-item engine {line_items!r}; choose from {', '.join(LINE_ITEM_ENGINES)}")
+    vectorized = line_items == 'vectorized'
+    if vectorized:
+        # Headers are parsed file by file, so large files aren't split by challan
+        worker, split_worker = HEADER_WORKERS[kind], None
+    builder = make_builder()
+    stats = ProcessingStats() if stats is None else stats
+    stats.extractor = extractor or DEFAULT_EXTRACTOR
+    files, errors = expand_archives(files)
+    sources, read_errors = _read_sources(files)
+    errors.extend(read_errors)
+
+    headers = []  # (filename, document) still without products, with the vectorized engine
+    results = _run_files(worker, sources, workers, split_worker=split_worker, extractor=extractor, executor=executor)
+    for done, (name, _, result) in enumerate(results, 1):
+        if result.error:
+            errors.append(result.error)
+        stats.add_file(name, result.timings)
+        for document in result.documents:
+            if vectorized:
+                headers.append((name, document))
+            else:
+                add_document(builder, name, document)
+        if progress:
+            progress(done, len(sources), name)
+
+    if headers:
+        with stats.stage('line_items'):
+            products = _batch_products(kind, [document['text'] for _, document in headers])
+        for (name, document), items in zip(headers, products):
+            add_document(builder, name, {'metadata': document['metadata'], 'products': items})
+
+    with stats.stage('frame'):
+        df = builder.build()
+    stats.finish()
+    return df, errors
+
+def process_grn_files(files, workers: Optional[int] = None, progress: Optional[ProgressCallback] = None,
+                      stats: Optional[ProcessingStats] = None, extractor: Optional[str] = None, executor=None,
+                      line_items: Optional[str] = None):
+    """Process GRN files and return DataFrame.
+
+    files may include ZIP archives, whose PDFs are processed as files named
+    <archive>/<path in archive>. progress, if given, is called as
+    progress(done, total, filename) after each file; stats, if given, collects
+    per-file and per-stage timings. extractor names the text-extraction
+    backend (see extractors). executor, if given, is a process pool to run
+    the files on instead of starting one (workers should then be its size).
+    line_items names the line-item engine (see LINE_ITEM_ENGINES, default
+    LINE_ITEM_ENGINE); both give the same rows.
+    """
+    return _process_files('grn', files, workers, progress, stats, extractor, executor, line_items)
+
+def process_prn_files(files, workers: Optional[int] = None, progress: Optional[ProgressCallback] = None,
+                      stats: Optional[ProcessingStats] = None, extractor: Optional[str] = None, executor=None,
+                      line_items: Optional[str] = None):
+    """Process PRN files and return DataFrame (see process_grn_files)"""
+    return _process_files('prn', files, workers, progress, stats, extractor, executor, line_items)
+
+def process_mixed_files(files, workers: Optional[int] = None, progress: Optional[ProgressCallback] = None,
+                        stats: Optional[ProcessingStats] = None, extractor: Optional[str] = None, executor=None):
+    """Process an upload of GRN and PRN files together; returns (GRN DataFrame, PRN DataFrame, errors).
+
+    Each file is read once: its type is told from its text (see _parse_any)
+    and its documents go to the frame of that type. A file that is neither,
+    or has no text, is reported as an error. Arguments as for process_grn_files.
+    """
+    builders = {kind: make_builder() for kind, (_, make_builder, _, _) in DOCUMENT_KINDS.items()}
+    stats = ProcessingStats() if stats is None else stats
+    stats.extractor = extractor or DEFAULT_EXTRACTOR
+    files, errors = expand_archives(files)
+    sources, read_errors = _read_sources(files)
+    errors.extend(read_errors)
+
+    results = _run_files(process_any_file, sources, workers, extractor=extractor, executor=executor)
+    for done, (name, _, result) in enumerate(results, 1):
+        if result.error:
+            errors.append(result.error)
+        stats.add_file(name, result.timings)
+        for document in result.documents:
+            add_document = DOCUMENT_KINDS[document['kind']][2]
+            add_document(builders[document['kind']], name, document)
+        if progress:
+            progress(done, len(sources), name)
+
+    with stats.stage('frame'):
+        frames = {kind: builder.build() for kind, builder in builders.items()}
+    stats.finish()
+    return frames['grn'], frames['prn'], errors
+
+class IncrementalBatch:
+    """Parsed results of a growing upload, kept per file by content hash.
+
+    update() only extracts and parses files it hasn't seen, forgets files that
+    are no longer in the upload, and rebuilds the frame from the stored parsed
+    documents. Identical files uploaded under another name are skipped and
+    reported instead of being parsed twice. Files that failed are not kept, so
+    the next update() retries them. Switching the extraction backend discards
+    every stored result.
+    """
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.extractor = None
+        self._results: Dict[str, FileResult] = {}
+        # (name, parsed documents) of the files parsed by the last update()
+        self.new_documents: List[Tuple[str, List[Dict[str, Any]]]] = []
+
+    def __len__(self):
+        return len(self._results)
+
+    def update(self, files, workers: Optional[int] = None, progress: Optional[ProgressCallback] = None,
+               stats: Optional[ProcessingStats] = None, extractor: Optional[str] = None,
+               cancel: Optional[threading.Event] = None, executor=None):
+        """Bring the batch in line with files; returns (DataFrame, errors, duplicates).
+
+        Setting cancel stops the run after the files in progress; the frame then
+        holds the files finished so far and a later update parses the rest.
+        executor, if given, runs the files instead of a pool of this run's own
+        (see _run_files).
+        """
+        worker, make_builder, add_document, split_worker = DOCUMENT_KINDS[self.kind]
+        stats = ProcessingStats() if stats is None else stats
+        extractor = extractor or DEFAULT_EXTRACTOR
+        if extractor != self.extractor:
+            self._results = {}
+            self.extractor = extractor
+        stats.extractor = extractor
+
+        files, source_errors = expand_archives(files)
+        sources, read_errors = _read_sources(files)
+        source_errors.extend(read_errors)
+        current, first_names, duplicates = [], {}, []
+        for name, pdf_bytes, key in sources:
+            if key in first_names:
+                duplicates.append(f"{name} is identical to {first_names[key]} and was skipped")
+                continue
+            first_names[key] = name
+            current.append((name, pdf_bytes, key))
+
+        new = [source for source in current if source[2] not in self._results]
+        stats.reused = len(current) - len(new)
+        self.new_documents = []
+        if progress:
+            progress(0, len(new), '')
+        results = _run_files(worker, new, workers, split_worker=split_worker, extractor=extractor, executor=executor)
+        # Failed files are only reported this time, so the next update tries them again
+        failed: Dict[str, FileResult] = {}
+        for done, (name, key, result) in enumerate(results, 1):
+            if result.error is None:
+                self._results[key] = result._replace(extracted=None)
+            else:
+                failed[key] = result._replace(extracted=None)
+            self.new_documents.append((name, result.documents))
+            stats.add_file(name, result.timings)
+            if progress:
+                progress(done, len(new), name)
+            if cancel is not None and cancel.is_set():
+                results.close()
+                break
+
+        # Drop files that were removed from the upload (or not reached before a cancel)
+        self._results = {key: self._results[key] for _, _, key in current if key in self._results}
+
+        errors = source_errors
+        with stats.stage('frame'):
+            builder = make_builder()
+            for name, _, key in current:
+                result = self._results.get(key) or failed.get(key)
+                if result is None:
+                    continue
+                if result.error:
+                    errors.append(result.error)
+                for document in result.documents:
+                    add_document(builder, name, document)
+            df = builder.build()
+        stats.finish()
+        return df, errors, duplicates
+
+# Frames with at least this many rows are written row by row with
+# xlsxwriter's constant_memory mode instead of through pandas
+CONSTANT_MEMORY_ROWS = int(os.getenv("EXCEL_CONSTANT_MEMORY_ROWS", 50_000))
+
+def _write_excel_constant_memory(sheets: Dict[str, 'pd.DataFrame'], output):
+    """Stream each frame into its sheet one row at a time, keeping only the current row in memory.
+
+    constant_memory flushes each row as soon as the next one starts, so cells
+    must be written in row order (pandas' to_excel writes column by column).
+    """
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True, 'default_date_format': 'yyyy-mm-dd'})
+    header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+    for sheet_name, df in sheets.items():
+        worksheet = workbook.add_worksheet(sheet_name)
+        worksheet.write_row(0, 0, [str(col) for col in df.columns], header_format)
+
+        # Object dtype with None for missing values, which xlsxwriter leaves blank
+        values = df.astype(object).where(df.notna(), None)
+        for row_idx, row in enumerate(values.itertuples(index=False, name=None), 1):
+            worksheet.write_row(row_idx, 0, row)
+    workbook.close()
+
+def write_excel(df: 'pd.DataFrame', output, sheet_name: str, extra_sheets: Optional[Dict[str, 'pd.DataFrame']] = None):
+    """Write df to an xlsx workbook at output (a path or file object), followed by any extra_sheets by name"""
+    sheets = {sheet_name: df, **(extra_sheets or {})}
+    if len(df) >= CONSTANT_MEMORY_ROWS:
+        _write_excel_constant_memory(sheets, output)
+        return
+
+    import pandas as pd
+    with pd.ExcelWriter(output, engine='xlsxwriter', date_format='yyyy-mm-dd', datetime_format='yyyy-mm-dd') as writer:
+        for name, frame in sheets.items():
+            frame.to_excel(writer, index=False, sheet_name=name)
+
+def excel_bytes(df: 'pd.DataFrame', sheet_name: str, extra_sheets: Optional[Dict[str, 'pd.DataFrame']] = None) -> bytes:
+    """Return df (and any extra_sheets) as the bytes of an xlsx workbook"""
+    output = BytesIO()
+    write_excel(df, output, sheet_name, extra_sheets)
+    return output.getvalue()
@@ -0,0 +1,126 @@
+"""Checks of the parsed line items against the totals printed on each document.
+
+A TOTAL or FINAL VALUE line that disagrees with the sum of the items parsed
+from the same document usually means lines were missed or misread. The checks
+run on the result frame with one groupby per document type, so they stay fast
+on batches of hundreds of thousands of rows.
+"""
+import os
+from typing import Dict, List, Sequence, Tuple
+
+import pandas as pd
+
+from frames import coerce_number
+
+# Per document type: columns identifying a document, and per check the
+# document-level total and the item columns whose sum it should equal.
+# A GRN's Gross Value isn't checked: what it adds to the cost value isn't
+# the same on every GRN layout, so no item sum is known to equal it
+RECONCILIATION_CHECKS: Dict[str, Tuple[List[str], List[Tuple[str, Sequence[str]]]]] = {
+    'grn': (['filename', 'grn_no'], [
+        ('total_gst_value', ['gst_value']),
+        ('total_received_qty', ['received_qty']),
+        ('total_accepted_qty', ['accepted_qty']),
+        ('total_rejected_qty', ['rejected_qty']),
+        ('total_cost_value', ['product_total_cost_value']),
+    ]),
+    'prn': (['filename', 'doc_no'], [
+        ('total_qty', ['qty']),
+        ('total_value', ['value']),
+        ('final_value', ['net_val']),
+    ]),
+}
+
+# Per document type with several documents per file: the document number
+# column and the item serial column. Documents without a number are keyed
+# file:<name>#<position in the file>, as in the archive, a new one starting
+# wherever the number changes or the serial starts again
+UNNUMBERED_DOCUMENTS: Dict[str, Tuple[str, str]] = {'prn': ('doc_no', 'sno')}
+
+# A total matches when it is within this much of the line sum, plus half a
+# paisa per summed value for the rounding of each printed line
+RECONCILE_TOLERANCE = float(os.getenv("RECONCILE_TOLERANCE", 0.01))
+LINE_ROUNDING = 0.005
+
+MISMATCH_COLUMNS = ['check', 'summed', 'document_total', 'line_sum', 'difference', 'items']
+
+def _document_numbers(df: pd.DataFrame, number: str, serial: str) -> pd.Series:
+    """The number column of df, with the items of unnumbered documents keyed by the document's position in its file"""
+    numbers = df[number].astype(object).fillna('')
+    missing = numbers.eq('')
+    if not missing.any():
+        return df[number]
+    filenames = df['filename'].astype(object)
+    serials = coerce_number(df[serial]) if serial in df.columns else pd.Series(float('nan'), index=df.index)
+    starts = filenames.ne(filenames.shift()) | numbers.ne(numbers.shift()) | serials.le(serials.shift())
+    positions = starts.astype('int64').groupby(filenames, sort=False).cumsum()
+    return numbers.where(~missing, 'file:' + filenames.astype(str) + '#' + positions.astype(str))
+
+def reconcile(df: pd.DataFrame, kind: str) -> pd.DataFrame:
+    """Documents of a result frame whose line sums don't match their totals.
+
+    Returns one row per failing check of a document: its key columns, the
+    total checked, the item columns summed, both values, the difference and
+    the document's item count. A total that is missing or unreadable can't
+    be checked and isn't a mismatch; attrs['documents'] holds the number of
+    documents checked and attrs['unchecked'] the number of those missing at
+    least one total. Documents without a number are listed under
+    file:<name>#<position> (see UNNUMBERED_DOCUMENTS).
+    """
+    keys, checks = RECONCILIATION_CHECKS[kind]
+    keys = [column for column in keys if column in df.columns]
+    key_values = {column: df[column] for column in keys}
+    number, serial = UNNUMBERED_DOCUMENTS.get(kind, (None, None))
+    if number in key_values and 'filename' in key_values:
+        key_values[number] = _document_numbers(df, number, serial)
+    checks = [
+        (total, summed) for total, summed in checks
+        if total in df.columns and all(column in df.columns for column in summed)
+    ]
+    line_columns = sorted({column for _, summed in checks for column in summed})
+    total_columns = [total for total, _ in checks]
+
+    values = pd.DataFrame({column: coerce_number(df[column]) for column in line_columns + total_columns})
+    grouped = values.groupby(list(key_values.values()), observed=True, sort=False, dropna=False)
+    sums = grouped[line_columns].sum()
+    totals = grouped[total_columns].first()
+    items = grouped.size()
+
+    mismatches = []
+    for total, summed in checks:
+        line_sum = sums[list(summed)].sum(axis=1)
+        difference = line_sum - totals[total]
+        tolerance = RECONCILE_TOLERANCE + LINE_ROUNDING * items * len(summed)
+        failed = totals[total].notna() & difference.abs().gt(tolerance)
+        if failed.any():
+            mismatches.append(pd.DataFrame({
+                'check': total,
+                'summed': ' + '.join(summed),
+                'document_total': totals.loc[failed, total],
+                'line_sum': line_sum[failed].round(3),
+                'difference': difference[failed].round(3),
+                'items': items[failed],
+            }))
+
+    if mismatches:
+        result = pd.concat(mismatches).reset_index()
+    else:
+        result = pd.DataFrame(columns=keys + MISMATCH_COLUMNS)
+    result = result.astype({column: object for column in keys})
+    result.attrs['documents'] = len(items)
+    result.attrs['unchecked'] = int(totals.isna().any(axis=1).sum())
+    return result
+
+def mismatch_summary(mismatches: pd.DataFrame) -> str:
+    """One line on how many documents failed the checks, and how many lacked a total"""
+    documents = mismatches.attrs.get('documents', 0)
+    unchecked = mismatches.attrs.get('unchecked', 0)
+    keys = [column for column in mismatches.columns if column not in MISMATCH_COLUMNS]
+    failed = len(mismatches.drop_duplicates(keys)) if len(mismatches) else 0
+    if not failed:
+        line = f"Line items match the document totals for all {documents} document(s)"
+    else:
+        line = f"{failed} of {documents} document(s) have line items that don't add up to their totals"
+    if unchecked:
+        line += f"; {unchecked} document(s) lack a total to check against"
+    return line
@@ -0,0 +1,243 @@
+"""One process pool shared by every session of the app, handed out fairly.
+
+Each session's jobs submit their files through a session handle instead of
+starting a pool of their own. Files wait in a queue per session and are sent
+to the pool one session at a time in turn, so ten users processing at once
+each get a share of the workers instead of all of them competing for the CPUs.
+The pool is an IsolatedPool, so a file that hangs or crashes its worker fails
+alone instead of taking every session's files down with it. At most
+max_in_flight files are on the pool at a time, and while the machine
+(or the container's memory limit) has less than SCHEDULER_MIN_FREE_MB free,
+no further file is started until one finishes.
+"""
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import CancelledError, Future
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from isolation import IsolatedPool
+from processing import DEFAULT_WORKERS
+
+# Size of the shared pool and the most files sent to it at once
+SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", 0)) or DEFAULT_WORKERS
+MAX_IN_FLIGHT = int(os.getenv("SCHEDULER_MAX_IN_FLIGHT", 0)) or SCHEDULER_WORKERS
+
+# New files wait while less memory than this is available (one file always runs)
+MIN_FREE_MB = float(os.getenv("SCHEDULER_MIN_FREE_MB", 512))
+
+# Seconds between memory checks while files are held back
+MEMORY_POLL_S = 0.5
+
+# Weight of the latest file in the running average of file durations
+DURATION_SMOOTHING = 0.2
+
+def available_memory_mb() -> Optional[float]:
+    """Memory still available in MB: the smaller of the host's MemAvailable and the cgroup limit's headroom.
+
+    None where neither can be read (not Linux).
+    """
+    available = []
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    available.append(int(line.split()[1]) / 1024)
+                    break
+    except (OSError, ValueError):
+        pass
+    # cgroup v2, then v1 (whose "no limit" is a huge number)
+    for limit_path, usage_path in (('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory.current'),
+                                   ('/sys/fs/cgroup/memory/memory.limit_in_bytes',
+                                    '/sys/fs/cgroup/memory/memory.usage_in_bytes')):
+        try:
+            with open(limit_path) as f:
+                limit = f.read().strip()
+            with open(usage_path) as f:
+                usage = int(f.read())
+        except (OSError, ValueError):
+            continue
+        if limit.isdigit() and int(limit) < 1 << 60:
+            available.append((int(limit) - usage) / (1024 * 1024))
+        break
+    return min(available) if available else None
+
+class SessionExecutor:
+    """A session's view of a FileScheduler, usable wherever a process pool executor is expected"""
+
+    def __init__(self, scheduler: 'FileScheduler', session: str):
+        self.scheduler = scheduler
+        self.session = session
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        return self.scheduler.submit(self.session, fn, *args, **kwargs)
+
+class FileScheduler:
+    """Fair, bounded access to one process pool for many sessions.
+
+    Sessions take turns: each time a slot frees up, the next session in the
+    rotation that has files waiting sends its oldest one. Futures returned by
+    submit can be cancelled until their file is sent to the pool.
+    """
+
+    def __init__(self, workers: int = SCHEDULER_WORKERS, max_in_flight: int = MAX_IN_FLIGHT,
+                 min_free_mb: float = MIN_FREE_MB):
+        self.workers = workers
+        self.max_in_flight = max_in_flight
+        self.min_free_mb = min_free_mb
+        self._pool = None
+        self._queues: Dict[str, Deque[Tuple[Future, Any, tuple, dict]]] = {}
+        self._turns: Deque[str] = deque()  # sessions with files waiting, next to send first
+        self._running: Dict[str, int] = {}
+        self._in_flight = 0
+        self._file_s: Optional[float] = None  # running average of the seconds a file is on the pool
+        self.memory_wait = False  # files are being held back for memory
+        self._condition = threading.Condition()
+        self._dispatcher: Optional[threading.Thread] = None
+
+    def executor(self, session: str) -> SessionExecutor:
+        return SessionExecutor(self, session)
+
+    def submit(self, session: str, fn, *args, **kwargs) -> Future:
+        future = Future()
+        with self._condition:
+            if self._dispatcher is None:
+                # The pool and dispatcher start with the first file, not with the app
+                self._pool = IsolatedPool(max_workers=self.workers)
+                self._dispatcher = threading.Thread(target=self._dispatch, name='file-scheduler', daemon=True)
+                self._dispatcher.start()
+            queue = self._queues.setdefault(session, deque())
+            if not queue and session not in self._turns:
+                self._turns.append(session)
+            queue.append((future, fn, args, kwargs))
+            self._condition.notify_all()
+        # A cancelled file no longer counts towards its session's queue
+        future.add_done_callback(self._notify)
+        return future
+
+    def _notify(self, _):
+        with self._condition:
+            self._condition.notify_all()
+
+    def _next(self) -> Optional[Tuple[str, Future, Any, tuple, dict]]:
+        """The next file to send in the rotation, dropping cancelled ones; None when nothing waits"""
+        while self._turns:
+            session = self._turns.popleft()
+            queue = self._queues[session]
+            while queue and queue[0][0].cancelled():
+                queue.popleft()
+            if not queue:
+                del self._queues[session]
+                continue
+            future, fn, args, kwargs = queue.popleft()
+            if queue:
+                self._turns.append(session)
+            else:
+                del self._queues[session]
+            return session, future, fn, args, kwargs
+        return None
+
+    def _memory_ok(self) -> bool:
+        if self._in_flight == 0:
+            return True  # never hold back the only file, or nothing would ever finish
+        available = available_memory_mb()
+        return available is None or available >= self.min_free_mb
+
+    def _dispatch(self):
+        while True:
+            with self._condition:
+                while True:
+                    if self._turns and self._in_flight < self.max_in_flight:
+                        self.memory_wait = not self._memory_ok()
+                        if not self.memory_wait:
+                            entry = self._next()
+                            if entry is not None:
+                                break
+                            continue
+                        self._condition.wait(MEMORY_POLL_S)
+                    else:
+                        self._condition.wait()
+                session, future, fn, args, kwargs = entry
+                if not future.set_running_or_notify_cancel():
+                    continue  # cancelled after it was taken from the queue
+                self._in_flight += 1
+                self._running[session] = self._running.get(session, 0) + 1
+            started = time.perf_counter()
+            try:
+                pool_future = self._pool.submit(fn, *args, **kwargs)
+            except Exception as e:
+                self._finished(session, started, None)
+                future.set_exception(e)
+                continue
+            pool_future.add_done_callback(lambda done, session=session, future=future, started=started:
+                                          self._settle(done, session, future, started))
+
+    def _settle(self, done: Future, session: str, future: Future, started: float):
+        """Hand a pool result to the session's future and free the slot"""
+        if done.cancelled():
+            # Dropped by the pool before it started (a shutdown). The session's
+            # future is already running, so it can't be cancelled, only failed the same way
+            self._finished(session, started, None)
+            future.set_exception(CancelledError())
+            return
+        self._finished(session, started, time.perf_counter() - started)
+        error = done.exception()
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(done.result())
+
+    def _finished(self, session: str, started: float, seconds: Optional[float]):
+        with self._condition:
+            self._in_flight -= 1
+            self._running[session] -= 1
+            if not self._running[session]:
+                del self._running[session]
+            if seconds is not None:
+                self._file_s = seconds if self._file_s is None else (
+                    DURATION_SMOOTHING * seconds + (1 - DURATION_SMOOTHING) * self._file_s
+                )
+            self._condition.notify_all()
+
+    def _waiting(self, session: str) -> int:
+        return sum(not future.cancelled() for future, *_ in self._queues.get(session, ()))
+
+    def status(self, session: str) -> Dict[str, Any]:
+        """Where a session's files stand: waiting, running, queue position and estimated seconds to finish.
+
+        position is the session's place in the rotation when it has files
+        waiting but none on the pool (1 = next), else None. wait_s assumes the
+        other sessions keep their turns: each of them sends up to as many files
+        as this one still has before this one is done. It is None until a file
+        has finished, which gives the first duration to go by.
+        """
+        with self._condition:
+            waiting = self._waiting(session)
+            running = self._running.get(session, 0)
+            position = None
+            if waiting and not running and session in self._turns:
+                position = list(self._turns).index(session) + 1
+            wait_s = None
+            if (waiting or running) and self._file_s is not None:
+                ahead = sum(min(self._waiting(other), waiting) for other in self._queues if other != session)
+                # Little's law: files finish at max_in_flight per average time on the pool
+                wait_s = (ahead + waiting + self._in_flight) * self._file_s / self.max_in_flight
+            return {
+                'waiting': waiting,
+                'running': running,
+                'position': position,
+                'wait_s': wait_s,
+                'sessions': len(set(self._queues) | set(self._running)),
+                'in_flight': self._in_flight,
+                'memory_wait': self.memory_wait,
+            }
+
+    def shutdown(self):
+        with self._condition:
+            for queue in self._queues.values():
+                for future, *_ in queue:
+                    future.cancel()
+            pool = self._pool
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
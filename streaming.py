@@ -0,0 +1,211 @@
+"""Bounded-memory conversion of very large batches straight to a file on disk.
+
+Files flow through read -> extract -> parse -> write one at a time: at most
+a few files per worker are read and in flight, and each parsed file's rows go
+to a CSV or constant-memory xlsx writer as soon as its turn comes, so neither
+the texts, the rows nor a DataFrame of the whole batch are ever held. Peak
+memory depends on the largest files, not on how many there are.
+
+Unlike the batch path, values are typed one cell at a time (a number or date
+that doesn't parse stays text in that cell only), the text cache is neither
+read nor filled, and large files are not split over the pool.
+"""
+import csv
+import os
+from collections import deque
+from functools import partial
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from columns import (
+    GRN_DOCUMENT_COLUMNS, GRN_DTYPES, GRN_ITEM_COLUMNS, PRN_COLUMNS, PRN_DTYPES, parse_date, parse_number,
+)
+from extractors import DEFAULT_EXTRACTOR, get_extractor
+from isolation import IsolatedPool, isolation_enabled
+from processing import (
+    DEFAULT_WORKERS, DOCUMENT_KINDS, ProcessingStats, ProgressCallback, _file_result, _iter_sources, expand_archives,
+)
+
+GRN_COLUMNS = GRN_DOCUMENT_COLUMNS + [column for column, _ in GRN_ITEM_COLUMNS]
+
+def _grn_rows(name: str, document: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    for product in document['products']:
+        yield {'filename': name, **document['metadata'],
+               **{column: product.get(key, '') for column, key in GRN_ITEM_COLUMNS}}
+
+def _prn_rows(name: str, challan: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    for product in challan['products']:
+        yield {**challan['metadata'], **product, 'filename': name}
+
+# Per document type: (output columns, column types, parsed document -> row dicts)
+STREAM_LAYOUTS = {
+    'grn': (GRN_COLUMNS, GRN_DTYPES, _grn_rows),
+    'prn': (PRN_COLUMNS, PRN_DTYPES, _prn_rows),
+}
+
+def _encodable(text: str) -> str:
+    """text with any lone surrogates (left in by some PDF extractions) replaced by '?'"""
+    try:
+        text.encode('utf-8')
+        return text
+    except UnicodeEncodeError:
+        return text.encode('utf-8', 'replace').decode('utf-8')
+
+class RowWriter:
+    """Write typed rows to a CSV or xlsx file (chosen by extension) without keeping them.
+
+    xlsx uses xlsxwriter's constant_memory mode, which flushes each row to disk
+    once the next one starts. With append, rows are added to the end of an
+    existing CSV file (which keeps its header). Lone surrogates in the text
+    are written as '?' instead of failing the export.
+    """
+
+    def __init__(self, path: str, columns: Sequence[str], dtypes: Dict[str, List[str]], sheet_name: str,
+                 append: bool = False):
+        self.columns = list(columns)
+        self.rows = 0
+        self._integer = set(dtypes.get('integer', ()))
+        self._number = set(dtypes.get('float', ())) | self._integer
+        self._date = set(dtypes.get('date', ()))
+        self._csv = path.lower().endswith('.csv')
+        if self._csv:
+            has_header = append and os.path.exists(path) and os.path.getsize(path) > 0
+            # Extracted text can hold lone surrogates, which strict utf-8 refuses; they become '?'
+            self._file = open(path, 'a' if append else 'w', newline='', encoding='utf-8', errors='replace')
+            self._writer = csv.writer(self._file)
+            if not has_header:
+                self._writer.writerow(self.columns)
+        else:
+            if append:
+                raise ValueError("Only CSV output can be appended to")
+            import xlsxwriter
+
+            self._workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+            self._worksheet = self._workbook.add_worksheet(sheet_name)
+            self._date_format = self._workbook.add_format({'num_format': 'yyyy-mm-dd'})
+            header_format = self._workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+            self._worksheet.write_row(0, 0, self.columns, header_format)
+
+    def _typed(self, column: str, value):
+        if value is None or value == '':
+            return None
+        if column in self._number:
+            number = parse_number(value)
+            if number is not None:
+                return int(number) if column in self._integer and number.is_integer() else number
+        elif column in self._date:
+            date = parse_date(value)
+            if date is not None:
+                return date
+        return value
+
+    def write(self, record: Dict[str, Any]):
+        values = [self._typed(column, record.get(column)) for column in self.columns]
+        self.rows += 1
+        if self._csv:
+            self._writer.writerow(
+                ['' if value is None else value.strftime('%Y-%m-%d') if column in self._date and not isinstance(value, str)
+                 else value for column, value in zip(self.columns, values)]
+            )
+            return
+        for col_idx, (column, value) in enumerate(zip(self.columns, values)):
+            if value is None:
+                continue
+            if column in self._date and not isinstance(value, str):
+                self._worksheet.write_datetime(self.rows, col_idx, value, self._date_format)
+            elif isinstance(value, str):
+                self._worksheet.write(self.rows, col_idx, _encodable(value))
+            else:
+                self._worksheet.write(self.rows, col_idx, value)
+
+    def close(self):
+        if self._csv:
+            self._file.close()
+        else:
+            self._workbook.close()
+
+def _without_text(worker, name: str, pdf_bytes: bytes, text: Optional[str], extractor: str):
+    """Run worker and drop the extracted text from its result, which nothing here caches.
+
+    Runs in the worker process, so the text is never sent back over the pipe.
+    """
+    return worker(name, pdf_bytes, text, extractor)._replace(extracted=None)
+
+def bounded_results(worker, files, workers: int, max_pending: int, extractor: str,
+                    errors: List[str]) -> Iterator[Tuple[str, Any]]:
+    """Yield (name, worker result) per file in order, reading a file only when fewer than max_pending are in flight.
+
+    worker is a processing worker such as process_any_file, run in isolated
+    workers unless workers <= 1 and isolation is off. Files that can't be read
+    are added to errors instead and never submitted. Results carry no
+    extracted text.
+    """
+    sources = _iter_sources(files, errors)
+    worker = partial(_without_text, worker)
+    if workers <= 1 and not isolation_enabled():
+        for name, pdf_bytes in sources:
+            yield name, worker(name, pdf_bytes, None, extractor)
+        return
+
+    with IsolatedPool(max_workers=max(1, workers)) as executor:
+        pending = deque()
+        try:
+            for name, pdf_bytes in sources:
+                pending.append((name, executor.submit(worker, name, pdf_bytes, None, extractor)))
+                del pdf_bytes  # only the pool's copy stays alive until the file is done
+                if len(pending) >= max_pending:
+                    name, future = pending.popleft()
+                    yield name, _file_result(name, future)
+            while pending:
+                name, future = pending.popleft()
+                yield name, _file_result(name, future)
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+def stream_to_file(kind: str, files, output: str, sheet_name: str, workers: Optional[int] = None,
+                   progress: Optional[ProgressCallback] = None, stats: Optional[ProcessingStats] = None,
+                   extractor: Optional[str] = None, max_pending: Optional[int] = None) -> Tuple[int, List[str]]:
+    """Convert files of a document type to output (.csv or .xlsx) in bounded memory.
+
+    files is a sequence of uploads or PdfSources (ZIP archives included),
+    read one by one as the pipeline needs them; at most max_pending (default two per worker) are in
+    flight. Returns (rows written, errors); output is removed if nothing was
+    extracted.
+    """
+    worker = DOCUMENT_KINDS[kind][0]
+    columns, dtypes, rows_of = STREAM_LAYOUTS[kind]
+    workers = workers or DEFAULT_WORKERS
+    extractor = extractor or DEFAULT_EXTRACTOR
+    get_extractor(extractor)  # fail on an unknown backend before any file is read
+    stats = ProcessingStats() if stats is None else stats
+    stats.extractor = extractor
+
+    files, errors = expand_archives(files)
+    read_errors: List[str] = []
+    writer = RowWriter(output, columns, dtypes, sheet_name)
+    try:
+        results = bounded_results(worker, files, workers, max_pending or 2 * workers, extractor, read_errors)
+        done, name, total = 0, '', len(files)
+        for done, (name, result) in enumerate(results, 1):
+            if result.error:
+                errors.append(result.error)
+            stats.add_file(name, result.timings)
+            with stats.stage('export'):
+                for document in result.documents:
+                    for record in rows_of(name, document):
+                        writer.write(record)
+            if progress:
+                # Archive members that couldn't be read are never submitted
+                total = len(files) - len(read_errors)
+                progress(done, total, name)
+        # Members found unreadable after the last file was submitted still complete the count
+        if progress and done and total != done:
+            progress(done, done, name)
+    finally:
+        writer.close()
+        stats.finish()
+    errors.extend(read_errors)
+
+    if not writer.rows:
+        os.remove(output)
+    return writer.rows, errors
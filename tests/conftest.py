@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the repository root, next to benchmarks/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import extractors  # noqa: E402
+
+@pytest.fixture
+def text_backend(monkeypatch):
+    """Register extractor 'text', which reads form-feed separated pages of text instead of PDFs.
+
+    Returns the list of inputs it opened, one entry per reader.
+    """
+    opened = []
+
+    def pages(pdf_bytes, start=0, stop=None):
+        opened.append(pdf_bytes)
+        texts = [page + "\n" for page in pdf_bytes.decode("utf-8", "surrogatepass").split("\f")]
+        return extractors.Pages(iter(texts[start:stop]), lambda: len(texts))
+
+    def count(pdf_bytes):
+        opened.append(pdf_bytes)
+        return len(pdf_bytes.decode("utf-8", "surrogatepass").split("\f"))
+
+    monkeypatch.setitem(extractors.EXTRACTORS, 'text', extractors.Extractor('json', pages, count))
+    return opened
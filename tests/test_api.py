@@ -0,0 +1,70 @@
+"""The HTTP batch API: jobs run to a result, and bad or excess requests get their status codes"""
+import http.client
+import json
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('pandas')
+
+from api import BatchService, ServiceServer
+from benchmarks.sample_docs import make_grn_text
+
+@pytest.fixture
+def request_api():
+    """Start a service on a free port; returns request(method, path, body=None, headers=None) -> (status, json)"""
+    servers = []
+
+    def start(**limits):
+        service = BatchService(workers=1, **limits)
+        server = ServiceServer(('127.0.0.1', 0), service, quiet=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+
+        def request(method, path, body=None, headers=None):
+            conn = http.client.HTTPConnection(*server.server_address, timeout=30)
+            try:
+                conn.request(method, path, body, headers or {})
+                response = conn.getresponse()
+                return response.status, json.loads(response.read() or b'null')
+            finally:
+                conn.close()
+        return request
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.service.shutdown()
+        server.server_close()
+
+def test_job_runs_to_its_result(text_backend, request_api):
+    request = request_api()
+    status, job = request('POST', '/jobs/grn?name=a.pdf&extractor=text', make_grn_text(4, seed=1).encode())
+    assert status == 202 and job['state'] in ('queued', 'running', 'done')
+
+    deadline = time.monotonic() + 30
+    while job['state'] in ('queued', 'running') and time.monotonic() < deadline:
+        time.sleep(0.05)
+        _, job = request('GET', f"/jobs/{job['id']}")
+    assert job['state'] == 'done' and job['records'] == 4 and job['files_done'] == job['files_total'] == 1
+
+    status, result = request('GET', f"/jobs/{job['id']}/result")
+    assert status == 200 and len(result['records']) == 4
+    assert {record['filename'] for record in result['records']} == {'a.pdf'}
+    assert request('DELETE', f"/jobs/{job['id']}")[0] == 200
+    assert request('GET', f"/jobs/{job['id']}")[0] == 404
+
+def test_bad_requests(text_backend, request_api):
+    request = request_api()
+    assert request('POST', '/jobs/grn', b'x', {'Content-Length': 'many'})[0] == 400
+    assert request('POST', '/jobs/grn?extractor=none', b'x')[0] == 400
+    assert request('POST', '/jobs/invoices', b'x')[0] == 404
+    assert request('GET', '/jobs/nosuchjob/result')[0] == 404
+    assert request('GET', '/jobs/nosuchjob/result?format=pdf')[0] == 400
+
+def test_full_queue_is_turned_away(text_backend, request_api):
+    request = request_api(max_queued=0)
+    status, body = request('POST', '/jobs/grn?extractor=text', b'GRN No :1')
+    assert status == 503 and 'try again later' in body['error']
+    assert request('GET', '/health')[1]['limits']['queued'] == 0
@@ -0,0 +1,46 @@
+"""The SQLite archive: a re-ingested document replaces its rows, and unnumbered challans are kept apart"""
+import sqlite3
+from contextlib import closing
+
+import pytest
+
+from archive import RecordArchive
+from benchmarks.sample_docs import make_grn_text, make_prn_text
+from parsers import parse_grn_text, parse_prn_challans, parse_prn_documents
+
+@pytest.fixture
+def archive(tmp_path):
+    return RecordArchive(str(tmp_path / 'archive.db'))
+
+def _rows(archive, table):
+    with closing(sqlite3.connect(archive.path)) as conn:
+        return conn.execute(f"SELECT doc_key, filename FROM {table} ORDER BY doc_key").fetchall()
+
+def test_reingest_replaces_document_rows(archive):
+    grn = parse_grn_text(make_grn_text(5, seed=3))
+    assert archive.ingest_documents('grn', 'a.pdf', [grn]) == 5
+    # The same GRN No corrected to fewer items, from another file
+    corrected = {**grn, 'products': grn['products'][:2]}
+    assert archive.ingest_documents('grn', 'b.pdf', [corrected]) == 2
+    assert archive.counts()['grn'] == (2, 1)
+    assert _rows(archive, 'grn_items') == [(grn['metadata']['grn_no'], 'b.pdf')] * 2
+
+def test_unnumbered_challans_keep_their_items(archive):
+    challans = parse_prn_challans(make_prn_text(n_challans=3, n_items=4))
+    for challan in challans:
+        challan['metadata']['doc_no'] = ''
+    assert archive.ingest_documents('prn', 'returns.pdf', challans) == 12
+    assert archive.counts()['prn'] == (12, 3)
+
+    # Ingesting the file again, now with two challans, replaces all three
+    assert archive.ingest_documents('prn', 'returns.pdf', challans[:2]) == 8
+    assert archive.counts()['prn'] == (8, 2)
+    assert {key for key, _ in _rows(archive, 'prn_items')} == {'file:returns.pdf#1', 'file:returns.pdf#2'}
+
+def test_flat_prn_records_split_where_serials_restart(archive):
+    records = [{**record, 'doc_no': ''} for record in parse_prn_documents(make_prn_text(n_challans=3, n_items=4))]
+    assert archive.ingest_prn('returns.pdf', records) == 12
+    assert archive.counts()['prn'] == (12, 3)
+    # Another file's unnumbered challans are left alone
+    assert archive.ingest_prn('returns.pdf.bak', records[:4]) == 4
+    assert archive.counts()['prn'] == (16, 4)
@@ -0,0 +1,41 @@
+"""The single-pass GRN header scan against the per-field re.search extraction it replaced"""
+import pytest
+
+from benchmarks.bench_grn_header import legacy_grn_metadata
+from benchmarks.sample_docs import make_grn_text, make_prn_text
+from parsers import parse_grn_metadata
+
+GRN = make_grn_text(3, seed=7)
+
+SAMPLES = {
+    'grn': GRN,
+    'grn_pages': "".join(make_grn_text(5, seed=seed, vendor=seed) for seed in range(4)),
+    'prn': make_prn_text(n_challans=3, n_items=4),
+    'empty': "",
+    'no_status': GRN.replace(" Status :Posted", ""),
+    'no_status_or_inv_no': GRN.replace(" Status :Posted", "").replace("Inv.No", "Inv No"),
+    'inv_no_at_line_start': GRN.replace(" Status :Posted\n", "\n"),
+    'no_trailing_newline': GRN.rstrip("\n"),
+    'header_only_no_newline': "Vendor Code :100200\nAddress :12 MARKET ROAD Status :Posted",
+    'address_at_end': "Vendor Name :ACME\nAddress :12 MARKET ROAD\nMUMBAI",
+    'address_colon_lines': GRN.replace("ANDHERI EAST", ":ANDHERI EAST\n: \nWEST"),
+    'address_twice': GRN + "Address :SECOND\nLINE Inv.No :X-2\n",
+    'status_before_address': "Status :Open\n" + GRN,
+    'empty_values': "GRN No :\nGRN Date : \nPO.No :4500003\nInv.No :\n",
+    'labels_without_colon': GRN.replace(" :", " "),
+    'repeated_labels': GRN.replace("GRN No :5000003", "GRN No : GRN No :5000003"),
+    'lowercase_store': GRN.replace("NB Koramangala", "nb koramangala Nature's Basket"),
+    'no_store': GRN.replace("NB Koramangala\n", ""),
+    'total_short': GRN.replace("TOTAL 40.44 55.000 55.000 0.000", "TOTAL 40.44 55.000"),
+    'crlf': GRN.replace("\n", "\r\n"),
+}
+
+@pytest.mark.parametrize('name', sorted(SAMPLES))
+def test_grn_metadata_matches_per_field_search(name):
+    text = SAMPLES[name]
+    assert parse_grn_metadata(text) == legacy_grn_metadata(text)
+
+@pytest.mark.parametrize('seed', range(20))
+def test_grn_metadata_matches_on_generated_headers(seed):
+    text = make_grn_text(seed % 5 + 1, seed=seed, vendor=seed % 7)
+    assert parse_grn_metadata(text) == legacy_grn_metadata(text)
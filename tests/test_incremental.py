@@ -0,0 +1,71 @@
+"""Incremental batches: only new files are parsed, duplicates are reported and failed files are retried"""
+import pytest
+
+pytest.importorskip('pandas')
+
+import extractors
+import processing
+from benchmarks.sample_docs import make_grn_text
+from processing import IncrementalBatch, PdfSource, ProcessingStats
+
+def _file(name, text):
+    data = text.encode()
+    return PdfSource(name, lambda: data)
+
+@pytest.fixture
+def flaky(text_backend, monkeypatch):
+    """Run in this process, with extraction of 'flaky.pdf' failing until the flag is cleared"""
+    monkeypatch.setattr(processing, 'isolation_enabled', lambda: False)
+    failing = {'flaky': True}
+    pages = extractors.EXTRACTORS['text'].pages
+
+    def flaky_pages(pdf_bytes, start=0, stop=None):
+        if failing['flaky'] and pdf_bytes.startswith(b"FLAKY"):
+            raise OSError("read error")
+        return pages(pdf_bytes.removeprefix(b"FLAKY"), start, stop)
+
+    monkeypatch.setitem(extractors.EXTRACTORS, 'text', extractors.EXTRACTORS['text']._replace(pages=flaky_pages))
+    return failing
+
+def _update(batch, files):
+    stats = ProcessingStats()
+    df, errors, duplicates = batch.update(files, workers=1, stats=stats, extractor='text')
+    return df, errors, duplicates, stats
+
+def test_update_parses_only_new_files(flaky, text_backend):
+    batch = IncrementalBatch('grn')
+    a, b = _file('a.pdf', make_grn_text(2, seed=1)), _file('b.pdf', make_grn_text(3, seed=2))
+    df, errors, duplicates, stats = _update(batch, [a])
+    assert len(df) == 2 and not errors and not duplicates and stats.reused == 0
+
+    opened = len(text_backend)
+    df, errors, duplicates, stats = _update(batch, [a, b])
+    assert list(df['filename'].astype(str)) == ['a.pdf'] * 2 + ['b.pdf'] * 3
+    assert stats.reused == 1 and len(text_backend) == opened + 1 and [name for name, _ in batch.new_documents] == ['b.pdf']
+
+    # Removed files are forgotten
+    df, _, _, _ = _update(batch, [b])
+    assert len(df) == 3 and len(batch) == 1
+
+def test_duplicates_are_skipped_and_reported(flaky):
+    batch = IncrementalBatch('grn')
+    text = make_grn_text(2, seed=1)
+    df, errors, duplicates, _ = _update(batch, [_file('a.pdf', text), _file('copy of a.pdf', text)])
+    assert len(df) == 2 and set(df['filename'].astype(str)) == {'a.pdf'}
+    assert duplicates == ["copy of a.pdf is identical to a.pdf and was skipped"]
+    assert not errors and len(batch) == 1
+
+def test_failed_files_are_retried(flaky):
+    batch = IncrementalBatch('grn')
+    good, bad = _file('a.pdf', make_grn_text(2, seed=1)), _file('flaky.pdf', "FLAKY" + make_grn_text(3, seed=2))
+    df, errors, _, _ = _update(batch, [good, bad])
+    assert len(df) == 2 and errors == ["Error processing flaky.pdf: read error"]
+    assert len(batch) == 1
+
+    # Still failing: reported again, not remembered
+    _, errors, _, stats = _update(batch, [good, bad])
+    assert errors == ["Error processing flaky.pdf: read error"] and stats.reused == 1
+
+    flaky['flaky'] = False
+    df, errors, _, stats = _update(batch, [good, bad])
+    assert len(df) == 5 and not errors and stats.reused == 1 and len(batch) == 2
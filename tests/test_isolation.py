@@ -0,0 +1,57 @@
+"""Per-file timeouts and crash isolation: a worker that hangs, dies or can't send its result fails only its file"""
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from isolation import FileTimeout, IsolatedPool, WorkerCrashed
+from processing import FileResult, _run_files
+
+def _ok(name, payload, text, extractor=None):
+    return FileResult([{'name': name}], None, None, {'extract_s': 0.0, 'parse_s': 0.0, 'pages': 1, 'cached': False})
+
+def _pathological(name, payload, text, extractor=None):
+    if name == 'hang.pdf':
+        time.sleep(60)
+    if name == 'crash.pdf':
+        os.kill(os.getpid(), signal.SIGKILL)
+    if name == 'exit.pdf':
+        os._exit(3)
+    if name == 'unpicklable.pdf':
+        return FileResult([{'reader': lambda: None}], None, None, {})
+    return _ok(name, payload, text, extractor)
+
+def _sources(*names):
+    return [(name, b"%PDF", name) for name in names]
+
+def test_pool_reports_timeouts_and_crashes():
+    with IsolatedPool(max_workers=2, timeout_s=1) as pool:
+        futures = {name: pool.submit(_pathological, name, b"", None) for name in ('hang.pdf', 'crash.pdf', 'exit.pdf', 'a.pdf')}
+        with pytest.raises(FileTimeout, match="timed out after 1 s"):
+            futures['hang.pdf'].result()
+        with pytest.raises(WorkerCrashed, match="killed by SIGKILL"):
+            futures['crash.pdf'].result()
+        with pytest.raises(WorkerCrashed, match="exited with code 3"):
+            futures['exit.pdf'].result()
+        assert futures['a.pdf'].result().documents == [{'name': 'a.pdf'}]
+        # Workers that died were replaced
+        assert pool.submit(_ok, 'b.pdf', b"", None).result().error is None
+
+def test_run_reports_failed_workers_per_file():
+    names = ['a.pdf', 'hang.pdf', 'crash.pdf', 'unpicklable.pdf', 'b.pdf']
+    with IsolatedPool(max_workers=2, timeout_s=1) as pool:
+        results = {name: result for name, _, result in _run_files(_pathological, _sources(*names), 2, executor=pool)}
+    assert list(results) == names
+    assert results['a.pdf'].documents == [{'name': 'a.pdf'}] and results['b.pdf'].error is None
+    assert results['hang.pdf'].error == "hang.pdf timed out after 1 s and was stopped"
+    assert results['crash.pdf'].error.startswith("crash.pdf crashed: its worker was killed by SIGKILL")
+    assert results['unpicklable.pdf'].error.startswith("Error processing unpicklable.pdf:")
+    assert not any(results[name].documents for name in names[1:4])
+
+def test_broken_process_pool_fails_files_not_the_run():
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        results = list(_run_files(_pathological, _sources('exit.pdf', 'a.pdf'), 1, executor=pool))
+    assert [name for name, _, _ in results] == ['exit.pdf', 'a.pdf']
+    assert all(result.error.startswith(f"Error processing {name}:") for name, _, result in results)
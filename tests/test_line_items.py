@@ -0,0 +1,66 @@
+"""The vectorized line-item engine against the per-line parsers, on its own and in the pipeline"""
+import re
+
+import pytest
+
+pd = pytest.importorskip('pandas')
+
+from benchmarks.sample_docs import make_grn_text, make_prn_challan, make_prn_text
+from line_items import grn_line_items, prn_line_items, products_by_document
+from parsers import PRN_CHALLAN_MARKER, parse_grn_text, parse_prn_challan, split_prn_challans
+from processing import PdfSource, ProcessingStats, process_grn_files, process_prn_files
+
+GRN = make_grn_text(4, seed=11)
+PRN = make_prn_challan(4, seed=5).split(PRN_CHALLAN_MARKER, 1)[1]
+
+GRN_TEXTS = [make_grn_text(seed % 9 + 1, seed=seed, vendor=seed % 7) for seed in range(25)] + [
+    "",
+    GRN.rstrip("\n"),
+    GRN.replace("TBD ", "", 1),  # an item without a description line
+    GRN.replace("TBD OLIVE OIL", "TBD  OLIVE   OIL"),  # runs of spaces in a description
+    GRN.replace("\n", "  \n"),  # trailing whitespace
+    GRN.split("TOTAL")[0].rstrip("\n").rsplit("\n", 1)[0],  # ends on an item line
+    GRN.replace("\nTBD", "\n\nTBD"),  # a blank line between item and description
+]
+
+PRN_TEXTS = list(split_prn_challans([make_prn_text(n_challans=12, n_items=5, seed=3)])) + [
+    PRN,
+    PRN.rstrip("\n"),
+    PRN.replace(" Date expired", " DAMAGED IN  TRANSIT"),  # HSN lines with a return reason
+    PRN.replace(" Date expired", ""),  # HSN lines without a reason
+    PRN.replace("\nTBD", "\nTBD 12345678", 1),  # an 8-digit run in the description
+    # "Date expired" lines without an HSN code, which then comes from the description if it has one
+    re.sub(r'\nTBD (.*)\n(\d{8}) Date expired', r'\nTBD \1 \2\nDate expired', PRN),
+    re.sub(r'\n\d{8} Date expired', '\nDate expired', PRN),
+    re.sub(r'^(\d+ \d{7}(?: \S+){8}).*$', r'\1', PRN, flags=re.MULTILINE),  # item lines without tax columns
+    PRN.split("TOTAL")[0].rstrip("\n").rsplit("\n", 2)[0],  # ends on an item line
+]
+
+@pytest.mark.parametrize('texts, line_items, parse_one', [
+    (GRN_TEXTS, grn_line_items, parse_grn_text),
+    (PRN_TEXTS, prn_line_items, parse_prn_challan),
+], ids=['grn', 'prn'])
+def test_vectorized_products_match_per_line_parsers(texts, line_items, parse_one):
+    expected = [parse_one(text)['products'] for text in texts]
+    assert sum(map(len, expected)) > len(texts)
+    got = products_by_document(line_items(texts), len(texts))
+    for text, want, have in zip(texts, expected, got):
+        assert have == want, text
+
+@pytest.mark.parametrize('process_files, texts', [
+    (process_grn_files, GRN_TEXTS[:8] + GRN_TEXTS[-6:]),
+    (process_prn_files, [make_prn_text(n_challans=6, n_items=5, seed=3)]
+     + [PRN_CHALLAN_MARKER + text for text in PRN_TEXTS[-8:]]),
+], ids=['grn', 'prn'])
+def test_pipeline_engines_give_identical_frames(text_backend, process_files, texts):
+    files = [PdfSource(f'{idx}.pdf', lambda text=text: text.encode()) for idx, text in enumerate(texts)]
+    per_line, per_line_errors = process_files(files, workers=2, extractor='text', line_items='per-line')
+    stats = ProcessingStats()
+    vectorized, errors = process_files(files, workers=2, stats=stats, extractor='text', line_items='vectorized')
+    assert len(per_line) > len(texts) and errors == per_line_errors
+    assert 'line_items' in stats.stages
+    pd.testing.assert_frame_equal(vectorized, per_line)
+
+def test_unknown_engine(text_backend):
+    with pytest.raises(ValueError, match='line-item engine'):
+        process_grn_files([], extractor='text', line_items='fast')
@@ -0,0 +1,37 @@
+"""Net receipts: PRN returns net against the GRN receipts of the same vendor and article"""
+import pytest
+
+pytest.importorskip('pandas')
+
+from benchmarks.sample_docs import make_grn_text, make_prn_challan
+from frames import grn_frame_builder, prn_frame_builder
+from net_receipts import net_receipt_sheets
+from parsers import parse_grn_text, parse_prn_challans
+from processing import _add_grn_document, _add_prn_document
+
+def test_returns_net_against_receipts():
+    grn = parse_grn_text(make_grn_text(3, seed=1, vendor=2))
+    received = grn['products'][0]
+    # A challan of the same vendor and store, whose header prints the store its own way
+    store = grn['metadata']['store_name']
+    prn_text = make_prn_challan(2, seed=8, vendor=2).replace("\nNB ", f"\nNB {store.upper()}  -\nNB ", 1)
+    prn = parse_prn_challans(prn_text)[0]
+    assert prn['metadata']['store'] != store
+    # that returns the first article received
+    returned = prn['products'][0]
+    returned['article_code'] = received['article_code']
+
+    grn_builder, prn_builder = grn_frame_builder(), prn_frame_builder()
+    _add_grn_document(grn_builder, 'grn.pdf', grn)
+    _add_prn_document(prn_builder, 'prn.pdf', prn)
+    sheets = net_receipt_sheets(grn_builder.build(), prn_builder.build())
+
+    for sheet in ('Net_Positions', 'Net_By_Store'):
+        positions = sheets[sheet].set_index('article_code')
+        assert len(positions) == 4  # three articles received, one of them and one other returned
+        row = positions.loc[received['article_code']]
+        assert row['received_qty'] == float(received['accepted_qty'])
+        assert row['returned_qty'] == float(returned['qty'])
+        assert row['net_value'] == pytest.approx(float(received['total_cost_value']) - float(returned['value']))
+    assert list(sheets['Store_Summary']['store']) == [store.upper()]
+    assert sheets['Net_By_PO']['po_no'].nunique() == 2
@@ -0,0 +1,41 @@
+"""Large PDFs extracted as page ranges over the pool give the same results as a serial run"""
+import pytest
+
+pytest.importorskip('PyPDF2')
+
+import processing
+from benchmarks.sample_docs import make_grn_text, make_pdf
+from processing import _process_grn_file, _run_files
+from text_cache import TextCache, content_hash
+
+def _grn_pdf(n_items: int, seed: int, lines_per_page: int = 30) -> bytes:
+    # One GRN whose item lines run over many pages
+    lines = make_grn_text(n_items, seed=seed).splitlines()
+    return make_pdf(["\n".join(lines[start:start + lines_per_page]) for start in range(0, len(lines), lines_per_page)])
+
+def _results(sources, workers, cache):
+    return [
+        (name, result.documents, result.error, result.timings['pages'])
+        for name, _, result in _run_files(_process_grn_file, sources, workers, cache)
+    ]
+
+def test_page_ranges_match_serial(monkeypatch):
+    files = [('long.pdf', _grn_pdf(300, seed=1)), ('short.pdf', _grn_pdf(5, seed=2))]
+    sources = [(name, pdf_bytes, content_hash(pdf_bytes)) for name, pdf_bytes in files]
+    serial = _results(sources, 1, TextCache())
+    assert serial[0][2] is None and serial[0][3] > 10
+
+    monkeypatch.setattr(processing, 'SPLIT_MIN_PAGES', 10)
+    monkeypatch.setattr(processing, 'PAGE_RANGE_MIN_PAGES', 3)
+    by_pages = []
+    original = processing._process_file_by_pages
+    monkeypatch.setattr(processing, '_process_file_by_pages', lambda worker, executor, name, *args: (
+        by_pages.append(name) or original(worker, executor, name, *args)
+    ))
+    cache = TextCache()
+    assert _results(sources, 3, cache) == serial
+    assert by_pages == ['long.pdf']
+
+    # From the text cache the whole file goes to one worker again
+    assert [result[:3] for result in _results(sources, 3, cache)] == [result[:3] for result in serial]
+    assert by_pages == ['long.pdf'] and cache.hits == len(sources)
@@ -0,0 +1,45 @@
+"""Large PRN files split by challan over the pool give the same challans as a serial parse"""
+import pytest
+
+pytest.importorskip('PyPDF2')
+
+import processing
+from benchmarks.sample_docs import make_pdf, make_prn_text
+from processing import _process_prn_file, _process_prn_file_by_challan, _run_files
+from text_cache import TextCache, content_hash
+
+def _prn_pdf(n_challans: int, lines_per_page: int = 35) -> bytes:
+    # Pages cut at a fixed line count, so challans run across page breaks
+    lines = make_prn_text(n_challans=n_challans, n_items=6).splitlines()
+    return make_pdf(["\n".join(lines[start:start + lines_per_page]) for start in range(0, len(lines), lines_per_page)])
+
+def _documents(sources, workers, cache, split_worker=None):
+    return [
+        (name, result.documents, result.error)
+        for name, _, result in _run_files(_process_prn_file, sources, workers, cache, split_worker)
+    ]
+
+@pytest.fixture
+def sources():
+    files = [('big.pdf', _prn_pdf(24)), ('small.pdf', _prn_pdf(3))]
+    return [(name, pdf_bytes, content_hash(pdf_bytes)) for name, pdf_bytes in files]
+
+@pytest.mark.parametrize('isolate', [True, False])
+def test_split_matches_serial(monkeypatch, sources, isolate):
+    serial = _documents(sources, 1, TextCache())
+    assert serial[0][1] and serial[0][2] is None
+
+    monkeypatch.setattr(processing, 'PRN_SPLIT_MIN_BYTES', 0)
+    monkeypatch.setattr(processing, 'CHALLAN_BATCH_CHARS', 2_000)  # several batches per file
+    monkeypatch.setattr(processing, 'isolation_enabled', lambda: isolate)  # page ranges or local extraction
+    cache, splits = TextCache(), []
+
+    def split_worker(*args):
+        splits.append(args[1])
+        return _process_prn_file_by_challan(*args)
+
+    assert _documents(sources, 3, cache, split_worker) == serial
+    assert splits == ['big.pdf', 'small.pdf']
+    # Again from the text cache, which skips extraction and parses each file whole
+    assert _documents(sources, 3, cache, split_worker) == serial
+    assert cache.hits == len(sources) and len(splits) == 2
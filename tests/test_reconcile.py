@@ -0,0 +1,58 @@
+"""Line items checked against document totals: wrong totals are mismatches, missing ones are only counted, unnumbered challans are kept apart"""
+import pytest
+
+pytest.importorskip('pandas')
+
+from benchmarks.sample_docs import make_grn_text, make_prn_text
+from frames import grn_frame_builder, prn_frame_builder
+from parsers import parse_grn_text, parse_prn_challans
+from processing import _add_grn_document, _add_prn_document
+from reconcile import mismatch_summary, reconcile
+
+def _grn_frame(documents):
+    builder = grn_frame_builder()
+    for idx, document in enumerate(documents):
+        _add_grn_document(builder, f"grn{idx}.pdf", document)
+    return builder.build()
+
+def _with(document, **metadata):
+    return {**document, 'metadata': {**document['metadata'], **metadata}}
+
+def test_grn_mismatches_and_missing_totals():
+    good, wrong, missing, gross = (parse_grn_text(make_grn_text(6, seed=seed)) for seed in range(4))
+    df = _grn_frame([
+        good,
+        _with(wrong, total_cost_value='1.00', total_received_qty='0.5'),
+        _with(missing, total_gst_value='', total_cost_value=''),
+        # Gross value isn't checked, whatever it holds
+        _with(gross, gross_value='1.00'),
+    ])
+    mismatches = reconcile(df, 'grn')
+    assert mismatches.attrs == {'documents': 4, 'unchecked': 1}
+    assert list(mismatches['filename']) == ['grn1.pdf', 'grn1.pdf']
+    assert set(mismatches['check']) == {'total_cost_value', 'total_received_qty'}
+    assert mismatch_summary(mismatches) == (
+        "1 of 4 document(s) have line items that don't add up to their totals; "
+        "1 document(s) lack a total to check against"
+    )
+
+def test_prn_challans_match_their_totals():
+    builder = prn_frame_builder()
+    for challan in parse_prn_challans(make_prn_text(n_challans=5, n_items=4)):
+        _add_prn_document(builder, 'prn.pdf', challan)
+    mismatches = reconcile(builder.build(), 'prn')
+    assert mismatches.empty and mismatches.attrs == {'documents': 5, 'unchecked': 0}
+    assert mismatch_summary(mismatches) == "Line items match the document totals for all 5 document(s)"
+
+def test_unnumbered_prn_challans_are_checked_apart():
+    challans = parse_prn_challans(make_prn_text(n_challans=3, n_items=4))
+    builder = prn_frame_builder()
+    for idx, challan in enumerate(challans):
+        metadata = {'doc_no': ''} if idx < 2 else {}
+        if idx == 1:
+            metadata['total_qty'] = '1'  # wrong, and mustn't be hidden by merging with the first
+        _add_prn_document(builder, 'prn.pdf', _with(challan, **metadata))
+    mismatches = reconcile(builder.build(), 'prn')
+    assert mismatches.attrs == {'documents': 3, 'unchecked': 0}
+    assert list(mismatches['doc_no']) == ['file:prn.pdf#2'] and list(mismatches['check']) == ['total_qty']
+    assert list(mismatches['items']) == [4]
@@ -0,0 +1,44 @@
+"""The shared file scheduler: cancelled files, waiting or already on the pool, never leave a future hanging"""
+import time
+from concurrent.futures import CancelledError
+
+import pytest
+
+from scheduler import FileScheduler
+
+def _wait_until(condition, timeout_s=10):
+    deadline = time.monotonic() + timeout_s
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+@pytest.fixture
+def scheduler():
+    schedulers = []
+
+    def start(**limits):
+        schedulers.append(FileScheduler(workers=1, min_free_mb=0, **limits))
+        return schedulers[-1]
+    yield start
+    for scheduler in schedulers:
+        scheduler.shutdown()
+
+def test_cancelled_file_is_dropped_from_the_queue(scheduler):
+    files = scheduler(max_in_flight=1)
+    running = files.submit('a', time.sleep, 0.3)
+    queued = files.submit('a', pow, 2, 3)
+    later = files.submit('a', pow, 2, 4)
+    _wait_until(lambda: running.running())
+    assert queued.cancel()
+    assert later.result(timeout=10) == 16 and running.result(timeout=10) is None
+    assert files.status('a')['waiting'] == 0 and files.status('a')['in_flight'] == 0
+
+def test_file_dropped_by_the_pool_fails_its_future(scheduler):
+    files = scheduler(max_in_flight=2)
+    running = files.submit('a', time.sleep, 5)
+    queued = files.submit('a', pow, 2, 3)  # sent to the pool, waiting there for the only worker
+    _wait_until(lambda: files.status('a')['in_flight'] == 2)
+    files.shutdown()
+    with pytest.raises(CancelledError):
+        queued.result(timeout=10)
+    assert files.status('a')['running'] == 1  # only the file still on a worker
@@ -0,0 +1,51 @@
+"""Document-type sniffing: files are turned away only when they are another type or have no text at all"""
+import processing
+from benchmarks.sample_docs import make_grn_text, make_prn_text
+from parsers import parse_grn_text
+from processing import PdfSource, _process_grn_file, _run_files, process_mixed_files
+from text_cache import TextCache, content_hash
+
+GRN = make_grn_text(3, seed=4)
+
+def test_blank_first_page_is_parsed(text_backend):
+    result = _process_grn_file('cover.pdf', f"\f{GRN}".encode(), extractor='text')
+    assert result.error is None
+    assert result.documents == [parse_grn_text(f"\n{GRN}\n")]
+    assert result.timings['pages'] == 2 and len(text_backend) == 1
+
+def test_other_type_is_rejected_after_one_page(text_backend):
+    result = _process_grn_file('return.pdf', f"{make_prn_text(1, 2)}\fmore\fpages".encode(), extractor='text')
+    assert result.error == "return.pdf looks like a PRN, not a GRN; skipped after reading 1 of 3 page(s)"
+    assert result.timings['skipped_pages'] == 2 and len(text_backend) == 1
+
+def test_file_without_text_is_rejected(text_backend):
+    result = _process_grn_file('scan.pdf', b" \f\f", extractor='text')
+    assert result.error == "scan.pdf has no text (a scanned document?); skipped"
+    assert not result.documents and len(text_backend) == 1
+
+def test_mixed_upload_reads_each_file_once(text_backend, monkeypatch):
+    monkeypatch.setattr(processing, 'isolation_enabled', lambda: False)  # count the readers in this process
+    monkeypatch.setattr(processing, 'text_cache', TextCache())
+    files = [
+        PdfSource('receipt.pdf', lambda: f"\f{GRN}".encode()),
+        PdfSource('returns.pdf', lambda: make_prn_text(2, 3).encode()),
+        PdfSource('scan.pdf', lambda: b" \f"),
+        PdfSource('letter.pdf', lambda: b"Dear vendor"),
+    ]
+    grn_df, prn_df, errors = process_mixed_files(files, workers=1, extractor='text')
+    assert list(grn_df['filename'].astype(str)) == ['receipt.pdf'] * 3
+    assert list(prn_df['filename'].astype(str)) == ['returns.pdf'] * 6
+    assert errors == [
+        "scan.pdf has no text (a scanned document?); skipped",
+        "Error processing letter.pdf: not a GRN or PRN document",
+    ]
+    assert len(text_backend) == len(files)
+
+def test_other_type_behind_a_cover_page_is_rejected_with_or_without_the_cache(text_backend):
+    cache = TextCache()
+    pdf_bytes = f"\f{make_prn_text(2, 3)}".encode()
+    sources = [('cover.pdf', pdf_bytes, content_hash(pdf_bytes))]
+    for cached in (False, True):
+        [(_, _, result)] = _run_files(_process_grn_file, sources, 1, cache, extractor='text')
+        assert result.error == "cover.pdf looks like a PRN, not a GRN; skipped"
+        assert not result.documents and result.timings['cached'] == cached
@@ -0,0 +1,53 @@
+"""Bounded-memory streaming: results carry no text back and progress completes past unreadable members"""
+import csv
+import zipfile
+
+import pytest
+
+from benchmarks.sample_docs import make_grn_text
+from processing import PdfSource, _process_grn_file, expand_archives
+from streaming import bounded_results, stream_to_file
+
+GRNS = [make_grn_text(2, seed=seed) for seed in range(3)]
+
+@pytest.fixture
+def archive(tmp_path):
+    """A ZIP of three GRNs whose last member is corrupt"""
+    path = tmp_path / 'grns.zip'
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for idx, text in enumerate(GRNS):
+            zf.writestr(f'grn{idx}.pdf', text.encode())
+    data = bytearray(path.read_bytes())
+    info = zipfile.ZipFile(path).getinfo('grn2.pdf')
+    data[info.header_offset + 30 + len('grn2.pdf') + 5] ^= 0xFF  # inside the member's compressed data
+    path.write_bytes(bytes(data))
+    return path
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_results_carry_no_text(text_backend, archive, workers):
+    files, _ = expand_archives([PdfSource.from_path(str(archive))])
+    errors = []
+    results = list(bounded_results(_process_grn_file, files, workers, 2, 'text', errors))
+    assert [name for name, _ in results] == ['grns.zip/grn0.pdf', 'grns.zip/grn1.pdf']
+    assert all(result.error is None and result.documents and result.extracted is None for _, result in results)
+    assert len(errors) == 1 and errors[0].startswith("Could not read grns.zip/grn2.pdf")
+
+def test_progress_completes_without_unreadable_members(text_backend, archive, tmp_path):
+    calls = []
+    output = tmp_path / 'out.csv'
+    rows, errors = stream_to_file('grn', [PdfSource.from_path(str(archive))], str(output), 'GRN', workers=1,
+                                  extractor='text', progress=lambda done, total, name: calls.append((done, total)))
+    assert calls[-1] == (2, 2)
+    assert rows == 4 and len(list(csv.reader(output.open()))) == 5
+    assert len(errors) == 1
+
+@pytest.mark.parametrize('suffix', ['csv', 'xlsx'])
+def test_lone_surrogates_are_replaced(text_backend, tmp_path, suffix):
+    text = GRNS[0].replace("VENDOR 0 FOODS", "VENDOR \udc9d FOODS")
+    source = PdfSource('odd.pdf', lambda: text.encode('utf-8', 'surrogatepass'))
+    output = tmp_path / f'out.{suffix}'
+    rows, errors = stream_to_file('grn', [source], str(output), 'GRN', workers=1, extractor='text')
+    assert rows == 2 and not errors
+    if suffix == 'csv':
+        vendors = {row['vendor_name'] for row in csv.DictReader(output.open(encoding='utf-8'))}
+        assert vendors == {"VENDOR ? FOODS PVT LTD"}
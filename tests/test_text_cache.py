@@ -0,0 +1,45 @@
+"""The extracted-text cache: LRU eviction by size and a disk copy that survives a restart"""
+from text_cache import TextCache, content_hash
+
+def test_evicts_least_recently_used_past_max_chars():
+    cache = TextCache(max_chars=10)
+    cache.put('a', "aaaa")
+    cache.put('b', "bbbb")
+    assert cache.get('a') == "aaaa"  # b is now the least recently used
+    cache.put('c', "cccc")
+    assert cache.get('b') is None
+    assert cache.get('a') == "aaaa" and cache.get('c') == "cccc"
+    assert cache.stats() == {'hits': 3, 'misses': 1, 'hit_rate': 0.75, 'entries': 2, 'chars': 8}
+
+def test_keeps_an_entry_larger_than_the_cap_until_the_next_one():
+    cache = TextCache(max_chars=3)
+    cache.put('big', "x" * 10)
+    assert cache.get('big') == "x" * 10
+    cache.put('small', "y")
+    assert cache.get('big') is None and len(cache) == 1
+
+def test_empty_text_is_not_cached():
+    cache = TextCache()
+    cache.put('empty', "")
+    assert cache.get('empty') is None and len(cache) == 0
+
+def test_disk_round_trip(tmp_path):
+    text = "GRN No :5000001\n\udcff lone surrogate\n"
+    key = content_hash(b"%PDF-1.4 sample")
+    TextCache(cache_dir=str(tmp_path)).put(key, text)
+    assert (tmp_path / f"{key}.txt").exists()
+
+    # A new cache on the same directory (a restarted app) starts warm
+    restarted = TextCache(cache_dir=str(tmp_path))
+    assert restarted.get(key) == text
+    assert restarted.hits == 1 and len(restarted) == 1
+
+    restarted.clear()
+    assert not list(tmp_path.iterdir())
+    assert TextCache(cache_dir=str(tmp_path)).get(key) is None
+
+def test_prunes_disk_to_max_entries(tmp_path):
+    cache = TextCache(cache_dir=str(tmp_path), max_disk_entries=2)
+    for idx in range(256):
+        cache.put(f"key{idx}", f"text {idx}")
+    assert len(list(tmp_path.iterdir())) == 2
@@ -0,0 +1,72 @@
+"""The watch folder: unrecorded rows are cut off on restart, and a file that fails to write is skipped"""
+import csv
+import os
+
+from benchmarks.sample_docs import make_grn_text
+from parsers import parse_grn_text
+import watch
+from watch import FolderWatcher
+
+def _watcher(folder, output_dir):
+    return FolderWatcher(str(folder), str(output_dir), workers=1, extractor='text', settle_s=0)
+
+def _output_rows(output_dir):
+    outputs = [name for name in os.listdir(output_dir) if name.endswith('.csv')]
+    assert len(outputs) == 1 and outputs[0].startswith('grn_')
+    with open(os.path.join(output_dir, outputs[0]), newline='', encoding='utf-8') as f:
+        return [row[0] for row in csv.reader(f)][1:]  # filename column, without the header
+
+def test_restart_removes_unrecorded_rows(text_backend, tmp_path):
+    folder, output_dir = tmp_path / 'in', tmp_path / 'out'
+    folder.mkdir()
+    (folder / 'a.pdf').write_text(make_grn_text(3, seed=1))
+    watcher = _watcher(folder, output_dir)
+    assert watcher.convert(watcher.scan()) == {'converted': 1, 'skipped': 0, 'failed': 0, 'rows': 3}
+
+    # b.pdf's rows are appended, then the run stops before recording it as done
+    (folder / 'b.pdf').write_text(make_grn_text(2, seed=2))
+    path, stat = watcher.scan()[0]
+    entry = {'path': path, 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'hash': 'b'}
+    document = {**parse_grn_text(make_grn_text(2, seed=2)), 'kind': 'grn'}
+    assert watcher._append(entry, [document]) == ('grn', 2)
+    assert _output_rows(output_dir) == ['a.pdf'] * 3 + ['b.pdf'] * 2
+    with open(watcher.state_path, 'a', encoding='utf-8') as f:
+        f.write('{"path": "c.pdf", "mtim')  # a line cut short by the crash
+
+    restarted = _watcher(folder, output_dir)
+    assert _output_rows(output_dir) == ['a.pdf'] * 3
+    assert set(restarted.state) == {'a.pdf'}
+    assert [path for path, _ in restarted.scan()] == ['b.pdf']
+    assert restarted.convert(restarted.scan())['rows'] == 2
+    assert _output_rows(output_dir) == ['a.pdf'] * 3 + ['b.pdf'] * 2
+
+    # The state file was compacted, so a further restart has nothing to recover or convert
+    assert _watcher(folder, output_dir).scan() == []
+    assert _output_rows(output_dir) == ['a.pdf'] * 3 + ['b.pdf'] * 2
+
+def test_recover_leaves_a_missing_output_alone(tmp_path):
+    FolderWatcher._recover({'path': 'a.pdf', 'pending': {'output': str(tmp_path / 'gone.csv'), 'offset': 0}})
+    assert not (tmp_path / 'gone.csv').exists()
+
+def test_a_file_that_fails_to_write_is_recorded_as_failed(text_backend, tmp_path, monkeypatch):
+    folder, output_dir = tmp_path / 'in', tmp_path / 'out'
+    folder.mkdir()
+    for idx, name in enumerate(['a.pdf', 'bad.pdf', 'c.pdf']):
+        (folder / name).write_text(make_grn_text(2, seed=idx))
+    write = watch.RowWriter.write
+
+    def failing_write(self, record):
+        if record['filename'] == 'bad.pdf' and self.rows:
+            raise UnicodeEncodeError('utf-8', "\udc9d", 0, 1, "surrogates not allowed")
+        write(self, record)
+
+    monkeypatch.setattr(watch.RowWriter, 'write', failing_write)
+    watcher = _watcher(folder, output_dir)
+    assert watcher.convert(watcher.scan()) == {'converted': 2, 'skipped': 0, 'failed': 1, 'rows': 4}
+    # bad.pdf's first row was cut off again and the watch went on with c.pdf
+    assert _output_rows(output_dir) == ['a.pdf'] * 2 + ['c.pdf'] * 2
+    assert watcher.state['bad.pdf']['error'].startswith("Error writing bad.pdf")
+
+    # A restart finds nothing pending and retries bad.pdf only once it changes
+    restarted = _watcher(folder, output_dir)
+    assert restarted.scan() == [] and _output_rows(output_dir) == ['a.pdf'] * 2 + ['c.pdf'] * 2
@@ -0,0 +1,132 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+def content_hash(pdf_bytes: bytes) -> str:
+    """Return the content address (SHA-256 hex digest) of a PDF's bytes"""
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+class TextCache:
+    """LRU cache of extracted PDF text keyed by a hash of the PDF bytes.
+
+    Entries are kept in memory up to max_chars characters of text in total,
+    evicting the least recently used first. When cache_dir is given every
+    entry is also written there as <hash>.txt, so a restarted app starts warm;
+    the directory is pruned to max_disk_entries files by last access time.
+    """
+
+    def __init__(self, max_chars: int = 200_000_000, cache_dir: Optional[str] = None,
+                 max_disk_entries: int = 100_000):
+        self.max_chars = max_chars
+        self.cache_dir = cache_dir
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._disk_writes = 0
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.txt")
+
+    def _remember(self, key: str, text: str):
+        """Insert into the in-memory LRU, evicting old entries past the size cap"""
+        if key in self._entries:
+            self._size -= len(self._entries.pop(key))
+        self._entries[key] = text
+        self._size += len(text)
+        while self._size > self.max_chars and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+    def get(self, key: str) -> Optional[str]:
+        """Return cached text for key, or None on a miss"""
+        with self._lock:
+            text = self._entries.get(key)
+            if text is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return text
+
+            if self.cache_dir:
+                path = self._disk_path(key)
+                try:
+                    with open(path, encoding="utf-8", errors="surrogatepass") as f:
+                        text = f.read()
+                    os.utime(path)
+                except (OSError, UnicodeError):
+                    text = None
+                if text is not None:
+                    self._remember(key, text)
+                    self.hits += 1
+                    return text
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, text: str):
+        """Store extracted text under key (empty extractions are not cached)"""
+        if not text:
+            return
+        with self._lock:
+            self._remember(key, text)
+            if self.cache_dir:
+                path = self._disk_path(key)
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                try:
+                    # Extracted text can hold lone surrogates, which plain utf-8 refuses
+                    with open(tmp_path, "w", encoding="utf-8", errors="surrogatepass") as f:
+                        f.write(text)
+                    os.replace(tmp_path, path)
+                    self._disk_writes += 1
+                    if self._disk_writes % 256 == 0:
+                        self._prune_disk()
+                except (OSError, UnicodeError):
+                    pass
+
+    def _prune_disk(self):
+        """Drop the least recently used files beyond max_disk_entries"""
+        entries = [e for e in os.scandir(self.cache_dir) if e.name.endswith(".txt")]
+        if len(entries) <= self.max_disk_entries:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_disk_entries]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def clear(self):
+        """Empty the cache, in memory and on disk, and reset the counters"""
+        with self._lock:
+            if self.cache_dir:
+                for entry in os.scandir(self.cache_dir):
+                    if entry.name.endswith(".txt"):
+                        try:
+                            os.remove(entry.path)
+                        except OSError:
+                            pass
+            self._entries.clear()
+            self._size = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'chars': self._size,
+            }
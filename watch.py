@@ -0,0 +1,254 @@
+"""Watch a folder and convert GRN/PRN PDFs as they arrive.
+
+    python -m watch <folder> -o <output-dir> [--interval 30] [--workers N] [-r] [--once]
+
+Every --interval seconds the folder is scanned for PDFs. A file is picked up
+once it is new or its modification time or size changed, and it hasn't been
+written to for --settle seconds. Files whose content was already converted,
+under any name, are skipped by content hash. The rest are classified as GRN or
+PRN from their first page (from their whole text when that doesn't tell),
+parsed on a worker pool and their rows appended to daily CSVs in the output
+directory (grn_YYYY-MM-DD.csv, prn_YYYY-MM-DD.csv). Files without any text are
+turned away. Files that fail, to parse or to write, are logged and retried
+only once they change.
+
+What has been converted is kept in a state file (one JSON line per file,
+default <output-dir>/.watch_state.jsonl), so a restart resumes where the last
+run stopped. Rows appended for a file whose conversion wasn't recorded before
+a crash are removed on restart and the file is converted again. A changed
+file's new rows are appended; rows already written for its earlier content
+stay in the earlier output.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from extractors import DEFAULT_EXTRACTOR, EXTRACTORS, available_extractors
+from processing import DEFAULT_WORKERS, PdfSource, process_any_file
+from streaming import STREAM_LAYOUTS, RowWriter, bounded_results
+from text_cache import content_hash
+
+# A file is converted only once it hasn't been modified for this many seconds
+SETTLE_S = float(os.getenv("WATCH_SETTLE_S", 5))
+
+STATE_FILE = '.watch_state.jsonl'
+
+def _log(message: str):
+    sys.stderr.write(f"{time.strftime('%Y-%m-%d %H:%M:%S')} {message}\n")
+    sys.stderr.flush()
+
+class FolderWatcher:
+    """Incremental conversion of a folder of GRN/PRN PDFs into daily CSVs.
+
+    state maps each file (relative to the folder) to what was last seen and
+    done with it: mtime_ns, size, hash, kind, rows and error.
+    """
+
+    def __init__(self, folder: str, output_dir: str, state_path: Optional[str] = None,
+                 workers: Optional[int] = None, extractor: Optional[str] = None, recursive: bool = False,
+                 settle_s: float = SETTLE_S):
+        self.folder = folder
+        self.output_dir = output_dir
+        self.state_path = state_path or os.path.join(output_dir, STATE_FILE)
+        self.workers = workers or DEFAULT_WORKERS
+        self.extractor = extractor or DEFAULT_EXTRACTOR
+        self.recursive = recursive
+        self.settle_s = settle_s
+        os.makedirs(output_dir, exist_ok=True)
+        self.state: Dict[str, Dict[str, Any]] = self._load_state()
+        # Content already converted (failed files are retried under another name)
+        self.hashes = {entry['hash'] for entry in self.state.values() if entry.get('hash') and not entry.get('error')}
+
+    def _load_state(self) -> Dict[str, Dict[str, Any]]:
+        """Replay the state file (last line per file wins), undo unfinished appends and rewrite it compacted"""
+        state = {}
+        if os.path.exists(self.state_path):
+            with open(self.state_path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # a line cut short by a crash
+                    state[entry['path']] = entry
+            for entry in [entry for entry in state.values() if entry.get('pending')]:
+                self._recover(entry)
+                del state[entry['path']]  # converted again on the first scan
+            temporary = self.state_path + '.tmp'
+            with open(temporary, 'w', encoding='utf-8') as f:
+                for entry in state.values():
+                    f.write(json.dumps(entry) + "\n")
+            os.replace(temporary, self.state_path)
+        return state
+
+    @staticmethod
+    def _recover(entry: Dict[str, Any]):
+        """Cut off the rows a stopped run appended for a file it never recorded as done"""
+        output, offset = entry['pending']['output'], entry['pending']['offset']
+        try:
+            if os.path.getsize(output) > offset:
+                with open(output, 'r+b') as f:
+                    f.truncate(offset)
+                _log(f"Removed the unrecorded rows of {entry['path']} from {output}")
+        except OSError:
+            pass  # the output was removed or moved since
+
+    def _record(self, entry: Dict[str, Any]):
+        """Remember what was done with a file, durably, before moving on to the next"""
+        self.state[entry['path']] = entry
+        with open(self.state_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def scan(self) -> List[Tuple[str, os.stat_result]]:
+        """Files (relative path, stat) that are new or changed and have settled"""
+        ready = []
+        now = time.time()
+        for root, dirs, filenames in os.walk(self.folder):
+            dirs[:] = sorted(d for d in dirs if not d.startswith('.')) if self.recursive else []
+            for filename in sorted(filenames):
+                if not filename.lower().endswith('.pdf'):
+                    continue
+                path = os.path.relpath(os.path.join(root, filename), self.folder)
+                try:
+                    stat = os.stat(os.path.join(self.folder, path))
+                except OSError:
+                    continue  # removed since the listing
+                seen = self.state.get(path)
+                if seen and seen['mtime_ns'] == stat.st_mtime_ns and seen['size'] == stat.st_size:
+                    continue
+                if now - stat.st_mtime >= self.settle_s:
+                    ready.append((path, stat))
+        return ready
+
+    def convert(self, ready: List[Tuple[str, os.stat_result]]) -> Dict[str, int]:
+        """Convert the given files; returns counts of files converted, skipped and failed and rows written"""
+        counts = {'converted': 0, 'skipped': 0, 'failed': 0, 'rows': 0}
+        sources, entries, batch_hashes = [], {}, set()
+        for path, stat in ready:
+            full_path = os.path.join(self.folder, path)
+            entry = {'path': path, 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'hash': None,
+                     'kind': None, 'rows': 0, 'error': None, 'at': time.strftime('%Y-%m-%dT%H:%M:%S')}
+            try:
+                with open(full_path, 'rb') as f:
+                    entry['hash'] = content_hash(f.read())
+            except OSError as e:
+                _log(f"Could not read {path}: {e}")
+                continue  # tried again on the next scan
+            if entry['hash'] in self.hashes or entry['hash'] in batch_hashes:
+                self._record(entry)
+                counts['skipped'] += 1
+                continue
+            entries[path] = entry
+            batch_hashes.add(entry['hash'])
+            sources.append(PdfSource.from_path(full_path, path))
+
+        errors: List[str] = []
+        results = bounded_results(process_any_file, sources, self.workers, 2 * self.workers, self.extractor, errors)
+        for path, result in results:
+            entry = entries[path]
+            if result.error:
+                entry['error'] = result.error
+                counts['failed'] += 1
+                _log(result.error)
+            else:
+                try:
+                    entry['kind'], entry['rows'] = self._append(entry, result.documents)
+                except Exception as e:
+                    # Logged and recorded as failed, so one file can't stop the watch
+                    entry['error'] = f"Error writing {path}: {e}"
+                    counts['failed'] += 1
+                    _log(entry['error'])
+                else:
+                    counts['converted'] += 1
+                    counts['rows'] += entry['rows']
+                    self.hashes.add(entry['hash'])
+            self._record(entry)
+        for error in errors:
+            _log(error)
+        return counts
+
+    def _append(self, entry: Dict[str, Any], documents: List[Dict[str, Any]]) -> Tuple[Optional[str], int]:
+        """Append the rows of a file's documents to today's output of their kind; returns (kind, rows).
+
+        Where the output ended is recorded as pending first, so rows appended
+        by a run that stopped before recording the file are cut off again on
+        the next start (see _recover) instead of being appended twice. Rows
+        of a file whose writing fails are cut off straight away.
+        """
+        if not documents:
+            return None, 0
+        kind = documents[0]['kind']
+        columns, dtypes, rows_of = STREAM_LAYOUTS[kind]
+        output = os.path.join(self.output_dir, f"{kind}_{time.strftime('%Y-%m-%d')}.csv")
+        offset = os.path.getsize(output) if os.path.exists(output) else 0
+        pending = {**entry, 'pending': {'output': output, 'offset': offset}}
+        self._record(pending)
+        try:
+            writer = RowWriter(output, columns, dtypes, f'{kind.upper()}_Data', append=True)
+            try:
+                for document in documents:
+                    for record in rows_of(entry['path'], document):
+                        writer.write(record)
+            finally:
+                writer.close()
+        except Exception:
+            self._recover(pending)
+            raise
+        with open(output, 'ab') as f:
+            os.fsync(f.fileno())
+        return kind, writer.rows
+
+    def run(self, interval: float, once: bool = False):
+        """Scan and convert every interval seconds until interrupted (or just once)"""
+        _log(f"Watching {self.folder} ({len(self.state)} file(s) already known), writing to {self.output_dir}")
+        while True:
+            ready = self.scan()
+            if ready:
+                counts = self.convert(ready)
+                _log(f"{counts['converted']} converted ({counts['rows']} rows), "
+                     f"{counts['skipped']} already seen, {counts['failed']} failed")
+            if once:
+                return
+            time.sleep(interval)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m watch', description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('folder', help='folder the PDFs are dropped into')
+    parser.add_argument('-o', '--output-dir', required=True, help='folder for the daily CSVs and the state file')
+    parser.add_argument('--state', help=f'state file (default: <output-dir>/{STATE_FILE})')
+    parser.add_argument('--interval', type=float, default=30, help='seconds between scans (default: 30)')
+    parser.add_argument('--settle', type=float, default=SETTLE_S,
+                        help=f'seconds a file must be unmodified before it is converted (default: {SETTLE_S:g})')
+    parser.add_argument('-w', '--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'worker processes (default: {DEFAULT_WORKERS})')
+    parser.add_argument('-e', '--extractor', choices=sorted(EXTRACTORS), default=DEFAULT_EXTRACTOR,
+                        help=f'text extraction backend (default: {DEFAULT_EXTRACTOR})')
+    parser.add_argument('-r', '--recursive', action='store_true', help='watch subdirectories too')
+    parser.add_argument('--once', action='store_true', help='convert what is there now and exit')
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.folder):
+        parser.error(f"no such directory: {args.folder}")
+    if args.extractor not in available_extractors():
+        parser.error(f"extractor {args.extractor} is not installed")
+
+    watcher = FolderWatcher(args.folder, args.output_dir, args.state, args.workers, args.extractor,
+                            args.recursive, args.settle)
+    try:
+        watcher.run(args.interval, args.once)
+    except KeyboardInterrupt:
+        _log("Stopped")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())